@@ -1,10 +1,14 @@
 import streamlit as st
-import requests
 import datetime
 from streamlit_extras.switch_page_button import switch_page
 
-# Base URL of your FastAPI backend
-BASE_URL = "http://localhost:8080/api"  # Replace with the actual backend URL
+from client import GuardianLaneClientError
+from utils.address_index import address_input
+from utils.backend import get_backend_client
+from utils.instrumentation import end_run, span, start_run
+from utils.resources import get_resources
+from utils.session import clear_session_cookie, restore_session, start_session
+from utils.theme import apply_theme
 
 # Streamlit layout setup
 st.set_page_config(
@@ -12,76 +16,20 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="collapsed"
 )
+start_run("login")
 
-# Custom CSS for better styling
-st.markdown("""
-    <style>
-    .stButton>button {
-        width: 100%;
-        margin-top: 10px;
-        background-color: #FF4B4B;
-        color: white;
-        border: none;
-        padding: 12px 24px;
-        border-radius: 8px;
-        font-weight: bold;
-        font-size: 1.1rem;
-        transition: all 0.3s ease;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    .stButton>button:hover {
-        background-color: #FF6B6B;
-        transform: translateY(-2px);
-        box-shadow: 0 6px 8px rgba(0, 0, 0, 0.2);
-    }
-    .stButton>button:active {
-        transform: translateY(0);
-    }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 2rem;
-        justify-content: center;
-        margin-bottom: 2rem;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 60px;
-        white-space: pre-wrap;
-        font-size: 1.2rem;
-        padding: 0 2rem;
-        background-color: #f0f2f6;
-        border-radius: 5px;
-        transition: all 0.3s ease;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #FF4B4B;
-        color: white;
-        border-radius: 5px;
-        font-weight: bold;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    .stTextInput>div>div>input {
-        border-radius: 5px;
-    }
-    .stTextArea>div>div>textarea {
-        border-radius: 5px;
-    }
-    .error-message {
-        background-color: #FFE5E5;
-        border-left: 4px solid #FF4B4B;
-        padding: 10px;
-        margin: 10px 0;
-        border-radius: 4px;
-        color: #D32F2F;
-    }
-    .success-message {
-        background-color: #E8F5E9;
-        border-left: 4px solid #4CAF50;
-        padding: 10px;
-        margin: 10px 0;
-        border-radius: 4px;
-        color: #2E7D32;
-    }
-    </style>
-""", unsafe_allow_html=True)
+# Start the shared event loop and warm the backend/agent connection pools
+get_resources()
+
+# A reloaded browser tab picks its session back up from the session cookie
+clear_session_cookie()
+with span("login.restore_session"):
+    restored = restore_session()
+if restored:
+    switch_page("Trip_Planner")
+
+# Shared stylesheet
+apply_theme()
 
 # Display header with logo
 col1, col2, col3 = st.columns([1, 2, 1])
@@ -108,37 +56,30 @@ with tab1:
             )
         else:
             try:
-                response = requests.post(
-                    f"{BASE_URL}/auth/login",
-                    json={"email": login_email, "password": login_password}
+                with span("login.authenticate"):
+                    token = get_backend_client().login(login_email, login_password)
+                st.markdown(
+                    '<div class="success-message">✅ Login successful!</div>',
+                    unsafe_allow_html=True
+                )
+                start_session(token)
+                # Have the profile and emergency contacts ready before they're needed
+                resources = get_resources()
+                resources.loop.submit(
+                    resources.profiles.aload(get_backend_client(), token["user_id"])
                 )
-                
-                if response.status_code == 200:
-                    st.markdown(
-                        '<div class="success-message">✅ Login successful!</div>',
-                        unsafe_allow_html=True
-                    )
-                    st.session_state["token"] = response.json()
-                    switch_page("Trip_Planner")
-                elif response.status_code == 401:
-                    st.markdown(
-                        '<div class="error-message">❌ Invalid email or password. Please check your credentials.</div>',
-                        unsafe_allow_html=True
-                    )
-                elif response.status_code == 404:
-                    st.markdown(
-                        '<div class="error-message">❌ Account not found. Please sign up first.</div>',
-                        unsafe_allow_html=True
-                    )
+                switch_page("Trip_Planner")
+            except GuardianLaneClientError as e:
+                if e.status_code is None:
+                    message = "Unable to connect to server. Please check your internet connection."
+                elif e.status_code == 401:
+                    message = "Invalid email or password. Please check your credentials."
+                elif e.status_code == 404:
+                    message = "Account not found. Please sign up first."
                 else:
-                    error_detail = response.json().get("detail", "Unknown error occurred")
-                    st.markdown(
-                        f'<div class="error-message">❌ Login failed: {error_detail}</div>',
-                        unsafe_allow_html=True
-                    )
-            except requests.exceptions.ConnectionError:
+                    message = f"Login failed: {e.detail or 'Unknown error occurred'}"
                 st.markdown(
-                    '<div class="error-message">❌ Unable to connect to server. Please check your internet connection.</div>',
+                    f'<div class="error-message">❌ {message}</div>',
                     unsafe_allow_html=True
                 )
             except Exception as e:
@@ -157,11 +98,22 @@ with tab2:
     email = st.text_input("Email", placeholder="Enter a valid email")
     phone = st.text_input("Phone", placeholder="+91-XXXXXXXXXX")
     password = st.text_input("Password", type="password", placeholder="Create a password")
-    home_address = st.text_area("Home Address", placeholder="Enter your home address")
+    home_address = address_input(
+        "Home Address", "home_address", get_resources().addresses,
+        placeholder="Enter your home address",
+    )
 
-    if home_address:
-        response = requests.post(f"{BASE_URL}/maps/get-latitude-longitude", json={"address": home_address})
-        latitude, longitude = response.json().get("latitude"), response.json().get("longitude")
+    # Geocode once per committed address, not on every edit of the form
+    if home_address and st.session_state.get("home_address_geocoded") != home_address:
+        try:
+            with span("login.geocode"):
+                coordinates = get_resources().addresses.geocode(
+                    get_backend_client(), None, home_address
+                )
+            latitude, longitude = coordinates.get("latitude"), coordinates.get("longitude")
+        except GuardianLaneClientError:
+            latitude = longitude = None
+        st.session_state.home_address_geocoded = home_address
 
     # Emergency contacts
     st.subheader("Emergency Contacts")
@@ -243,22 +195,20 @@ with tab2:
             }
 
             try:
-                response = requests.post(f"{BASE_URL}/auth/signup", json=signup_data)
-                if response.status_code == 200:
-                    st.markdown(
-                        '<div class="success-message">✅ Signup successful! You can now login.</div>',
-                        unsafe_allow_html=True
-                    )
-                    st.session_state["show_login"] = True
+                with span("login.signup"):
+                    get_backend_client().signup(signup_data)
+                st.markdown(
+                    '<div class="success-message">✅ Signup successful! You can now login.</div>',
+                    unsafe_allow_html=True
+                )
+                st.session_state["show_login"] = True
+            except GuardianLaneClientError as e:
+                if e.status_code is None:
+                    message = "Unable to connect to server. Please check your internet connection."
                 else:
-                    error_message = response.json().get("detail", "Unknown error occurred")
-                    st.markdown(
-                        f'<div class="error-message">❌ Signup failed: {error_message}</div>',
-                        unsafe_allow_html=True
-                    )
-            except requests.exceptions.ConnectionError:
+                    message = f"Signup failed: {e.detail or 'Unknown error occurred'}"
                 st.markdown(
-                    '<div class="error-message">❌ Unable to connect to server. Please check your internet connection.</div>',
+                    f'<div class="error-message">❌ {message}</div>',
                     unsafe_allow_html=True
                 )
             except Exception as e:
@@ -266,3 +216,5 @@ with tab2:
                     f'<div class="error-message">❌ An unexpected error occurred: {str(e)}</div>',
                     unsafe_allow_html=True
                 )
+
+end_run()
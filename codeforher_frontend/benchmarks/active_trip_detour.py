@@ -0,0 +1,73 @@
+"""
+Drive the Active Trip page with browser location fixes and check that
+leaving the route raises a detour: a few fixes on a synthetic route, then
+fixes 330 m off it. The page runs headlessly with `AppTest`; the location
+component's reports are scripted. The backend isn't needed. Run from
+`codeforher_frontend/`:
+
+    python -m benchmarks.active_trip_detour
+"""
+import time
+from pathlib import Path
+from unittest import mock
+
+import polyline
+from streamlit.testing.v1 import AppTest
+
+import utils.geolocation
+from benchmarks.detour import synthetic_route
+from utils.location_tracker import LocationTracker
+
+APP_DIR = Path(__file__).resolve().parent.parent
+PAGE = "pages/2_⏳Active_Trip.py"
+ON_ROUTE, OFF_ROUTE = 3, 5
+# About 330 m north of the route
+OFFSET = 0.003
+
+
+def main() -> None:
+    route = synthetic_route(300)
+    fixes = [route[i * 20] for i in range(ON_ROUTE)]
+    fixes += [(lat + OFFSET, lon) for lat, lon in route[100:100 + OFF_ROUTE]]
+    reports = [
+        {"latitude": lat, "longitude": lon, "accuracy": 8.0, "timestamp": i}
+        for i, (lat, lon) in enumerate(fixes)
+    ]
+
+    at = AppTest.from_file(str(APP_DIR / PAGE), default_timeout=30)
+    at.session_state["token"] = {"access_token": "benchmark", "user_id": "benchmark-user"}
+    at.session_state["is_trip_started"] = True
+    at.session_state["trip_id"] = "benchmark-trip"
+    at.session_state["trip_details"] = {
+        "distance": 6000,
+        "duration": 900,
+        "origin": {"latitude": route[0][0], "longitude": route[0][1], "address": "Start"},
+        "destination": {"latitude": route[-1][0], "longitude": route[-1][1]},
+        "route": polyline.encode(route),
+    }
+    # Take every fix as it arrives
+    at.session_state["location_tracker"] = LocationTracker(moving_interval=0, stationary_interval=0)
+
+    flagged_at = None
+    with mock.patch.object(utils.geolocation, "_device_location") as component:
+        for i, report in enumerate(reports):
+            component.return_value = report
+            start = time.perf_counter()
+            at.run()
+            elapsed = (time.perf_counter() - start) * 1000
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+            alerts = at.session_state["detour_alerts"] if "detour_alerts" in at.session_state else []
+            print(f"fix {i}: {'off' if i >= ON_ROUTE else 'on '} route, "
+                  f"{len(alerts)} detour alert(s), run {elapsed:.0f} ms")
+            if alerts and flagged_at is None:
+                flagged_at = i
+    assert at.session_state["last_location"]["source"] == "device"
+    assert flagged_at is not None and flagged_at >= ON_ROUTE, flagged_at
+    assert len(at.session_state["detour_alerts"]) == 1
+    print(f"detour flagged at fix {flagged_at}, "
+          f"{at.session_state['detour_detector'].describe_distance()} off the route")
+
+
+if __name__ == "__main__":
+    main()
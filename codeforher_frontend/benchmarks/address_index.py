@@ -0,0 +1,78 @@
+"""
+Time address suggestions from the prefix index against a linear scan of
+every address, on 50k synthetic addresses. Run from `codeforher_frontend/`:
+
+    python -m benchmarks.address_index
+"""
+import random
+import time
+
+from utils.address_index import AddressIndex, normalize
+
+ADDRESS_COUNT = 50_000
+QUERY_COUNT = 2_000
+AREAS = [
+    "Koramangala", "Indiranagar", "Jayanagar", "Whitefield", "Malleshwaram",
+    "HSR Layout", "Basavanagudi", "Hebbal", "Yelahanka", "Banashankari",
+]
+STREETS = ["Main Road", "Cross", "Block", "Stage", "Layout", "Circle", "Nagar"]
+
+
+def synthetic_addresses(count: int, seed: int = 5) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        f"{rng.randint(1, 999)} {rng.randint(1, 40)}th {rng.choice(STREETS)}, "
+        f"{rng.choice(AREAS)}, Bengaluru {560000 + rng.randint(1, 120)}"
+        for _ in range(count)
+    ]
+
+
+def linear_suggest(addresses, scores, prefix: str, limit: int = 8) -> list[str]:
+    prefix = normalize(prefix)
+    matches = [
+        a for a in addresses
+        if any(word.startswith(prefix) for word in normalize(a).replace(",", " ").split())
+    ]
+    return sorted(matches, key=lambda a: scores[a], reverse=True)[:limit]
+
+
+def main() -> None:
+    rng = random.Random(9)
+    addresses = synthetic_addresses(ADDRESS_COUNT)
+    scores = {a: rng.randint(1, 50) for a in addresses}
+
+    start = time.perf_counter()
+    added = AddressIndex()
+    for address, score in scores.items():
+        added.add(address, weight=score)
+    add_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = AddressIndex.build(scores)
+    build = time.perf_counter() - start
+
+    queries = [
+        rng.choice(AREAS)[: rng.randint(2, 6)] if rng.random() < 0.7
+        else str(rng.randint(1, 999))
+        for _ in range(QUERY_COUNT)
+    ]
+    start = time.perf_counter()
+    for query in queries:
+        index.suggest(query)
+    trie_time = (time.perf_counter() - start) / QUERY_COUNT
+
+    sample = queries[:50]
+    start = time.perf_counter()
+    for query in sample:
+        linear_suggest(addresses, scores, query)
+    scan_time = (time.perf_counter() - start) / len(sample)
+
+    print(f"{len(index):,} addresses indexed in {build:.2f}s ({add_time:.2f}s one by one)")
+    mismatched = sum(added.suggest(query) != index.suggest(query) for query in queries)
+    print(f"suggestions differing between the two: {mismatched}")
+    print(f"trie suggest:    {trie_time * 1e6:9.1f} µs")
+    print(f"linear scan:     {scan_time * 1e6:9.1f} µs ({scan_time / trie_time:.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
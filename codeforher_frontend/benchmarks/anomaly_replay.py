@@ -0,0 +1,133 @@
+"""
+Replay a GPS trace through the trip-anomaly detector at 100x real time.
+
+The trace is a JSON file in the columnar track-upload format (`lat`, `lon`,
+`ts` and `accuracy` lists, as produced by `TrackBuffer.next_batch()`), or
+a list of such batches. Fixes without an accuracy count as IP-derived, so
+they can't raise a stop. Without one, a synthetic 45-minute trip is generated with an
+8-minute stop, a burst of speed and a stretch of backtracking, and the
+replay checks each is detected once. Run from `codeforher_frontend/`:
+
+    python -m benchmarks.anomaly_replay [trace.json] [--speed 100]
+"""
+import argparse
+import json
+import math
+import random
+import time
+
+from benchmarks.detour import synthetic_route
+from utils.anomaly import BACKTRACK, SPEED_CHANGE, STOP, AnomalyDetector
+from utils.detour import RouteIndex
+from utils.location_tracker import EARTH_RADIUS_M
+from utils.trip_progress import TripProgress
+
+FIX_INTERVAL = 10.0
+CRUISE_SPEED = 8.0
+GPS_NOISE_M = 5.0
+
+
+def load_trace(path: str) -> list[tuple[float, float, float, float]]:
+    with open(path) as f:
+        data = json.load(f)
+    batches = data if isinstance(data, list) else [data]
+    trace = [
+        (lat, lon, ts, math.nan if accuracy is None else accuracy)
+        for batch in batches
+        for lat, lon, ts, accuracy in zip(
+            batch["lat"], batch["lon"], batch["ts"],
+            batch.get("accuracy") or [None] * len(batch["ts"]),
+        )
+    ]
+    return sorted(trace, key=lambda fix: fix[2])
+
+
+def synthetic_trace(
+    route: list[tuple[float, float]], seed: int = 3
+) -> list[tuple[float, float, float, float]]:
+    """
+    Fixes every 10 s along `route` (vertices ~20 m apart): cruising, an
+    8-minute stop at 10 minutes, 2 minutes at 4x speed at 20 minutes and
+    500 m back along the route at 28 minutes, each fix reporting the
+    GPS noise as its accuracy.
+    """
+    rng = random.Random(seed)
+    noise = GPS_NOISE_M / EARTH_RADIUS_M * 180 / math.pi
+    spacing = 20.0
+    trace, position, ts = [], 0.0, 0.0
+    backtrack_left = 0.0
+    while position < len(route) - 1:
+        minute = ts / 60
+        if 10 <= minute < 18:
+            speed = 0.0
+        elif 20 <= minute < 22:
+            speed = CRUISE_SPEED * 4
+        elif 28 <= minute < 29:
+            backtrack_left = 500.0
+            speed = CRUISE_SPEED
+        else:
+            speed = CRUISE_SPEED * rng.uniform(0.8, 1.2)
+        if backtrack_left > 0:
+            step = min(speed * FIX_INTERVAL, backtrack_left)
+            backtrack_left -= step
+            position = max(position - step / spacing, 0.0)
+        else:
+            position += speed * FIX_INTERVAL / spacing
+        lat, lon = route[min(int(position), len(route) - 1)]
+        trace.append((lat + rng.gauss(0, noise), lon + rng.gauss(0, noise), ts, GPS_NOISE_M))
+        ts += FIX_INTERVAL
+    return trace
+
+
+def replay(trace, route, speedup: float):
+    """Feed the trace in real time scaled by `speedup`, as the page would."""
+    index = RouteIndex(route)
+    progress = TripProgress(index, planned_duration=len(route) * 20.0 / CRUISE_SPEED,
+                            started_at=trace[0][2])
+    detector = AnomalyDetector()
+    anomalies, busy = [], 0.0
+    start, t0 = time.perf_counter(), trace[0][2]
+    for lat, lon, ts, accuracy in trace:
+        delay = (ts - t0) / speedup - (time.perf_counter() - start)
+        if delay > 0:
+            time.sleep(delay)
+        tick = time.perf_counter()
+        current = progress.update(lat, lon, ts)
+        anomalies += detector.update(
+            lat, lon, ts,
+            along=current.along if current.snapped else None,
+            remaining=current.remaining_distance,
+            accuracy=accuracy,
+        )
+        busy += time.perf_counter() - tick
+    return anomalies, busy, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("trace", nargs="?", help="recorded trace (track batch JSON)")
+    parser.add_argument("--speed", type=float, default=100.0, help="replay speed-up")
+    args = parser.parse_args()
+
+    if args.trace:
+        trace = load_trace(args.trace)
+        # Follow the recording itself as the planned route
+        route = [(lat, lon) for lat, lon, *_ in trace]
+    else:
+        route = synthetic_route(1_200)
+        trace = synthetic_trace(route)
+
+    anomalies, busy, wall = replay(trace, route, args.speed)
+    duration = trace[-1][2] - trace[0][2]
+    print(f"{len(trace)} fixes covering {duration / 60:.0f} min, "
+          f"replayed at {args.speed:.0f}x in {wall:.1f}s "
+          f"({busy / len(trace) * 1e6:.0f} µs per fix)")
+    for anomaly in anomalies:
+        print(f"  {(anomaly.ts - trace[0][2]) / 60:5.1f} min  {anomaly.kind:<13} {anomaly.message}")
+    if not args.trace:
+        kinds = sorted(anomaly.kind for anomaly in anomalies)
+        assert kinds == sorted([STOP, SPEED_CHANGE, BACKTRACK]), kinds
+
+
+if __name__ == "__main__":
+    main()
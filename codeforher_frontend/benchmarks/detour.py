@@ -0,0 +1,70 @@
+"""
+Time point-to-route distance queries on a 100k-vertex synthetic route,
+grid index vs a vectorized scan of every segment. Run from
+`codeforher_frontend/`:
+
+    python -m benchmarks.detour
+"""
+import math
+import random
+import time
+
+from utils.detour import DetourDetector, RouteIndex
+
+VERTEX_COUNT = 100_000
+QUERY_COUNT = 2_000
+
+
+def synthetic_route(count: int, seed: int = 7) -> list[tuple[float, float]]:
+    """A wandering route of ~20 m steps starting in Bengaluru."""
+    rng = random.Random(seed)
+    lat, lon, heading = 12.97, 77.59, 0.0
+    points = []
+    for _ in range(count):
+        heading += rng.gauss(0, 0.3)
+        lat += 0.00018 * math.cos(heading)
+        lon += 0.00018 * math.sin(heading)
+        points.append((lat, lon))
+    return points
+
+
+def main() -> None:
+    rng = random.Random(11)
+    route = synthetic_route(VERTEX_COUNT)
+
+    start = time.perf_counter()
+    index = RouteIndex(route)
+    build = time.perf_counter() - start
+
+    # Samples near the route, some a few hundred metres off it
+    queries = []
+    for _ in range(QUERY_COUNT):
+        lat, lon = route[rng.randrange(VERTEX_COUNT)]
+        offset = rng.choice([0.0, 0.0005, 0.003])
+        queries.append((lat + rng.uniform(-offset, offset), lon + rng.uniform(-offset, offset)))
+
+    start = time.perf_counter()
+    grid = [index.distance(lat, lon) for lat, lon in queries]
+    grid_time = (time.perf_counter() - start) / QUERY_COUNT
+
+    sample = queries[:200]
+    start = time.perf_counter()
+    brute = [index.brute_force_distance(lat, lon) for lat, lon in sample]
+    brute_time = (time.perf_counter() - start) / len(sample)
+    assert all(abs(g - b) < 1e-6 for g, b in zip(grid, brute))
+
+    detector = DetourDetector(index, safe_radius=100.0)
+    start = time.perf_counter()
+    for lat, lon in queries:
+        detector.update(lat, lon)
+    detector_time = (time.perf_counter() - start) / QUERY_COUNT
+
+    print(f"{len(index):,} segments, {len(index.cells):,} grid cells "
+          f"of {index.cell_size:.0f} m, built in {build * 1000:.0f} ms")
+    print(f"grid query:        {grid_time * 1e6:8.1f} µs")
+    print(f"full scan query:   {brute_time * 1e6:8.1f} µs ({brute_time / grid_time:.0f}x slower)")
+    print(f"detector update:   {detector_time * 1e6:8.1f} µs ({detector.alerts} detours flagged)")
+
+
+if __name__ == "__main__":
+    main()
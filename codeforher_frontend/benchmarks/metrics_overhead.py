@@ -0,0 +1,93 @@
+"""
+Cost of the request metrics: backend requests through `GuardianLaneClient`
+over an in-memory transport with and without request counting, the
+per-call price of a counter increment and a histogram observation, and the
+time to render a scrape of a registry holding a busy process's metrics.
+Run from `codeforher_frontend/`:
+
+    python -m benchmarks.metrics_overhead
+"""
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from client.guardian_lane import GuardianLaneClient, LabeledCounter, LatencyHistogram
+from utils.instrumentation import instrumentation
+from utils.metrics import MetricsRegistry
+
+REQUESTS = 20_000
+CALLS = 500_000
+ENDPOINTS = [
+    "/auth/login", "/maps/route", "/maps/geocode", "/llm/route-safety",
+    "/commute/start-trip", "/commute/end-trip/{trip_id}", "/sos/send-alert",
+]
+
+
+def ok(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"ok": True})
+
+
+def requests_per_second(counted: bool) -> float:
+    http = httpx.Client(base_url="http://backend", transport=httpx.MockTransport(ok))
+    client = GuardianLaneClient(
+        "http://backend",
+        http_client=http,
+        requests=LabeledCounter() if counted else None,
+    )
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        client.request("GET", ENDPOINTS[i % len(ENDPOINTS)])
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def ns_per_call(func, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        func(*args)
+    return (time.perf_counter() - start) / CALLS * 1e9
+
+
+def render_ms(registry: MetricsRegistry, runs: int = 200) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        registry.render()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main() -> None:
+    # Interleave the two so drift in the machine's speed hits both
+    plain, counted = [], []
+    for _ in range(3):
+        plain.append(requests_per_second(counted=False))
+        counted.append(requests_per_second(counted=True))
+    plain_us, counted_us = 1e6 / max(plain), 1e6 / max(counted)
+    print(f"{'request, no counter':<28}{plain_us:>10.1f} µs")
+    print(f"{'request, counted':<28}{counted_us:>10.1f} µs  ({counted_us - plain_us:+.1f} µs)")
+
+    print(f"{'LabeledCounter.inc':<28}{ns_per_call(LabeledCounter().inc, '/maps/route', '200'):>10.0f} ns")
+    print(f"{'LatencyHistogram.observe':<28}{ns_per_call(LatencyHistogram().observe, 0.12):>10.0f} ns")
+
+    # Just the parts of `Resources` the registry reads
+    cache = SimpleNamespace(hits=10, misses=2)
+    resources = SimpleNamespace(
+        backend_requests=LabeledCounter(), agent_requests=LabeledCounter(),
+        agent_tokens=LabeledCounter(), backend_latency={}, agent_latency={},
+        profiles=cache, insights=cache, addresses=cache, routes=cache,
+    )
+    for endpoint in ENDPOINTS:
+        for status in ("200", "404", "500", "error"):
+            resources.backend_requests.inc(endpoint, status)
+        resources.backend_latency[endpoint] = LatencyHistogram()
+        resources.backend_latency[endpoint].observe(0.2)
+    for endpoint in ("/info", "/invoke", "/stream", "/stream:first", "/feedback", "/history"):
+        resources.agent_requests.inc(endpoint, "200")
+        resources.agent_latency[endpoint] = LatencyHistogram()
+    for phase in range(30):
+        instrumentation.record(f"phase_{phase}", 0.01)
+    registry = MetricsRegistry(resources)
+    print(f"{'scrape render':<28}{render_ms(registry):>10.2f} ms  ({len(registry.render()):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Send SOS/emergency messages through the outbox to a local stub backend
+that drops a share of requests, and check every message is delivered
+exactly once. Some drops lose the request, others lose the response after
+the stub has processed it, so the retry must be deduplicated by its
+idempotency key. Run from `codeforher_frontend/`:
+
+    python -m benchmarks.outbox_drops
+"""
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from client import GuardianLaneClient
+from utils.outbox import SENT, Outbox, OutboxSender
+
+MESSAGE_COUNT = 200
+DROP_RATE = 0.3
+
+
+class StubServer(ThreadingHTTPServer):
+    # Room for the whole first burst of concurrent connections
+    request_queue_size = MESSAGE_COUNT
+
+
+class DroppingBackend(BaseHTTPRequestHandler):
+    delivered: set[str] = set()
+    requests = 0
+    processed = 0
+    lock = threading.Lock()
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        key = self.headers.get("Idempotency-Key")
+        roll = random.random()
+        with self.lock:
+            type(self).requests += 1
+            if roll < DROP_RATE / 2:
+                # Request lost before reaching the backend
+                self.close_connection = True
+                return
+            # Retries of a processed message are acknowledged but not redelivered
+            type(self).processed += 1
+            self.delivered.add(key)
+        if roll < DROP_RATE:
+            # Processed, but the response is lost
+            self.close_connection = True
+            return
+        self.send_response(200)
+        payload = json.dumps({"ok": True, "echo": json.loads(body)["user_id"]}).encode()
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+async def deliver_all(sender: OutboxSender, client: GuardianLaneClient) -> int:
+    first_try = await asyncio.gather(
+        *(
+            sender.send(
+                client,
+                "sos" if i % 3 == 0 else "emergency",
+                f"target-{i}",
+                {"user_id": "u1", "message": f"help {i}"},
+                alert_id=f"alert-{i}",
+                timeout=1.0,
+            )
+            for i in range(MESSAGE_COUNT)
+        )
+    )
+    retry_task = asyncio.create_task(sender.run())
+    while sender.outbox.pending_count():
+        await asyncio.sleep(0.05)
+    retry_task.cancel()
+    return sum(first_try)
+
+
+def main() -> None:
+    random.seed(7)
+    server = StubServer(("127.0.0.1", 0), DroppingBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/api"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = Outbox(os.path.join(tmp, "outbox.sqlite3"), base_delay=0.05, max_delay=0.5)
+        sender = OutboxSender(outbox, poll_interval=0.02)
+        client = GuardianLaneClient(base_url, token={"user_id": "u1"}, retries=0)
+
+        start = time.perf_counter()
+        first_try = asyncio.run(deliver_all(sender, client))
+        elapsed = time.perf_counter() - start
+
+        messages = outbox.messages([f"alert-{i}" for i in range(MESSAGE_COUNT)])
+        sent = sum(m.status == SENT for m in messages)
+        attempts = sum(m.attempts for m in messages)
+    server.shutdown()
+
+    print(f"{MESSAGE_COUNT} messages, {DROP_RATE:.0%} of requests dropped")
+    print(f"  delivered on first try: {first_try}")
+    print(f"  delivered after retries: {sent} in {elapsed:.2f}s ({attempts} attempts, "
+          f"{DroppingBackend.requests} requests seen by the stub)")
+    print(f"  unique messages at backend: {len(DroppingBackend.delivered)} "
+          f"({DroppingBackend.processed - len(DroppingBackend.delivered)} duplicates deduplicated)")
+    assert sent == MESSAGE_COUNT
+    assert len(DroppingBackend.delivered) == MESSAGE_COUNT
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Bytes of page elements Streamlit sends per run, with the stylesheet inlined
+on every run versus linked once per session from the static folder.
+
+Each page is run twice in one session with `AppTest` (a first visit and a
+rerun), and the serialized size of every element it draws is summed. The
+backend isn't needed; pages that can't reach it (or the agent service)
+still draw their layout.
+Run from `codeforher_frontend/`:
+
+    python -m benchmarks.page_css_bytes
+"""
+import logging
+import os
+from pathlib import Path
+
+from streamlit import config
+from streamlit.testing.v1 import AppTest
+
+APP_DIR = Path(__file__).resolve().parent.parent
+TOKEN = {"access_token": "benchmark", "token_type": "bearer", "user_id": "benchmark-user"}
+TRIP = {
+    "is_trip_started": True,
+    "trip_id": "benchmark-trip",
+    "trip_details": {
+        "distance": 5000,
+        "duration": 900,
+        "origin": {"latitude": 12.97, "longitude": 77.59, "address": "MG Road"},
+        "destination": {"latitude": 12.93, "longitude": 77.62, "address": "Koramangala"},
+    },
+}
+# Each page with the session state it needs beyond the login token
+PAGES = {
+    "Login.py": None,
+    "pages/1_🚗Trip_Planner.py": {},
+    "pages/2_⏳Active_Trip.py": TRIP,
+    "pages/3_🗓️Trip_History.py": {},
+    "pages/4_🤖_Agent_Chat.py": {},
+}
+
+
+def element_bytes(node) -> int:
+    proto = getattr(node, "proto", None)
+    size = proto.ByteSize() if proto is not None else 0
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        size += sum(element_bytes(child) for child in children.values())
+    return size
+
+
+def page_bytes(page: str, state: dict | None, static_serving: bool) -> tuple[int, int]:
+    """Element bytes of the first run and of a rerun of `page`."""
+    config.set_option("server.enableStaticServing", static_serving)
+    at = AppTest.from_file(str(APP_DIR / page), default_timeout=30)
+    if state is not None:
+        at.session_state["token"] = TOKEN
+        for key, value in state.items():
+            at.session_state[key] = value
+    sizes = []
+    for _ in range(2):
+        at.run()
+        sizes.append(element_bytes(at._tree))
+    return sizes[0], sizes[1]
+
+
+def main() -> None:
+    # Pages use paths relative to the repository root, as `streamlit run` does
+    os.chdir(APP_DIR.parent)
+    logging.disable(logging.WARNING)
+    print(f"{'page':<20}{'inline':>20}{'linked':>20}{'saved/rerun':>14}")
+    for page, state in PAGES.items():
+        inline = page_bytes(page, state, static_serving=False)
+        linked = page_bytes(page, state, static_serving=True)
+        print(
+            f"{Path(page).stem.split('_', 1)[-1]:<20}"
+            f"{inline[0]:>10,} /{inline[1]:>8,}"
+            f"{linked[0]:>10,} /{linked[1]:>8,}"
+            f"{inline[1] - linked[1]:>13,}B"
+        )
+    print("(bytes on first run / on rerun)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Measure the import cost of each page with `python -X importtime`.
+
+A page's top-level import statements are pulled out of its source and run
+in a fresh interpreter (after `streamlit`, which every worker has loaded
+already), so the numbers are what a cold worker pays the first time the
+page is opened. Run from `codeforher_frontend/`:
+
+    python -m benchmarks.page_imports [--top 5]
+"""
+import argparse
+import ast
+import glob
+import os
+import subprocess
+import sys
+
+PAGES = ["Login.py", *sorted(glob.glob("pages/[0-9]*.py"))]
+
+
+def import_source(path: str) -> str:
+    """The page's module-level import statements, as source."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in imports)
+
+
+def import_times(source: str) -> tuple[float, list[tuple[float, str]]] | str:
+    """
+    Total import time of `source` in seconds and the slowest top-level
+    modules, or the error if it can't be imported here.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import streamlit\nimport sys\n"
+         f"sys.stderr.write('--- page ---\\n')\n{source}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+    )
+    if result.returncode:
+        return result.stderr.strip().splitlines()[-1]
+    lines = result.stderr.split("--- page ---\n", 1)[1].splitlines()
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under the module importing them
+        name = name[1:]
+        if cumulative.strip().isdigit() and not name.startswith(" "):
+            modules.append((int(cumulative) / 1e6, name))
+    return sum(seconds for seconds, _ in modules), sorted(modules, reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=5, help="slowest modules to list per page")
+    args = parser.parse_args()
+
+    for page in PAGES:
+        measured = import_times(import_source(page))
+        if isinstance(measured, str):
+            print(f"{page}: not importable here ({measured})")
+            continue
+        total, modules = measured
+        print(f"{page}: {total * 1000:.0f} ms")
+        for seconds, name in modules[: args.top]:
+            print(f"    {seconds * 1000:7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
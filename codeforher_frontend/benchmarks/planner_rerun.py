@@ -0,0 +1,100 @@
+"""
+Median rerun latency of the Trip Planner page with a route on screen: a
+full-page rerun (what every widget or map interaction cost before the page
+was split into fragments) and a rerun of each fragment on its own (what an
+interaction inside that fragment costs now).
+
+Pages run headlessly with `AppTest`. A first, untimed run fetches the
+route from the backend at `BACKEND_URL`; reruns are answered from the
+page's route caches. `AppTest` only does full runs, so fragment reruns
+are requested the way the browser does, with the fragment's ID in the
+rerun request.
+Run from `codeforher_frontend/`:
+
+    python -m benchmarks.planner_rerun [REV ...]
+
+With git revisions, the Trip Planner page of each one is measured (against
+the modules of the current tree) instead of the working tree's.
+"""
+import functools
+import inspect
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+from streamlit.testing.v1 import AppTest
+import streamlit.testing.v1.local_script_runner as local_script_runner
+
+APP_DIR = Path(__file__).resolve().parent.parent
+PAGE = "pages/1_🚗Trip_Planner.py"
+STATE = {
+    "token": {"access_token": "benchmark", "token_type": "bearer", "user_id": "benchmark-user"},
+    "source": "MG Road",
+    "destination": "Koramangala",
+}
+RERUNS = 50
+
+
+def median_ms(at: AppTest, fragment_id: str | None = None) -> float:
+    """Median wall time of `RERUNS` reruns of the page, or of one fragment."""
+    rerun_data = RerunData
+    if fragment_id is not None:
+        rerun_data = functools.partial(
+            RerunData, fragment_id_queue=[fragment_id], is_fragment_scoped_rerun=True
+        )
+    times = []
+    with mock.patch.object(local_script_runner, "RerunData", rerun_data):
+        for _ in range(RERUNS):
+            start = time.perf_counter()
+            at.run()
+            times.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return statistics.median(times) * 1000
+
+
+def fragment_names(at: AppTest) -> dict[str, str]:
+    """The page's fragments, ID to function name."""
+    names = {}
+    for fragment_id, fragment in at._fragment_storage._fragments.items():
+        func = inspect.getclosurevars(fragment).nonlocals.get("non_optional_func")
+        names[fragment_id] = getattr(func, "__name__", fragment_id)
+    return names
+
+
+def measure(label: str, path: Path) -> None:
+    at = AppTest.from_file(str(path), default_timeout=30)
+    for key, value in STATE.items():
+        at.session_state[key] = value
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    print(label)
+    print(f"  {'full rerun':<32}{median_ms(at):8.1f} ms")
+    for fragment_id, name in fragment_names(at).items():
+        print(f"  {'fragment ' + name:<32}{median_ms(at, fragment_id):8.1f} ms")
+
+
+def main() -> None:
+    revisions = sys.argv[1:]
+    if not revisions:
+        measure("working tree", APP_DIR / PAGE)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        for rev in revisions:
+            source = subprocess.run(
+                ["git", "show", f"{rev}:./{PAGE}"],
+                cwd=APP_DIR, check=True, capture_output=True, text=True,
+            ).stdout
+            path = Path(tmp) / f"{rev.replace('/', '_')}_{Path(PAGE).name}"
+            path.write_text(source)
+            measure(rev, path)
+
+
+if __name__ == "__main__":
+    main()
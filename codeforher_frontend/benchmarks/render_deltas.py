@@ -0,0 +1,104 @@
+"""
+Count the elements (one websocket delta each) and bytes the Trip Planner's
+directions and safety-insights sections emit per rerun, before and after
+rendering each section as a single HTML block. Run from `codeforher_frontend/`:
+
+    python -m benchmarks.render_deltas
+"""
+from streamlit.testing.v1 import AppTest
+
+STEP_COUNT = 60
+
+
+def legacy_sections():
+    """The per-step / per-card st.markdown calls the page used to make."""
+    import streamlit as st
+
+    from benchmarks.render_deltas import sample_data
+
+    steps, safety_data = sample_data()
+    st.markdown("### Turn-by-Turn Directions")
+    st.markdown('<div class="directions-container">', unsafe_allow_html=True)
+    for i, step in enumerate(steps, 1):
+        st.markdown(f"""
+            <div class="direction-step">
+                <div class="step-number">{i}</div>
+                <div class="step-content">
+                    <div>{step['instructions']}</div>
+                    <div class="step-distance">{step['readable_distance']} • {step['readable_duration']}</div>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    st.markdown("### 🛡️ Trip Safety Insights")
+    st.markdown('<div class="safety-card">', unsafe_allow_html=True)
+    st.markdown('<div class="safety-header">📍 Route Overview</div>', unsafe_allow_html=True)
+    st.markdown(f'<div class="safety-content">{safety_data["general_insights"]}</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('<div class="safety-card">', unsafe_allow_html=True)
+    st.markdown('<div class="safety-header">⏰ Time-based Safety Tips</div>', unsafe_allow_html=True)
+    cols = st.columns(2)
+    for i, (time, tip) in enumerate(safety_data["safety_tips"].items()):
+        with cols[i % 2]:
+            st.markdown('<div style="margin-bottom: 1rem;">', unsafe_allow_html=True)
+            st.markdown(f'<span class="time-badge">{time.upper()}</span>', unsafe_allow_html=True)
+            st.markdown(f'<div class="safety-content" style="margin-top: 0.5rem;">{tip}</div>', unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    for field, title in (("road_conditions", "🛣️ Road Conditions"), ("areas_of_concern", "⚠️ Areas of Concern")):
+        st.markdown('<div class="safety-card">', unsafe_allow_html=True)
+        st.markdown(f'<div class="safety-header">{title}</div>', unsafe_allow_html=True)
+        for name, text in safety_data[field].items():
+            st.markdown('<div style="margin-bottom: 0.8rem;">', unsafe_allow_html=True)
+            st.markdown(f'<span class="road-name">{name}</span>', unsafe_allow_html=True)
+            st.markdown(f'<div class="safety-content">{text}</div>', unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+
+def templated_sections():
+    import streamlit as st
+
+    from benchmarks.render_deltas import sample_data
+    from utils.templates import render_cached, route_steps_html, safety_insights_html
+
+    steps, safety_data = sample_data()
+    st.markdown(render_cached(route_steps_html, steps), unsafe_allow_html=True)
+    st.markdown(render_cached(safety_insights_html, safety_data), unsafe_allow_html=True)
+
+
+def sample_data():
+    steps = [
+        {
+            "instructions": f"Turn <b>left</b> onto <b>Road {i}</b>",
+            "readable_distance": f"{i * 100} m",
+            "readable_duration": "1 min",
+        }
+        for i in range(STEP_COUNT)
+    ]
+    safety_data = {
+        "general_insights": "Mostly well-lit arterial roads.",
+        "safety_tips": {"morning": "a", "afternoon": "b", "evening": "c", "night": "d"},
+        "road_conditions": {f"Road {i}": "Busy, well lit" for i in range(8)},
+        "areas_of_concern": {f"Area {i}": "Poorly lit underpass" for i in range(4)},
+    }
+    return steps, safety_data
+
+
+def measure(script) -> tuple[int, int]:
+    at = AppTest.from_function(script)
+    at.run()
+    elements = [*at.markdown, *at.columns]
+    size = sum(len(m.proto.SerializeToString()) for m in at.markdown)
+    return len(elements), size
+
+
+def main() -> None:
+    for name, script in (("legacy", legacy_sections), ("templated", templated_sections)):
+        count, size = measure(script)
+        print(f"{name:10s} {count:4d} elements  {size / 1024:6.1f} KiB markdown payload")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+AREAS = [
+    "Koramangala", "Indiranagar", "Whitefield", "Jayanagar", "HSR Layout",
+    "Malleshwaram", "Electronic City", "Hebbal", "Marathahalli", "BTM Layout",
+    "Banashankari", "Yelahanka", "Rajajinagar", "Bellandur", "Sarjapur Road",
+]
+STATUSES = ["completed", "ongoing", "cancelled"]
+
+
+def synthetic_trips(count: int, seed: int = 7) -> list[dict]:
+    """Generate trip dicts shaped like the `/commute/trips` response."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    trips = []
+    for i in range(count):
+        created = start + timedelta(minutes=rng.randrange(0, 365 * 24 * 60))
+        trips.append(
+            {
+                "_id": f"trip-{i:07d}",
+                "status": rng.choices(STATUSES, weights=[8, 1, 1])[0],
+                "created_at": created.isoformat().replace("+00:00", "Z"),
+                "distance": rng.randrange(500, 40_000),
+                "duration": rng.randrange(300, 5_400),
+                "start_location": {
+                    "address": f"{rng.randrange(1, 999)} {rng.choice(AREAS)}, Bengaluru",
+                    "latitude": 12.9 + rng.random() / 10,
+                    "longitude": 77.5 + rng.random() / 10,
+                },
+                "end_location": {
+                    "address": f"{rng.randrange(1, 999)} {rng.choice(AREAS)}, Bengaluru",
+                    "latitude": 12.9 + rng.random() / 10,
+                    "longitude": 77.5 + rng.random() / 10,
+                },
+                "detour_alerts": ["Detour detected"] if rng.random() < 0.05 else [],
+                "anomaly_alerts": ["Unexpected stop"] if rng.random() < 0.03 else [],
+            }
+        )
+    return trips
@@ -0,0 +1,59 @@
+"""
+Compare the Trip History filter/sort path with and without TripIndex.
+
+Simulates a user typing a search term one character at a time over 10k
+synthetic trips. Run from `codeforher_frontend/`:
+
+    python -m benchmarks.trip_index
+"""
+import time
+
+from benchmarks.synthetic import synthetic_trips
+from utils.trip_index import TripIndex, format_datetime
+
+TRIP_COUNT = 10_000
+SEARCH = "koramangala"
+
+
+def naive_rerun(trips, search, sort_by="Latest First"):
+    result = [
+        t
+        for t in trips
+        if search.lower() in t["start_location"]["address"].lower()
+        or search.lower() in t["end_location"]["address"].lower()
+    ]
+    result.sort(key=lambda x: x["created_at"], reverse=sort_by == "Latest First")
+    return [(format_datetime(t["created_at"]), t) for t in result]
+
+
+def indexed_rerun(index, search, sort_by="Latest First"):
+    return [(r.display_date, r.trip) for r in index.query(search=search, sort_by=sort_by)]
+
+
+def main() -> None:
+    trips = synthetic_trips(TRIP_COUNT)
+    prefixes = [SEARCH[: i + 1] for i in range(len(SEARCH))]
+
+    start = time.perf_counter()
+    for prefix in prefixes:
+        naive_rerun(trips, prefix)
+    naive = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = TripIndex(trips)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for prefix in prefixes:
+        indexed_rerun(index, prefix)
+    indexed = time.perf_counter() - start
+
+    assert [t["_id"] for _, t in naive_rerun(trips, SEARCH)] == [
+        t["_id"] for _, t in indexed_rerun(index, SEARCH)
+    ]
+    print(f"{TRIP_COUNT} trips, {len(prefixes)} keystrokes")
+    print(f"naive:   {naive * 1000 / len(prefixes):8.2f} ms/rerun")
+    print(f"index:   {indexed * 1000 / len(prefixes):8.2f} ms/rerun (build {build * 1000:.0f} ms once per fetch)")
+
+
+if __name__ == "__main__":
+    main()
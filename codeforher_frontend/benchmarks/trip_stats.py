@@ -0,0 +1,67 @@
+"""
+Time the Trip History statistics panel aggregates over 100k synthetic trips,
+against the equivalent pure-Python loops. Run from `codeforher_frontend/`:
+
+    python -m benchmarks.trip_stats
+"""
+import time
+from collections import Counter
+
+from benchmarks.synthetic import synthetic_trips
+from utils.trip_index import TripIndex
+from utils.trip_stats import TripStats
+
+TRIP_COUNT = 100_000
+
+
+def loop_aggregates(index):
+    weekly, hours, alerted = Counter(), Counter(), Counter()
+    durations = []
+    for r in index.records:
+        local = r.created_ts + 19_800
+        if r.status == "completed":
+            weekly[int((local - 4 * 86_400) // (7 * 86_400))] += r.distance
+        hour = int(local % 86_400 // 3600)
+        hours[hour] += 1
+        if r.trip.get("detour_alerts") or r.trip.get("anomaly_alerts"):
+            alerted[hour] += 1
+        if r.status == "completed":
+            durations.append(r.trip["duration"] / 60)
+    durations.sort()
+    return weekly, {h: alerted[h] / hours[h] for h in hours}, durations[len(durations) // 2]
+
+
+def vector_aggregates(stats):
+    return (
+        stats.weekly_distance_km(),
+        stats.daily_trip_counts(),
+        stats.alert_rate_by_hour(),
+        stats.duration_summary(),
+        stats.alert_totals(),
+        stats.safest_hour(),
+    )
+
+
+def main() -> None:
+    index = TripIndex(synthetic_trips(TRIP_COUNT))
+
+    start = time.perf_counter()
+    stats = TripStats.from_index(index)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vector_aggregates(stats)
+    vector = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loop_aggregates(index)
+    loops = time.perf_counter() - start
+
+    print(f"{TRIP_COUNT} trips")
+    print(f"columns build:    {build * 1000:8.1f} ms (once per fetch)")
+    print(f"vectorized aggs:  {vector * 1000:8.1f} ms")
+    print(f"python loop aggs: {loops * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
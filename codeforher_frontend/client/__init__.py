@@ -1,3 +1,9 @@
 from client.client import AgentClient, AgentClientError
+from client.guardian_lane import GuardianLaneClient, GuardianLaneClientError
 
-__all__ = ["AgentClient", "AgentClientError"]
+__all__ = [
+    "AgentClient",
+    "AgentClientError",
+    "GuardianLaneClient",
+    "GuardianLaneClientError",
+]
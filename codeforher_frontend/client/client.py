@@ -1,10 +1,15 @@
 import json
 import os
+import threading
+import time
 from collections.abc import AsyncGenerator, Generator
+from contextlib import asynccontextmanager
 from typing import Any
 
 import httpx
 
+from client.guardian_lane import LabeledCounter, LatencyHistogram
+from client.tracing import RequestTrace, SpanSink
 from schema import (ChatHistory, ChatHistoryInput, ChatMessage, Feedback,
                     ServiceMetadata, StreamInput, UserInput)
 
@@ -22,6 +27,12 @@ class AgentClient:
         agent: str = None,
         timeout: float | None = None,
         get_info: bool = True,
+        http_client: httpx.Client | None = None,
+        async_http_client: httpx.AsyncClient | None = None,
+        latency: dict[str, LatencyHistogram] | None = None,
+        requests: LabeledCounter | None = None,
+        tokens: LabeledCounter | None = None,
+        spans: SpanSink | None = None,
     ) -> None:
         """
         Initialize the client.
@@ -32,10 +43,31 @@ class AgentClient:
             timeout (float, optional): The timeout for requests.
             get_info (bool, optional): Whether to fetch agent information on init.
                 Default: True
+            http_client (httpx.Client, optional): Shared connection pool for
+                synchronous calls. A new connection is made per call if not given.
+            async_http_client (httpx.AsyncClient, optional): Shared connection pool
+                for async calls. Must only be used from the event loop that owns it.
+            latency (dict, optional): Per-endpoint latency histograms to record
+                into, to share them between clients. Streams are recorded
+                twice: to the first event (``/stream:first``) and in full.
+            requests (LabeledCounter, optional): Counts of requests by
+                `(endpoint, status)`, where status is the HTTP status code or
+                ``"error"`` when no response arrived.
+            tokens (LabeledCounter, optional): Count of streamed tokens by agent.
+            spans (callable, optional): Receives a client span for each request,
+                with time to first token and the `run_id` for streams. Every
+                request carries a W3C `traceparent` header either way.
         """
         self.base_url = base_url
         self.auth_secret = os.getenv("AUTH_SECRET")
         self.timeout = timeout
+        self.http_client = http_client
+        self.async_http_client = async_http_client
+        self.latency: dict[str, LatencyHistogram] = {} if latency is None else latency
+        self.requests = requests
+        self.tokens = tokens
+        self.spans = spans
+        self._lock = threading.Lock()
         self.info: ServiceMetadata | None = None
         self.agent: str | None = None
         if get_info:
@@ -50,16 +82,60 @@ class AgentClient:
             headers["Authorization"] = f"Bearer {self.auth_secret}"
         return headers
 
+    @property
+    def _http(self):
+        # The httpx module offers the same get/post/stream functions as a Client
+        return self.http_client or httpx
+
+    @asynccontextmanager
+    async def _async_http(self) -> AsyncGenerator[httpx.AsyncClient, None]:
+        if self.async_http_client is not None:
+            yield self.async_http_client
+            return
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            yield client
+
+    def _observe(self, endpoint: str, start: float) -> None:
+        if endpoint not in self.latency:
+            with self._lock:
+                self.latency.setdefault(endpoint, LatencyHistogram())
+        self.latency[endpoint].observe(time.perf_counter() - start)
+
+    def _record(
+        self, endpoint: str, start: float, status: int | str, trace: RequestTrace, **attrs: Any
+    ) -> None:
+        """Observe a request's latency, count its status and finish its span."""
+        self._observe(endpoint, start)
+        if self.requests is not None:
+            self.requests.inc(endpoint, str(status))
+        trace.finish(self.spans, status, service="agent", endpoint=endpoint, **attrs)
+
+    def _send_args(self, trace: RequestTrace, is_async: bool = False) -> dict[str, Any]:
+        """Headers and extensions sending `trace` along with a request."""
+        args: dict[str, Any] = {"headers": {**self._headers, **trace.headers}}
+        # The module-level httpx functions take no extensions, so requests
+        # without a pool get the traceparent header but no connect timings
+        if is_async:
+            args["extensions"] = {"trace": trace.atrace}
+        elif self.http_client is not None:
+            args["extensions"] = {"trace": trace.trace}
+        return args
+
     def retrieve_info(self) -> None:
+        start, status = time.perf_counter(), "error"
+        trace = RequestTrace("GET /info")
         try:
-            response = httpx.get(
+            response = self._http.get(
                 f"{self.base_url}/info",
-                headers=self._headers,
+                **self._send_args(trace),
                 timeout=self.timeout,
             )
+            status = response.status_code
             response.raise_for_status()
         except httpx.HTTPError as e:
             raise AgentClientError(f"Error getting service info: {e}")
+        finally:
+            self._record("/info", start, status, trace)
 
         self.info: ServiceMetadata = ServiceMetadata.model_validate(response.json())
         if not self.agent or self.agent not in [a.key for a in self.info.agents]:
@@ -106,17 +182,22 @@ class AgentClient:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
-        async with httpx.AsyncClient() as client:
+        start, status = time.perf_counter(), "error"
+        trace = RequestTrace("POST /invoke")
+        async with self._async_http() as client:
             try:
                 response = await client.post(
                     f"{self.base_url}/{self.agent}/invoke",
                     json=request.model_dump(),
-                    headers=self._headers,
+                    **self._send_args(trace, is_async=True),
                     timeout=self.timeout,
                 )
+                status = response.status_code
                 response.raise_for_status()
             except httpx.HTTPError as e:
                 raise AgentClientError(f"Error: {e}")
+            finally:
+                self._record("/invoke", start, status, trace)
 
         return ChatMessage.model_validate(response.json())
 
@@ -150,16 +231,21 @@ class AgentClient:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
+        start, status = time.perf_counter(), "error"
+        trace = RequestTrace("POST /invoke")
         try:
-            response = httpx.post(
+            response = self._http.post(
                 f"{self.base_url}/{self.agent}/invoke",
                 json=request.model_dump(),
-                headers=self._headers,
+                **self._send_args(trace),
                 timeout=self.timeout,
             )
+            status = response.status_code
             response.raise_for_status()
         except httpx.HTTPError as e:
             raise AgentClientError(f"Error: {e}")
+        finally:
+            self._record("/invoke", start, status, trace)
 
         return ChatMessage.model_validate(response.json())
 
@@ -224,23 +310,47 @@ class AgentClient:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
+        start, status = time.perf_counter(), "error"
+        trace = RequestTrace("POST /stream")
+        first = True
+        first_token, tokens, run_id = None, 0, None
         try:
-            with httpx.stream(
+            with self._http.stream(
                 "POST",
                 f"{self.base_url}/{self.agent}/stream",
                 json=request.model_dump(),
-                headers=self._headers,
+                **self._send_args(trace),
                 timeout=self.timeout,
             ) as response:
+                status = response.status_code
                 response.raise_for_status()
                 for line in response.iter_lines():
                     if line.strip():
                         parsed = self._parse_stream_line(line)
                         if parsed is None:
                             break
+                        if first:
+                            self._observe("/stream:first", start)
+                            first = False
+                        if isinstance(parsed, str):
+                            if first_token is None:
+                                first_token = time.perf_counter() - start
+                            tokens += 1
+                            if self.tokens is not None:
+                                self.tokens.inc(self.agent)
+                        elif isinstance(parsed, ChatMessage) and parsed.run_id:
+                            run_id = parsed.run_id
                         yield parsed
         except httpx.HTTPError as e:
+            if not isinstance(e, httpx.HTTPStatusError):
+                # Failed mid-stream, after a good status
+                status = "error"
             raise AgentClientError(f"Error: {e}")
+        finally:
+            self._record(
+                "/stream", start, status, trace,
+                first_token=first_token, tokens=tokens, run_id=run_id,
+            )
 
     async def astream(
         self,
@@ -279,24 +389,48 @@ class AgentClient:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
-        async with httpx.AsyncClient() as client:
+        start, status = time.perf_counter(), "error"
+        trace = RequestTrace("POST /stream")
+        first = True
+        first_token, tokens, run_id = None, 0, None
+        async with self._async_http() as client:
             try:
                 async with client.stream(
                     "POST",
                     f"{self.base_url}/{self.agent}/stream",
                     json=request.model_dump(),
-                    headers=self._headers,
+                    **self._send_args(trace, is_async=True),
                     timeout=self.timeout,
                 ) as response:
+                    status = response.status_code
                     response.raise_for_status()
                     async for line in response.aiter_lines():
                         if line.strip():
                             parsed = self._parse_stream_line(line)
                             if parsed is None:
                                 break
+                            if first:
+                                self._observe("/stream:first", start)
+                                first = False
+                            if isinstance(parsed, str):
+                                if first_token is None:
+                                    first_token = time.perf_counter() - start
+                                tokens += 1
+                                if self.tokens is not None:
+                                    self.tokens.inc(self.agent)
+                            elif isinstance(parsed, ChatMessage) and parsed.run_id:
+                                run_id = parsed.run_id
                             yield parsed
             except httpx.HTTPError as e:
+                if not isinstance(e, httpx.HTTPStatusError):
+                    # Failed mid-stream, after a good status
+                    status = "error"
                 raise AgentClientError(f"Error: {e}")
+            finally:
+                self._record(
+                    "/stream", start, status, trace,
+                    first_token=first_token, tokens=tokens, run_id=run_id,
+                )
 
     async def acreate_feedback(
         self, run_id: str, key: str, score: float, kwargs: dict[str, Any] = {}
@@ -309,18 +443,23 @@ class AgentClient:
         See: https://api.smith.langchain.com/redoc#tag/feedback/operation/create_feedback_api_v1_feedback_post
         """
         request = Feedback(run_id=run_id, key=key, score=score, kwargs=kwargs)
-        async with httpx.AsyncClient() as client:
+        start, status = time.perf_counter(), "error"
+        trace = RequestTrace("POST /feedback")
+        async with self._async_http() as client:
             try:
                 response = await client.post(
                     f"{self.base_url}/feedback",
                     json=request.model_dump(),
-                    headers=self._headers,
+                    **self._send_args(trace, is_async=True),
                     timeout=self.timeout,
                 )
+                status = response.status_code
                 response.raise_for_status()
                 response.json()
             except httpx.HTTPError as e:
                 raise AgentClientError(f"Error: {e}")
+            finally:
+                self._record("/feedback", start, status, trace, run_id=run_id)
 
     def get_history(
         self,
@@ -333,15 +472,20 @@ class AgentClient:
             thread_id (str, optional): Thread ID for identifying a conversation
         """
         request = ChatHistoryInput(thread_id=thread_id)
+        start, status = time.perf_counter(), "error"
+        trace = RequestTrace("POST /history")
         try:
-            response = httpx.post(
+            response = self._http.post(
                 f"{self.base_url}/history",
                 json=request.model_dump(),
-                headers=self._headers,
+                **self._send_args(trace),
                 timeout=self.timeout,
             )
+            status = response.status_code
             response.raise_for_status()
         except httpx.HTTPError as e:
             raise AgentClientError(f"Error: {e}")
+        finally:
+            self._record("/history", start, status, trace)
 
         return ChatHistory.model_validate(response.json())
@@ -0,0 +1,520 @@
+import asyncio
+import bisect
+import gzip
+import json
+import os
+import threading
+import time
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import httpx
+
+from client.tracing import RequestTrace, SpanSink
+
+DEFAULT_BASE_URL = os.getenv("BACKEND_URL", "http://localhost:8080/api")
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+RETRY_STATUSES = {502, 503, 504}
+# Idle pooled connections are kept this long (seconds) before being closed
+KEEPALIVE_EXPIRY = 60.0
+POOL_LIMITS = httpx.Limits(
+    max_connections=100, max_keepalive_connections=20, keepalive_expiry=KEEPALIVE_EXPIRY
+)
+
+
+def make_http_client(base_url: str, timeout: float = 10.0, retries: int = 2) -> httpx.Client:
+    """Connection pool for synchronous backend calls."""
+    return httpx.Client(
+        base_url=base_url,
+        timeout=timeout,
+        transport=httpx.HTTPTransport(retries=retries, limits=POOL_LIMITS),
+    )
+
+
+def make_async_http_client(
+    base_url: str, timeout: float = 10.0, retries: int = 2
+) -> httpx.AsyncClient:
+    """Connection pool for async backend calls, bound to the loop that first uses it."""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=timeout,
+        transport=httpx.AsyncHTTPTransport(retries=retries, limits=POOL_LIMITS),
+    )
+
+
+class GuardianLaneClientError(Exception):
+    def __init__(self, message: str, status_code: int | None = None, detail: Any = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, safe to update from several threads."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile."""
+        with self._lock:
+            target = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                if count and seen >= target:
+                    return bound
+        return 0.0
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "count": self.count,
+                "mean": self.total / self.count if self.count else 0.0,
+                "buckets": dict(zip(self.buckets, self.counts)),
+            }
+
+
+class LabeledCounter:
+    """Monotonic counts keyed by label values, safe to update from several threads."""
+
+    def __init__(self) -> None:
+        self.values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def snapshot(self) -> dict[tuple[str, ...], float]:
+        with self._lock:
+            return dict(self.values)
+
+
+class GuardianLaneClient:
+    """Client for the Guardian Lane backend API."""
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        token: dict | None = None,
+        timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 0.3,
+        http_client: httpx.Client | None = None,
+        async_http_client: httpx.AsyncClient | None = None,
+        latency: dict[str, LatencyHistogram] | None = None,
+        requests: LabeledCounter | None = None,
+        spans: SpanSink | None = None,
+    ) -> None:
+        """
+        Initialize the client.
+
+        Args:
+            base_url (str): The base URL of the backend API.
+            token (dict, optional): Login response holding `access_token` and `user_id`.
+            timeout (float, optional): Default timeout for requests, in seconds.
+            retries (int, optional): Retries for failed connections, and for GET
+                requests answered with 502/503/504.
+            backoff (float, optional): Base delay between retries, doubled each attempt.
+            http_client (httpx.Client, optional): Shared pool for synchronous calls,
+                created on first use if not given.
+            async_http_client (httpx.AsyncClient, optional): Shared pool for async
+                calls. Must only be used from the event loop that owns it; if not
+                given, a pool is created per event loop.
+            latency (dict, optional): Per-endpoint latency histograms to record
+                into, to share them between clients.
+            requests (LabeledCounter, optional): Counts of request attempts by
+                `(endpoint, status)`, where status is the HTTP status code or
+                ``"error"`` for a transport error.
+            spans (callable, optional): Receives a client span for each request
+                attempt. Every request carries a W3C `traceparent` header
+                whether or not spans are collected.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.latency: dict[str, LatencyHistogram] = {} if latency is None else latency
+        self.requests = requests
+        self.spans = spans
+        self._client = http_client
+        self._async_client = async_http_client
+        self._shared_async_client = async_http_client is not None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def _headers(self) -> dict[str, str]:
+        headers = {"Accept-Encoding": "gzip"}
+        if self.token and self.token.get("access_token"):
+            headers["Authorization"] = f"Bearer {self.token['access_token']}"
+        return headers
+
+    @property
+    def client(self) -> httpx.Client:
+        """Pooled HTTP client, created on first use."""
+        with self._lock:
+            if self._client is None:
+                self._client = make_http_client(self.base_url, self.timeout, self.retries)
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Pooled async HTTP client for the running event loop."""
+        if self._shared_async_client:
+            return self._async_client
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            # Connections are bound to the loop that opened them
+            self._async_client = make_async_http_client(
+                self.base_url, self.timeout, self.retries
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    def _histogram(self, endpoint: str) -> LatencyHistogram:
+        if endpoint not in self.latency:
+            with self._lock:
+                self.latency.setdefault(endpoint, LatencyHistogram())
+        return self.latency[endpoint]
+
+    def _count(self, endpoint: str, status: int | str) -> None:
+        if self.requests is not None:
+            self.requests.inc(endpoint, str(status))
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response, endpoint: str) -> None:
+        if response.status_code < 400:
+            return
+        try:
+            detail = response.json().get("detail")
+        except (ValueError, AttributeError):
+            detail = None
+        raise GuardianLaneClientError(
+            f"{endpoint} failed with status {response.status_code}: {detail or response.reason_phrase}",
+            status_code=response.status_code,
+            detail=detail,
+        )
+
+    def _should_retry(self, method: str, attempt: int, status: int | None) -> bool:
+        return method == "GET" and attempt < self.retries and (
+            status is None or status in RETRY_STATUSES
+        )
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        endpoint: str | None = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Send a request and record its latency under `endpoint` (defaults to
+        `path`; pass a template such as ``/commute/end-trip/{trip_id}`` for
+        paths with IDs). Raises GuardianLaneClientError for transport errors
+        and 4xx/5xx responses.
+        """
+        endpoint = endpoint or path
+        headers = {**self._headers, **kwargs.pop("headers", {})}
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            trace = RequestTrace(f"{method} {endpoint}")
+            try:
+                response = self.client.request(
+                    method,
+                    path,
+                    headers={**headers, **trace.headers},
+                    extensions={"trace": trace.trace},
+                    **kwargs,
+                )
+            except httpx.HTTPError as e:
+                self._count(endpoint, "error")
+                trace.finish(self.spans, "error", service="backend", endpoint=endpoint)
+                if self._should_retry(method, attempt, None):
+                    time.sleep(self.backoff * 2**attempt)
+                    attempt += 1
+                    continue
+                raise GuardianLaneClientError(f"Error calling {endpoint}: {e}")
+            finally:
+                self._histogram(endpoint).observe(time.perf_counter() - start)
+            self._count(endpoint, response.status_code)
+            trace.finish(
+                self.spans, response.status_code, service="backend", endpoint=endpoint
+            )
+            if self._should_retry(method, attempt, response.status_code):
+                time.sleep(self.backoff * 2**attempt)
+                attempt += 1
+                continue
+            self._raise_for_status(response, endpoint)
+            return response
+
+    async def arequest(
+        self,
+        method: str,
+        path: str,
+        endpoint: str | None = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Async version of `request()`."""
+        endpoint = endpoint or path
+        headers = {**self._headers, **kwargs.pop("headers", {})}
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            trace = RequestTrace(f"{method} {endpoint}")
+            try:
+                response = await self.async_client.request(
+                    method,
+                    path,
+                    headers={**headers, **trace.headers},
+                    extensions={"trace": trace.atrace},
+                    **kwargs,
+                )
+            except httpx.HTTPError as e:
+                self._count(endpoint, "error")
+                trace.finish(self.spans, "error", service="backend", endpoint=endpoint)
+                if self._should_retry(method, attempt, None):
+                    await asyncio.sleep(self.backoff * 2**attempt)
+                    attempt += 1
+                    continue
+                raise GuardianLaneClientError(f"Error calling {endpoint}: {e}")
+            finally:
+                self._histogram(endpoint).observe(time.perf_counter() - start)
+            self._count(endpoint, response.status_code)
+            trace.finish(
+                self.spans, response.status_code, service="backend", endpoint=endpoint
+            )
+            if self._should_retry(method, attempt, response.status_code):
+                await asyncio.sleep(self.backoff * 2**attempt)
+                attempt += 1
+                continue
+            self._raise_for_status(response, endpoint)
+            return response
+
+    # Auth
+
+    def login(self, email: str, password: str) -> dict:
+        """Log in and return the token dict (`access_token`, `user_id`, ...)."""
+        response = self.request(
+            "POST", "/auth/login", json={"email": email, "password": password}
+        )
+        self.token = response.json()
+        return self.token
+
+    async def arefresh_token(self) -> dict:
+        """Exchange the current access token for a fresh one."""
+        response = await self.arequest("POST", "/auth/refresh")
+        return response.json()
+
+    def signup(self, signup_data: dict) -> dict:
+        return self.request("POST", "/auth/signup", json=signup_data).json()
+
+    # Maps
+
+    def geocode(self, address: str) -> dict:
+        """Latitude/longitude of an address."""
+        return self.request(
+            "POST", "/maps/get-latitude-longitude", json={"address": address}
+        ).json()
+
+    async def ageocode(self, address: str) -> dict:
+        response = await self.arequest(
+            "POST", "/maps/get-latitude-longitude", json={"address": address}
+        )
+        return response.json()
+
+    async def aget_time_distance(self, route_request: dict) -> dict:
+        response = await self.arequest(
+            "POST", "/maps/get-time-distance", json=route_request
+        )
+        return response.json()
+
+    async def aget_route(self, route_request: dict) -> dict:
+        response = await self.arequest("POST", "/maps/get-route", json=route_request)
+        return response.json()
+
+    # Route safety
+
+    async def aroute_safety(self, safety_request: dict) -> dict:
+        response = await self.arequest(
+            "POST", "/llm/route-safety", json=safety_request, timeout=60.0
+        )
+        return response.json()
+
+    async def astream_route_safety(
+        self, safety_request: dict
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream lines from `/llm/route-safety/stream`. Raises
+        GuardianLaneClientError (with `status_code` 404/405 when the backend
+        has no streaming endpoint) before the first line on failure.
+        """
+        endpoint = "/llm/route-safety/stream"
+        start = time.perf_counter()
+        trace = RequestTrace(f"POST {endpoint}")
+        status: int | str = "error"
+        try:
+            async with self.async_client.stream(
+                "POST",
+                endpoint,
+                json=safety_request,
+                headers={**self._headers, **trace.headers},
+                timeout=httpx.Timeout(self.timeout, read=60.0),
+                extensions={"trace": trace.atrace},
+            ) as response:
+                status = response.status_code
+                self._count(endpoint, response.status_code)
+                if response.status_code >= 400:
+                    await response.aread()
+                    self._raise_for_status(response, endpoint)
+                async for line in response.aiter_lines():
+                    yield line
+        except httpx.HTTPError as e:
+            self._count(endpoint, "error")
+            status = "error"
+            raise GuardianLaneClientError(f"Error calling {endpoint}: {e}")
+        finally:
+            self._histogram(endpoint).observe(time.perf_counter() - start)
+            trace.finish(self.spans, status, service="backend", endpoint=endpoint)
+
+    # Trips
+
+    def start_trip(self, trip_request: dict) -> dict:
+        return self.request("POST", "/commute/start-trip", json=trip_request).json()
+
+    def end_trip(self, trip_id: str) -> dict:
+        return self.request(
+            "GET", f"/commute/end-trip/{trip_id}", endpoint="/commute/end-trip/{trip_id}"
+        ).json()
+
+    def cancel_trip(self, trip_id: str) -> dict:
+        return self.request(
+            "GET",
+            f"/commute/cancel-trip/{trip_id}",
+            endpoint="/commute/cancel-trip/{trip_id}",
+        ).json()
+
+    def get_trips(
+        self, user_id: str, updated_since: str | None = None, etag: str | None = None
+    ) -> tuple[list | dict | None, str | None]:
+        """
+        Fetch a user's trips, optionally only those changed since
+        `updated_since`. Returns `(trips, etag)`; `trips` is None when the
+        backend answers `304 Not Modified` for `etag`.
+        """
+        params = {"user_id": user_id}
+        if updated_since:
+            params["updated_since"] = updated_since
+        headers = {"If-None-Match": etag} if etag else {}
+        response = self.request("GET", "/commute/trips", params=params, headers=headers)
+        if response.status_code == 304:
+            return None, etag
+        return response.json(), response.headers.get("ETag")
+
+    async def aupload_track(self, trip_id: str, batch: dict) -> dict:
+        """Upload a batch of location fixes for a trip, gzip-compressed."""
+        response = await self.arequest(
+            "POST",
+            f"/commute/track/{trip_id}",
+            endpoint="/commute/track/{trip_id}",
+            content=gzip.compress(json.dumps(batch, separators=(",", ":")).encode()),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        return response.json()
+
+    # Users and emergencies
+
+    def get_user(self) -> dict:
+        """Profile of the logged-in user, including emergency contacts."""
+        return self.request("GET", "/users/get-users").json()
+
+    async def aget_user(self) -> dict:
+        response = await self.arequest("GET", "/users/get-users")
+        return response.json()
+
+    @staticmethod
+    def idempotency_headers(key: str | None) -> dict[str, str]:
+        return {"Idempotency-Key": key} if key else {}
+
+    def send_sos(
+        self,
+        sos_request: dict,
+        timeout: float | None = None,
+        idempotency_key: str | None = None,
+    ) -> dict:
+        return self.request(
+            "POST",
+            "/sos/send-alert",
+            json=sos_request,
+            timeout=timeout or self.timeout,
+            headers=self.idempotency_headers(idempotency_key),
+        ).json()
+
+    async def asend_sos(
+        self,
+        sos_request: dict,
+        timeout: float | None = None,
+        idempotency_key: str | None = None,
+    ) -> dict:
+        response = await self.arequest(
+            "POST",
+            "/sos/send-alert",
+            json=sos_request,
+            timeout=timeout or self.timeout,
+            headers=self.idempotency_headers(idempotency_key),
+        )
+        return response.json()
+
+    def emergency_message(self, contact_id: str, message: str) -> dict:
+        """`/emergency/send-message` payload for the logged-in user."""
+        return {
+            "user_id": self.token["user_id"],
+            "contact_id": contact_id,
+            "message": message,
+        }
+
+    def send_emergency_message(
+        self,
+        contact_id: str,
+        message: str,
+        timeout: float | None = None,
+        idempotency_key: str | None = None,
+    ) -> dict:
+        return self.request(
+            "POST",
+            "/emergency/send-message",
+            json=self.emergency_message(contact_id, message),
+            timeout=timeout or self.timeout,
+            headers=self.idempotency_headers(idempotency_key),
+        ).json()
+
+    async def asend_emergency_message(
+        self,
+        contact_id: str,
+        message: str,
+        timeout: float | None = None,
+        idempotency_key: str | None = None,
+    ) -> dict:
+        response = await self.arequest(
+            "POST",
+            "/emergency/send-message",
+            json=self.emergency_message(contact_id, message),
+            timeout=timeout or self.timeout,
+            headers=self.idempotency_headers(idempotency_key),
+        )
+        return response.json()
@@ -0,0 +1,92 @@
+import os
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+# Receives each finished client span as a dict, e.g. an exporter's `export`
+SpanSink = Callable[[dict[str, Any]], None]
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """A span's identity in a W3C trace: 16-byte trace ID, 8-byte span ID, in hex."""
+
+    trace_id: str
+    span_id: str
+
+    @classmethod
+    def new_trace(cls) -> "SpanContext":
+        return cls(os.urandom(16).hex(), os.urandom(8).hex())
+
+    def child(self) -> "SpanContext":
+        return SpanContext(self.trace_id, os.urandom(8).hex())
+
+    @property
+    def traceparent(self) -> str:
+        """The `traceparent` header value, sampled."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+# The span being timed, parent of the requests sent within it. Context
+# variables follow coroutines onto `BackgroundLoop`, so requests sent from
+# the background loop still find the page span that started them.
+current_span: ContextVar[SpanContext | None] = ContextVar("current_span", default=None)
+
+
+class RequestTrace:
+    """
+    Client span of one outgoing request: a child of the current span (or
+    the root of a new trace), sent along in the `traceparent` header, with
+    connect and time-to-first-byte read from httpcore's trace events. A
+    request on a pooled connection has no connect time.
+    """
+
+    def __init__(self, name: str) -> None:
+        parent = current_span.get()
+        self.name = name
+        self.context = parent.child() if parent else SpanContext.new_trace()
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.perf_counter()
+        self.connect: float | None = None
+        self.first_byte: float | None = None
+        self._connect_started: float | None = None
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {"traceparent": self.context.traceparent}
+
+    def trace(self, event: str, info: dict) -> None:
+        """httpcore `trace` extension callback, for sync clients."""
+        now = time.perf_counter()
+        if event == "connection.connect_tcp.started":
+            self._connect_started = now
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            if self._connect_started is not None:
+                self.connect = now - self._connect_started
+        elif event.endswith("receive_response_headers.complete") and self.first_byte is None:
+            self.first_byte = now - self.start
+
+    async def atrace(self, event: str, info: dict) -> None:
+        """httpcore `trace` extension callback, for async clients."""
+        self.trace(event, info)
+
+    def finish(self, sink: SpanSink | None, status: int | str, **attrs: Any) -> None:
+        """Hand the finished span, with `attrs`, to `sink`."""
+        if sink is None:
+            return
+        record = {
+            "ts": time.time(),
+            "name": self.name,
+            "duration": time.perf_counter() - self.start,
+            "kind": "client",
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_span_id": self.parent_id,
+            "status": status,
+            "connect": self.connect,
+            "first_byte": self.first_byte,
+            **attrs,
+        }
+        sink(record)
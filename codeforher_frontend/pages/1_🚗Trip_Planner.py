@@ -1,18 +1,16 @@
 import streamlit as st
-import requests
-import folium
-from streamlit_folium import st_folium
 from streamlit_extras.switch_page_button import switch_page
 import time
-import polyline
-import asyncio
-import aiohttp
-from datetime import datetime, timedelta
-from typing import List
-from pydantic import BaseModel
 
-# Base URL of your FastAPI backend
-BASE_URL = "http://localhost:8080/api"
+from client import GuardianLaneClientError
+from utils.address_index import address_input
+from utils.backend import get_backend_client
+from utils.instrumentation import end_run, instrumentation, span, start_run
+from utils.resources import get_resources
+from utils.route_pipeline import route_sections, route_steps_of
+from utils.session import end_session, require_login
+from utils.templates import render_cached, route_steps_html, safety_insights_html
+from utils.theme import apply_theme
 
 # Page config
 st.set_page_config(
@@ -21,112 +19,13 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-
-# Custom CSS for better styling
-st.markdown("""
-    <style>
-    .stButton>button {
-        width: 100%;
-        margin-top: 10px;
-        background-color: #FF4B4B;
-        color: white;
-        border: none;
-        padding: 10px 20px;
-        border-radius: 5px;
-        font-weight: bold;
-    }
-    .stButton>button:hover {
-        background-color: #FF6B6B;
-    }
-    .stTextInput>div>div>input {
-        border-radius: 5px;
-    }
-    .map-container {
-        border-radius: 10px;
-        overflow: hidden;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    .trip-details {
-        background-color: #f8f9fa;
-        padding: 20px;
-        border-radius: 10px;
-        margin-top: 20px;
-    }
-    .directions-container {
-        background-color: white;
-        border-radius: 10px;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        overflow-y: auto;
-    }
-    .direction-step {
-        padding: 10px;
-        border-bottom: 1px solid #eee;
-        display: flex;
-        align-items: center;
-        gap: 10px;
-    }
-    .direction-step:last-child {
-        border-bottom: none;
-    }
-    .step-number {
-        background-color: #FF4B4B;
-        color: white;
-        width: 25px;
-        height: 25px;
-        border-radius: 50%;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-weight: bold;
-    }
-    .step-content {
-        flex-grow: 1;
-    }
-    .step-distance {
-        color: #666;
-        font-size: 0.9em;
-    }
-    .safety-card {
-        background-color: white;
-        border-radius: 10px;
-        padding: 20px;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1rem;
-    }
-    .safety-header {
-        color: #333;
-        font-size: 1.1em;
-        font-weight: 600;
-        margin-bottom: 0.5rem;
-        display: flex;
-        align-items: center;
-        gap: 8px;
-    }
-    .safety-content {
-        color: #555;
-        font-size: 0.95em;
-        line-height: 1.5;
-    }
-    .time-badge {
-        background-color: #FF4B4B;
-        color: white;
-        padding: 4px 12px;
-        border-radius: 15px;
-        font-size: 0.85em;
-        font-weight: 500;
-    }
-    .road-name {
-        font-weight: 500;
-        color: #333;
-    }
-    </style>
-""", unsafe_allow_html=True)
+start_run("planner")
 
 # Check if user is logged in
-if "token" not in st.session_state:
-    st.warning("Please login to access the trip planner.")
-    switch_page("Login")
-    st.stop()
+require_login("Please login to access the trip planner.")
+
+# Shared stylesheet
+apply_theme()
 
 # Initialize session state for trip details
 if "trip_details" not in st.session_state:
@@ -141,7 +40,7 @@ if "route_steps" not in st.session_state:
 # Verify token structure
 if not isinstance(st.session_state.token, dict) or "user_id" not in st.session_state.token:
     st.error("Invalid authentication. Please login again.")
-    st.session_state.clear()
+    end_session()
     switch_page("Login")
     st.stop()
 
@@ -149,75 +48,30 @@ if not isinstance(st.session_state.token, dict) or "user_id" not in st.session_s
 st.title("🚗 Trip Planner")
 st.markdown("Plan your safe commute journey")
 
-# Location Input Section
-st.subheader("Enter Trip Details")
-col1, col2 = st.columns(2)
+# Seconds to wait for another session's route load to make progress
+ROUTE_WAIT_TIMEOUT = 60
 
-with col1:
-    source = st.text_input("Start Location", placeholder="Enter starting point", key="source")
-with col2:
-    destination = st.text_input("End Location", placeholder="Enter destination", key="destination")
+def cached_route_sections(route_key):
+    """Sections fetched so far for a route, or an empty dict if missing/expired."""
+    return get_resources().routes.sections(route_key)
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def get_coordinates(address):
-    """Cache the geocoding API calls"""
-    response = requests.post(f"{BASE_URL}/maps/get-latitude-longitude", json={"address": address})
-    if response.status_code == 200:
-        return response.json()
-    return None
-
-async def fetch_route_data(session, url, payload):
-    """Async function to fetch route data"""
-    async with session.post(url, json=payload) as response:
-        return await response.json()
-
-async def fetch_all_route_data(source_coords, dest_coords):
-    """Async function to fetch all route data"""
-    async with aiohttp.ClientSession() as session:
-        payload = {
-            "origin": {
-                "latitude": source_coords["latitude"],
-                "longitude": source_coords["longitude"],
-                "address": source
-            },
-            "destination": {
-                "latitude": dest_coords["latitude"],
-                "longitude": dest_coords["longitude"],
-                "address": destination
-            }
-        }
-        
-        tasks = [
-            fetch_route_data(session, f"{BASE_URL}/maps/get-time-distance", payload),
-            fetch_route_data(session, f"{BASE_URL}/maps/get-route", payload)
-        ]
-        
-        results = await asyncio.gather(*tasks)
-        return results
-
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def fetch_route_details():
-    """Cache the complete route details"""
-    if source and destination:
-        try:
-            source_coords = get_coordinates(source)
-            dest_coords = get_coordinates(destination)
-            
-            if source_coords and dest_coords:
-                # Run async function and get results
-                route_data, route_steps = asyncio.run(fetch_all_route_data(source_coords, dest_coords))
-                
-                if route_data and route_steps:
-                    route_data["origin"] = source_coords
-                    route_data["destination"] = dest_coords
-                    return route_data, route_steps
-        except Exception as e:
-            st.error(f"Error fetching route details: {e}")
-    return None, None
+def route_section(route_key, section):
+    """
+    A section of the cached route. If the entry has expired or was dropped
+    (the cache is shared, and a failed load in another session removes it),
+    the whole page reruns to fetch the route again.
+    """
+    data = cached_route_sections(route_key).get(section)
+    if data is None:
+        st.rerun(scope="app")
+    return data
 
 @st.cache_data(ttl=3600)  # Cache for 1 hour
 def create_map(route_data):
     """Cache the map creation"""
+    import folium
+    import polyline
+
     m = folium.Map(
         location=[route_data["origin"]["latitude"], route_data["origin"]["longitude"]],
         zoom_start=13
@@ -248,191 +102,237 @@ def create_map(route_data):
     
     return m
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def get_route_safety_insights(steps):
-    """Cache the safety insights API calls"""
-    try:
-        # Format steps according to RouteStep model
-        formatted_steps = [
-            RouteStep(
-                instructions=step['instructions'],
-                distance=step['readable_distance'],
-                duration=step['readable_duration']
-            ).model_dump()
-            for step in steps
-        ]
-        
-        # Create request payload using RouteSafetyRequest model
-        request_payload = RouteSafetyRequest(route_steps=formatted_steps).model_dump()
-        
-        response = requests.post(
-            f"{BASE_URL}/llm/route-safety",
-            json=request_payload,
-            headers={"Authorization": f"Bearer {st.session_state.token['access_token']}"}
-        )
-        if response.status_code == 200:
-            return response.json()
-        return None
-    except Exception as e:
-        st.error(f"Error getting safety insights: {e}")
-        return None
-
-# Function to display route steps
+# Each section is rendered into a single HTML block (one element per rerun
+# instead of one per step/card), cached by content
 def display_route_steps(route_steps):
-    if route_steps and "routes" in route_steps and route_steps["routes"]:
-        steps = route_steps["routes"][0]["legs"][0]["steps"]
-        st.markdown("### Turn-by-Turn Directions")
-        st.markdown('<div class="directions-container">', unsafe_allow_html=True)
-        
-        for i, step in enumerate(steps, 1):
-            st.markdown(f"""
-                <div class="direction-step">
-                    <div class="step-number">{i}</div>
-                    <div class="step-content">
-                        <div>{step['instructions']}</div>
-                        <div class="step-distance">{step['readable_distance']} • {step['readable_duration']}</div>
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-
-# Add these model classes after the imports
-class RouteStep(BaseModel):
-    instructions: str
-    distance: str
-    duration: str
-
-class RouteSafetyRequest(BaseModel):
-    route_steps: List[RouteStep]
-
-# Add this function to display safety insights
+    steps = route_steps_of(route_steps)
+    if steps:
+        with span("planner.directions"):
+            st.markdown(render_cached(route_steps_html, steps), unsafe_allow_html=True)
+
 def display_safety_insights(safety_data):
-    st.markdown("### 🛡️ Trip Safety Insights")
-    
-    # General Insights
-    st.markdown('<div class="safety-card">', unsafe_allow_html=True)
-    st.markdown('<div class="safety-header">📍 Route Overview</div>', unsafe_allow_html=True)
-    st.markdown(f'<div class="safety-content">{safety_data["general_insights"]}</div>', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Safety Tips by Time
-    st.markdown('<div class="safety-card">', unsafe_allow_html=True)
-    st.markdown('<div class="safety-header">⏰ Time-based Safety Tips</div>', unsafe_allow_html=True)
-    cols = st.columns(2)
-    times = list(safety_data["safety_tips"].items())
-    for i, (time, tip) in enumerate(times):
-        with cols[i % 2]:
-            st.markdown(f'<div style="margin-bottom: 1rem;">', unsafe_allow_html=True)
-            st.markdown(f'<span class="time-badge">{time.upper()}</span>', unsafe_allow_html=True)
-            st.markdown(f'<div class="safety-content" style="margin-top: 0.5rem;">{tip}</div>', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Road Conditions
-    st.markdown('<div class="safety-card">', unsafe_allow_html=True)
-    st.markdown('<div class="safety-header">🛣️ Road Conditions</div>', unsafe_allow_html=True)
-    for road, condition in safety_data["road_conditions"].items():
-        st.markdown(f'<div style="margin-bottom: 0.8rem;">', unsafe_allow_html=True)
-        st.markdown(f'<span class="road-name">{road}</span>', unsafe_allow_html=True)
-        st.markdown(f'<div class="safety-content">{condition}</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Areas of Concern
-    st.markdown('<div class="safety-card">', unsafe_allow_html=True)
-    st.markdown('<div class="safety-header">⚠️ Areas of Concern</div>', unsafe_allow_html=True)
-    for area, concern in safety_data["areas_of_concern"].items():
-        st.markdown(f'<div style="margin-bottom: 0.8rem;">', unsafe_allow_html=True)
-        st.markdown(f'<span class="road-name">{area}</span>', unsafe_allow_html=True)
-        st.markdown(f'<div class="safety-content">{concern}</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+    with span("planner.safety_insights"):
+        st.markdown(render_cached(safety_insights_html, safety_data), unsafe_allow_html=True)
+
+# The page is split into fragments so a widget interaction only reruns the
+# section it belongs to. Each route section takes the (source, destination)
+# route_key as its dependency and looks the route up in the cache by it; only
+# a change of route_key reruns the whole app.
+def route_key_of(source, destination):
+    return (source.strip(), destination.strip())
+
+@st.fragment
+def trip_inputs():
+    """Start/End inputs; triggers a full rerun only when the route changes."""
+    st.subheader("Enter Trip Details")
+    col1, col2 = st.columns(2)
+    # Suggestions follow the typing; the route is only looked up once both
+    # addresses are committed
+    book, user_id = get_resources().addresses, st.session_state.token["user_id"]
+    with col1:
+        source = address_input(
+            "Start Location", "source", book, user_id, placeholder="Enter starting point"
+        )
+    with col2:
+        destination = address_input(
+            "End Location", "destination", book, user_id, placeholder="Enter destination"
+        )
+
+    route_key = route_key_of(source, destination) if source and destination else None
+    if route_key != st.session_state.get("route_key"):
+        st.session_state.route_key = route_key
+        st.rerun(scope="app")
+
+def trip_metrics(route_key):
+    route_data = route_section(route_key, "route")
+    st.markdown("### Trip Details")
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.metric("Distance", f"{route_data['distance']/1000:.1f} km")  # Convert meters to km
+    with col2:
+        st.metric("Duration", f"{route_data['duration']/60:.0f} mins")  # Convert seconds to minutes
+    with col3:
+        st.metric("Estimated Arrival", time.strftime("%I:%M %p", time.localtime(time.time() + route_data['duration'])))
+
+@st.fragment
+def route_map(route_key):
+    from streamlit_folium import st_folium
+
+    st.markdown("### Route Map")
+    route_data = route_section(route_key, "route")
+    with span("planner.map_build"):
+        st.session_state.route_map = create_map(route_data)
+    with st.container():
+        st.markdown('<div class="map-container">', unsafe_allow_html=True)
+        # Map pans/zooms stay in the browser instead of triggering reruns
+        with span("planner.map_render"):
+            st_folium(
+                st.session_state.route_map,
+                width=800,
+                height=400,
+                key="route_map",
+                returned_objects=[],
+            )
     st.markdown('</div>', unsafe_allow_html=True)
 
+@st.fragment
+def route_directions(route_key):
+    display_route_steps(route_section(route_key, "steps"))
+
+@st.fragment
+def route_safety_insights(route_key):
+    sections = cached_route_sections(route_key)
+    safety_insights = sections.get("insights") or sections.get("insights_partial")
+    if safety_insights:
+        display_safety_insights(safety_insights)
+
+# Pipeline section -> views it feeds, in the order the views are laid out
+SECTION_VIEWS = {
+    "route": ("metrics", "map"),
+    "steps": ("directions",),
+    "insights_partial": ("insights",),
+    "insights": ("insights",),
+}
+ROUTE_VIEWS = {
+    "metrics": trip_metrics,
+    "map": route_map,
+    "directions": route_directions,
+    "insights": route_safety_insights,
+}
+
+def render_section(section, route_key, slots):
+    for view in SECTION_VIEWS[section]:
+        with slots[view].container():
+            ROUTE_VIEWS[view](route_key)
+
+def load_route_progressively(route_key, slots):
+    """
+    Fetch a route, drawing each section into its slot as soon as it arrives.
+    If another session is already fetching the same route, its sections are
+    drawn as that load receives them instead.
+    """
+    routes = get_resources().routes
+    entry, must_load = routes.claim(route_key)
+    if must_load:
+        fetch_route(route_key, entry, slots)
+    else:
+        follow_route(route_key, entry, slots)
+    if not entry.sections.get("insights"):
+        slots["insights"].empty()
+
+def fetch_route(route_key, entry, slots):
+    ok = False
+    started = time.perf_counter()
+    try:
+        for section, data in get_resources().loop.iterate(route_sections(
+            get_backend_client(),
+            *route_key,
+            insights_cache=get_resources().insights,
+            addresses=get_resources().addresses,
+        )):
+            if section not in entry.sections:
+                # Time from the request to each section's first data
+                instrumentation.record(f"planner.route_fetch.{section}", time.perf_counter() - started)
+            entry.add(section, data)
+            if section == "route" and not data:
+                break
+            if data:
+                render_section(section, route_key, slots)
+        entry.sections.pop("insights_partial", None)
+        ok = bool(entry.sections.get("route") and entry.sections.get("steps"))
+        if ok:
+            entry.add("complete", True)
+    finally:
+        # Also when the run is stopped, so sessions following this load
+        # aren't left waiting and a failed route is fetched again next time
+        get_resources().routes.finish(route_key, entry, ok)
+
+def follow_route(route_key, entry, slots):
+    drawn = {}
+    version = -1
+    while not entry.done:
+        if not entry.wait(version, timeout=ROUTE_WAIT_TIMEOUT):
+            break
+        version = entry.version
+        for section, data in list(entry.sections.items()):
+            if section in SECTION_VIEWS and data and drawn.get(section) is not data:
+                drawn[section] = data
+                render_section(section, route_key, slots)
+
+@st.fragment
+def start_trip(route_key):
+    if st.session_state.is_trip_started:
+        return
+    if st.button("Start Trip", key="start_trip", type="primary"):
+        source, destination = route_key
+        route_data = route_section(route_key, "route")
+        try:
+            if not isinstance(st.session_state.token, dict) or "user_id" not in st.session_state.token:
+                st.error("Authentication error. Please login again.")
+                end_session()
+                switch_page("Login")
+                st.stop()
+
+            # Copies: the route's own dicts are shared by every session
+            start_location = {**route_data["origin"], "address": source}
+            end_location = {**route_data["destination"], "address": destination}
+
+            # Call backend to start trip
+            trip_data = get_backend_client().start_trip({
+                "user_id": st.session_state.token["user_id"],
+                "start_location": start_location,
+                "end_location": end_location,
+                "distance": route_data["distance"],
+                "duration": route_data["duration"]
+            })
+            st.session_state.is_trip_started = True
+            st.session_state.trip_id = trip_data["trip_id"]  # Store trip_id in session state
+            # Offer these addresses first next time
+            user_id = st.session_state.token["user_id"]
+            for location in (start_location, end_location):
+                get_resources().addresses.record(user_id, location["address"], location)
+            st.success("Trip started successfully!")
+            time.sleep(2)
+            switch_page("Active_Trip")
+        except GuardianLaneClientError:
+            st.error("❌ Failed to start trip. Please try again.")
+        except Exception as e:
+            st.error(f"Error starting trip: {e}")
+            st.error("Please try logging in again.")
+            end_session()
+            switch_page("Login")
+
+trip_inputs()
+
 # Fetch and display route details when both locations are entered
-if source and destination:
-    with st.spinner("Fetching route details..."):
-        route_data, route_steps = fetch_route_details()
-        if route_data:
-            st.session_state.trip_details = route_data
-            st.session_state.route_steps = route_steps
-            
-            # Display trip details
-            st.markdown("### Trip Details")
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.metric("Distance", f"{route_data['distance']/1000:.1f} km")  # Convert meters to km
-            with col2:
-                st.metric("Duration", f"{route_data['duration']/60:.0f} mins")  # Convert seconds to minutes
-            with col3:
-                st.metric("Estimated Arrival", time.strftime("%I:%M %p", time.localtime(time.time() + route_data['duration'])))
-            
-
-            
-            r1c1, r1c2 = st.columns([4,3])
-            with r1c1:
-                # Display map and directions side by side
-                st.markdown("### Route Map")
-                st.session_state.route_map = create_map(route_data)
-                with st.container():
-                    st.markdown('<div class="map-container">', unsafe_allow_html=True)
-                    st_folium(st.session_state.route_map, width=800, height=400)
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                
-            
-            with r1c2:
-                display_route_steps(route_steps)
-            
-            # Add Safety Insights Section
-            if route_steps and "routes" in route_steps and route_steps["routes"]:
-                steps = route_steps["routes"][0]["legs"][0]["steps"]
-                safety_insights = get_route_safety_insights(steps)
-                if safety_insights:
-                    display_safety_insights(safety_insights)
-            
-            # Start Trip Button
-            if not st.session_state.is_trip_started:
-                if st.button("Start Trip", key="start_trip", type="primary"):
-                    try:
-                        if not isinstance(st.session_state.token, dict) or "user_id" not in st.session_state.token:
-                            st.error("Authentication error. Please login again.")
-                            st.session_state.clear()
-                            switch_page("Login")
-                            st.stop()
-
-                        start_location = route_data["origin"]
-                        start_location["address"] = source
-                        end_location = route_data["destination"]
-                        end_location["address"] = destination
-
-                        # Call backend to start trip
-                        response = requests.post(
-                            f"{BASE_URL}/commute/start-trip",
-                            json={
-                                "user_id": st.session_state.token["user_id"],
-                                "start_location": start_location,
-                                "end_location": end_location,
-                                "distance": route_data["distance"],
-                                "duration": route_data["duration"]
-                            },
-                            headers={"Authorization": f"Bearer {st.session_state.token['access_token']}"}
-                        )
-                        
-                        if response.status_code == 200:
-                            trip_data = response.json()
-                            st.session_state.is_trip_started = True
-                            st.session_state.trip_id = trip_data["trip_id"]  # Store trip_id in session state
-                            st.success("Trip started successfully!")
-                            time.sleep(2)
-                            switch_page("Active_Trip")
-                        else:
-                            st.error("❌ Failed to start trip. Please try again.")
-                    except Exception as e:
-                        st.error(f"Error starting trip: {e}")
-                        st.error("Please try logging in again.")
-                        st.session_state.clear()
-                        switch_page("Login")
-        else:
-            st.error("❌ Could not find route between these locations. Please try different locations.") 
\ No newline at end of file
+route_key = st.session_state.get("route_key")
+if route_key:
+    slots = {"metrics": st.empty()}
+    r1c1, r1c2 = st.columns([4,3])
+    slots["map"] = r1c1.empty()
+    slots["directions"] = r1c2.empty()
+    slots["insights"] = st.empty()
+
+    sections = cached_route_sections(route_key)
+    if sections.get("complete"):
+        for section in ("route", "steps", "insights"):
+            render_section(section, route_key, slots)
+    else:
+        slots["metrics"].info("🔎 Fetching route details...")
+        slots["insights"].info("🛡️ Analysing route safety...")
+        with span("planner.route_fetch"):
+            load_route_progressively(route_key, slots)
+        sections = cached_route_sections(route_key)
+
+    # A trip can only start from a fully fetched route (route and steps)
+    if sections.get("complete"):
+        st.session_state.trip_details = sections["route"]
+        st.session_state.route_steps = sections.get("steps")
+        start_trip(route_key)
+    else:
+        slots["metrics"].empty()
+        slots["insights"].empty()
+        st.error("❌ Could not find route between these locations. Please try different locations.")
+
+end_run()
@@ -1,16 +1,27 @@
+import math
 import streamlit as st
 import requests
-import folium
-from streamlit_folium import folium_static
 from streamlit_extras.switch_page_button import switch_page
 import time
-import polyline
-from datetime import datetime, timezone
 import os
+import uuid
 from dotenv import load_dotenv
 
-# Base URL of your FastAPI backend
-BASE_URL = "http://localhost:8080/api"
+from client import GuardianLaneClientError
+from utils.anomaly import AnomalyDetector, SafetyCheck
+from utils.backend import get_backend_client
+from utils.detour import DEFAULT_SAFE_RADIUS, DetourDetector, RouteIndex
+from utils.geolocation import device_fix
+from utils.instrumentation import end_run, span, start_run, timed
+from utils.location_tracker import LocationTracker, MOVING_INTERVAL
+from utils.outbox import FAILED, PENDING, SENDING, SENT
+from utils.resources import get_resources
+from utils.route_pipeline import route_steps_of
+from utils.session import refresh_session, require_login
+from utils.sos import broadcast_sos as send_sos_alert
+from utils.theme import apply_theme
+from utils.track_buffer import TrackBuffer, upload_track
+from utils.trip_progress import TripProgress
 
 # Page config
 st.set_page_config(
@@ -19,128 +30,73 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded",
 )
-
-# Custom CSS
-st.markdown("""
-    <style>
-    .stButton>button {
-        width: 100%;
-        margin-top: 10px;
-        background-color: #FF4B4B;
-        color: white;
-        border: none;
-        padding: 10px 20px;
-        border-radius: 5px;
-        font-weight: bold;
-    }
-    .stButton>button:hover {
-        background-color: #FF6B6B;
-    }
-    .map-container {
-        border-radius: 10px;
-        overflow: hidden;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1rem;
-    }
-    .trip-details-card {
-        background-color: white;
-        border-radius: 10px;
-        padding: 20px;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1rem;
-    }
-    .emergency-section {
-        background-color: #FFF5F5;
-        border-radius: 10px;
-        padding: 20px;
-        border: 1px solid #FFE5E5;
-        margin-bottom: 1rem;
-    }
-    .sos-button {
-        background-color: #DC3545 !important;
-        color: white !important;
-        font-weight: bold !important;
-        padding: 15px !important;
-        font-size: 1.1em !important;
-    }
-    .sos-button:hover {
-        background-color: #C82333 !important;
-    }
-    .contact-card {
-        background-color: white;
-        border-radius: 8px;
-        padding: 15px;
-        margin-bottom: 10px;
-        border: 1px solid #eee;
-    }
-    .trip-header {
-        color: #333;
-        font-size: 1.2em;
-        font-weight: 600;
-        margin-bottom: 1rem;
-    }
-    .status-badge {
-        background-color: #28A745;
-        color: white;
-        padding: 4px 12px;
-        border-radius: 15px;
-        font-size: 0.9em;
-        font-weight: 500;
-        display: inline-block;
-        margin-left: 10px;
-    }
-    </style>
-""", unsafe_allow_html=True)
+start_run("active_trip")
 
 # Check if user is logged in and has an active trip
-if "token" not in st.session_state:
-    st.warning("Please login to access the active trip page.")
-    switch_page("Login")
-    st.stop()
+require_login("Please login to access the active trip page.")
 
 if not st.session_state.get("is_trip_started", False):
     st.warning("No active trip found. Please start a trip first.")
     switch_page("Trip_Planner")
     st.stop()
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
+# Shared stylesheet
+apply_theme()
+
+@timed("active_trip.user_details")
 def fetch_user_details():
-    """Cache user details API calls"""
+    """The logged-in user's profile, from the shared per-user cache"""
     try:
-        response = requests.get(
-            f"{BASE_URL}/users/get-users",
-            headers={"Authorization": f"Bearer {st.session_state.token['access_token']}"}
+        return get_resources().profiles.get(
+            get_backend_client(), st.session_state.token["user_id"]
         )
-        if response.status_code == 200:
-            return response.json()
-        return None
-    except Exception as e:
-        st.error(f"Error fetching user details: {e}")
+    except GuardianLaneClientError as e:
+        if e.status_code is None:
+            st.error(f"Error fetching user details: {e}")
         return None
 
+def cached_user_details():
+    """The user's profile if it is cached, without waiting on the network"""
+    return get_resources().profiles.cached(st.session_state.token["user_id"]) or fetch_user_details()
+
+def track_delivery(alert_id):
+    """Show an alert's outbox messages in the delivery status panel."""
+    st.session_state.setdefault("outbox_alert_ids", []).append(alert_id)
+
 # Function to send emergency message
 def send_emergency_message(contact_id, message):
-    try:
-        response = requests.post(
-            f"{BASE_URL}/emergency/send-message",
-            json={
-                "user_id": st.session_state.token["user_id"],
-                "contact_id": contact_id,
-                "message": message
-            },
-            headers={"Authorization": f"Bearer {st.session_state.token['access_token']}"}
+    """Send a message through the outbox; it is retried if this attempt fails"""
+    client = get_backend_client()
+    alert_id = uuid.uuid4().hex
+    track_delivery(alert_id)
+    return get_resources().loop.run(
+        get_resources().outbox_sender.send(
+            client,
+            "emergency",
+            contact_id,
+            client.emergency_message(contact_id, message),
+            alert_id,
         )
-        return response.status_code == 200
-    except Exception as e:
-        st.error(f"Error sending message: {e}")
-        return False
+    )
+
+def device_location_data(fix) -> dict:
+    """A browser location fix in the shape of `get_current_location()`'s result"""
+    return {
+        "latitude": fix["latitude"],
+        "longitude": fix["longitude"],
+        "address": f"{fix['latitude']:.5f}, {fix['longitude']:.5f}",
+        "accuracy": fix["accuracy"],
+        "source": "device",
+    }
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
 def get_current_location() -> dict:
-    """Cache current location API calls"""
+    """
+    Look up the server's approximate location from its IP address, for
+    when the browser doesn't share the device's location
+    """
     load_dotenv()
     try:
-        response = requests.get("https://ipinfo.io/json")
+        response = requests.get("https://ipinfo.io/json", timeout=5)
         if response.status_code != 200:
             raise ValueError(f"Failed to get location data: {response.status_code}")
 
@@ -158,6 +114,8 @@ def get_current_location() -> dict:
                 "latitude": lat,
                 "longitude": lon,
                 "address": f"{ip_data.get('city', '')}, {ip_data.get('region', '')}, {ip_data.get('country', '')}",
+                # The server's IP location: no accuracy, and it doesn't follow the traveller
+                "source": "ip",
             }
             return location_data
         else:
@@ -166,155 +124,420 @@ def get_current_location() -> dict:
     except Exception as e:
         raise ValueError(f"Error getting current location: {str(e)}")
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
+def fix_accuracy(location_data) -> float:
+    """
+    Accuracy in metres of a device location fix; NaN for IP-derived fixes,
+    whose error is unknown (often kilometres).
+    """
+    if location_data.get("source") != "device":
+        return math.nan
+    return float(location_data.get("accuracy", "nan"))
+
+def last_known_location():
+    """Most recent location fix in memory, falling back to the trip's start."""
+    location_data = st.session_state.get("last_location")
+    if location_data:
+        return {
+            "latitude": float(location_data["latitude"]),
+            "longitude": float(location_data["longitude"]),
+            "address": location_data["address"]
+        }
+    details = st.session_state.get("trip_details") or {}
+    if "origin" in details:
+        return {
+            "latitude": float(details["origin"]["latitude"]),
+            "longitude": float(details["origin"]["longitude"]),
+            "address": details["origin"].get("address", "")
+        }
+    return None
+
+@timed("active_trip.sos")
 def broadcast_sos(message):
-    """Cache SOS broadcast API calls"""
-    try:
+    """Send an SOS to the backend and every emergency contact (never cached)"""
+    current_location = last_known_location()
+    if not current_location:
+        st.error("Could not determine current location")
+        return None
+
+    user_details = cached_user_details() or {}
+    report = get_resources().loop.run(
+        send_sos_alert(
+            get_backend_client(),
+            get_resources().outbox_sender,
+            current_location,
+            message,
+            user_details.get("emergency_contacts", []),
+        )
+    )
+    track_delivery(report.alert_id)
+    return report
+
+@timed("active_trip.map_build")
+def build_trip_map(details):
+    """Static part of the Active Trip map: start, end and route."""
+    import folium
+    import polyline
+
+    m = folium.Map(
+        location=[float(details["origin"]["latitude"]), float(details["origin"]["longitude"])],
+        zoom_start=13
+    )
+
+    # Add start marker
+    folium.Marker(
+        [float(details["origin"]["latitude"]), float(details["origin"]["longitude"])],
+        popup="Start",
+        icon=folium.Icon(color='green', icon='info-sign')
+    ).add_to(m)
+
+    # Add end marker
+    folium.Marker(
+        [float(details["destination"]["latitude"]), float(details["destination"]["longitude"])],
+        popup="End",
+        icon=folium.Icon(color='red', icon='info-sign')
+    ).add_to(m)
+
+    # Add route line if available
+    if "route" in details:
         try:
-            location_data = get_current_location()
-            current_location = {
-                "latitude": float(location_data["latitude"]),
-                "longitude": float(location_data["longitude"]),
-                "address": location_data["address"]
-            }
-        except Exception as loc_error:
-            st.error(f"Error getting current location: {loc_error}")
-            current_location = None
-            location_address = ""
-            if "trip_details" in st.session_state and "current_location" in st.session_state.trip_details:
-                current_location = {
-                    "latitude": st.session_state.trip_details["current_location"]["latitude"],
-                    "longitude": st.session_state.trip_details["current_location"]["longitude"],
-                    "address": st.session_state.trip_details.get("current_address", "")
-                }
-            elif "route_data" in st.session_state and "routes" in st.session_state.route_data:
-                route = st.session_state.route_data["routes"][0]
-                current_location = {
-                    "latitude": route["legs"][0]["start_location"]["lat"],
-                    "longitude": route["legs"][0]["start_location"]["lng"],
-                    "address": route["legs"][0].get("start_address", "")
-                }
-
-        if not current_location:
-            st.error("Could not determine current location")
-            return False
-
-        sos_payload = {
-            "user_id": st.session_state.token["user_id"],
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "location": current_location,
-            "message": message
-        }
-        
-        response = requests.post(
-            f"{BASE_URL}/sos/send-alert",
-            json=sos_payload,
-            headers={"Authorization": f"Bearer {st.session_state.token['access_token']}"}
+            route_coordinates = polyline.decode(details["route"])
+            folium.PolyLine(
+                route_coordinates,
+                weight=3,
+                color='blue',
+                opacity=0.8
+            ).add_to(m)
+        except Exception as e:
+            st.error(f"Error rendering route: {e}")
+
+    return m
+
+def get_trip_map():
+    """Build the trip map once per trip and reuse it on every refresh."""
+    if st.session_state.get("trip_map_id") != st.session_state.trip_id:
+        st.session_state.route_map = build_trip_map(st.session_state.trip_details)
+        st.session_state.trip_map_id = st.session_state.trip_id
+    return st.session_state.route_map
+
+def get_track_buffer():
+    """The current trip's location history."""
+    buffer = st.session_state.get("track_buffer")
+    if buffer is None or buffer.trip_id != st.session_state.trip_id:
+        buffer = TrackBuffer(st.session_state.trip_id)
+        st.session_state.track_buffer = buffer
+    return buffer
+
+def get_route_index():
+    """Spatial index of the current trip's route, or None without a planned route."""
+    if st.session_state.get("route_index_trip_id") != st.session_state.trip_id:
+        import polyline
+
+        st.session_state.route_index_trip_id = st.session_state.trip_id
+        details = st.session_state.get("trip_details") or {}
+        st.session_state.route_index = (
+            RouteIndex(polyline.decode(details["route"])) if details.get("route") else None
         )
-        
-        return response.status_code == 200
-    except Exception as e:
-        st.error(f"Error broadcasting SOS: {e}")
-        return False
+    return st.session_state.route_index
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def update_active_trip_map():
-    """Update the map with current location and route"""
-    try:
-        # Get current location
-        location_data = get_current_location()
-        if not location_data:
-            return None
-
-        # Create map centered on current location
-        m = folium.Map(
-            location=[float(location_data["latitude"]), float(location_data["longitude"])],
-            zoom_start=13
+def get_detour_detector():
+    """Detour detector for the current trip, or None without a planned route."""
+    if st.session_state.get("detour_trip_id") != st.session_state.trip_id:
+        st.session_state.detour_trip_id = st.session_state.trip_id
+        st.session_state.detour_detector = None
+        if (route := get_route_index()) is not None:
+            preferences = (fetch_user_details() or {}).get("preferences") or {}
+            st.session_state.detour_detector = DetourDetector(
+                route,
+                safe_radius=float(preferences.get("safe_radius") or DEFAULT_SAFE_RADIUS),
+            )
+    return st.session_state.detour_detector
+
+def get_trip_progress():
+    """Progress along the current trip's route, or None without a planned route."""
+    if st.session_state.get("progress_trip_id") != st.session_state.trip_id:
+        st.session_state.progress_trip_id = st.session_state.trip_id
+        st.session_state.trip_progress = None
+        details = st.session_state.get("trip_details") or {}
+        if (route := get_route_index()) is not None and details.get("duration"):
+            st.session_state.trip_progress = TripProgress(
+                route,
+                planned_duration=float(details["duration"]),
+                planned_distance=float(details.get("distance") or 0),
+                steps=route_steps_of(st.session_state.get("route_steps")),
+            )
+    return st.session_state.trip_progress
+
+def check_detour(latitude, longitude, accuracy):
+    # IP-derived fixes (NaN accuracy) can be kilometres off the route
+    if math.isnan(accuracy):
+        return
+    detector = get_detour_detector()
+    if detector and detector.update(latitude, longitude, accuracy):
+        st.session_state.setdefault("detour_alerts", []).append(
+            {"time": time.time(), "distance": detector.distance}
         )
+        st.toast(f"You have left your planned route ({detector.describe_distance()} away)", icon="⚠️")
+
+def get_anomaly_detector():
+    """Stop / speed / backtracking detector for the current trip."""
+    if st.session_state.get("anomaly_trip_id") != st.session_state.trip_id:
+        st.session_state.anomaly_trip_id = st.session_state.trip_id
+        st.session_state.anomaly_detector = AnomalyDetector()
+        st.session_state.anomaly_alerts = []
+        st.session_state.safety_check = None
+    return st.session_state.anomaly_detector
+
+def check_anomalies(latitude, longitude, accuracy):
+    progress = get_trip_progress()
+    current = progress.progress if progress else None
+    anomalies = get_anomaly_detector().update(
+        latitude,
+        longitude,
+        along=current.along if current and current.snapped else None,
+        remaining=current.remaining_distance if current else None,
+        accuracy=accuracy,
+    )
+    for anomaly in anomalies:
+        st.session_state.anomaly_alerts.append(anomaly.message)
+        st.toast(anomaly.message, icon="🚨")
+        check = st.session_state.safety_check
+        if check is None or check.acknowledged or check.escalated:
+            # Only a device fix is trusted enough to send an SOS unanswered
+            st.session_state.safety_check = SafetyCheck(
+                anomaly, auto_escalate=math.isfinite(accuracy)
+            )
+
+@timed("active_trip.location_refresh")
+def refresh_location():
+    """
+    Look up the current location if the tracker says it is time to, record it
+    in the trip's track and upload the track in batches. The browser's
+    location is used while it reports one; the IP lookup is a fallback that
+    can't raise detours, stops or automatic SOS alerts.
+    """
+    tracker = st.session_state.location_tracker
+    buffer = get_track_buffer()
+    fix = device_fix()
+    if tracker.is_due():
+        try:
+            location_data = device_location_data(fix) if fix else get_current_location()
+            latitude, longitude = float(location_data["latitude"]), float(location_data["longitude"])
+            tracker.update(latitude, longitude)
+            st.session_state.last_location = location_data
+        except ValueError as e:
+            tracker.failed()
+            st.session_state.location_error = str(e)
+        else:
+            st.session_state.location_error = None
+            accuracy = fix_accuracy(location_data)
+            buffer.append(latitude, longitude, accuracy=accuracy)
+            check_detour(latitude, longitude, accuracy)
+            if progress := get_trip_progress():
+                progress.update(latitude, longitude)
+            check_anomalies(latitude, longitude, accuracy)
+    if buffer.upload_due():
+        get_resources().loop.submit(upload_track(get_backend_client(), buffer))
 
-        # Add current location marker
+# Most recent track points drawn as a trail behind the current location
+TRAIL_POINTS = 500
+
+@st.fragment(run_every=MOVING_INTERVAL)
+def live_location_map():
+    """
+    Redraw only the current-location marker on each tick; the base map stays
+    mounted in the browser and the rest of the page doesn't rerun.
+    """
+    import folium
+    from streamlit_folium import st_folium
+
+    # Long trips never rerun the whole page, so keep the token fresh here
+    refresh_session()
+    refresh_location()
+    tracker = st.session_state.location_tracker
+    current = folium.FeatureGroup(name="Current Location")
+    trail = get_track_buffer().points(limit=TRAIL_POINTS)
+    if len(trail) > 1:
+        folium.PolyLine(trail, weight=3, color='purple', opacity=0.6).add_to(current)
+    if tracker.position:
         folium.Marker(
-            [float(location_data["latitude"]), float(location_data["longitude"])],
+            list(tracker.position),
             popup="Current Location",
             icon=folium.Icon(color='blue', icon='info-sign')
-        ).add_to(m)
-
-        # Add start and end markers if trip details exist
-        if "trip_details" in st.session_state:
-            details = st.session_state.trip_details
-            
-            # Add start marker
-            folium.Marker(
-                [float(details["origin"]["latitude"]), float(details["origin"]["longitude"])],
-                popup="Start",
-                icon=folium.Icon(color='green', icon='info-sign')
-            ).add_to(m)
-            
-            # Add end marker
-            folium.Marker(
-                [float(details["destination"]["latitude"]), float(details["destination"]["longitude"])],
-                popup="End",
-                icon=folium.Icon(color='red', icon='info-sign')
-            ).add_to(m)
-            
-            # Add route line if available
-            if "route" in details:
-                try:
-                    route_coordinates = polyline.decode(details["route"])
-                    folium.PolyLine(
-                        route_coordinates,
-                        weight=3,
-                        color='blue',
-                        opacity=0.8
-                    ).add_to(m)
-                except Exception as e:
-                    st.error(f"Error rendering route: {e}")
-
-        return m
-    except Exception as e:
-        st.error(f"Error updating map: {e}")
-        return None
+        ).add_to(current)
+    trip_map = get_trip_map()
+    with span("active_trip.map_render"):
+        st_folium(
+            trip_map,
+            key="active_trip_map",
+            height=400,
+            use_container_width=True,
+            center=tracker.position,
+            feature_group_to_add=current,
+            returned_objects=[],
+        )
+    detector = get_detour_detector()
+    if detector and detector.off_route:
+        st.warning(
+            f"⚠️ You are {detector.describe_distance()} off your planned route "
+            f"(safe radius {detector.safe_radius:.0f} m)."
+        )
+    if st.session_state.get("location_error"):
+        st.caption(f"⚠️ Error updating location: {st.session_state.location_error}")
+    elif tracker.updated_at is not None:
+        age = time.monotonic() - tracker.updated_at
+        status = "moving" if tracker.is_moving else "stationary"
+        st.caption(
+            f"Location updated {age:.0f}s ago ({status}), "
+            f"next check in {tracker.interval:.0f}s"
+        )
+        if st.session_state.last_location.get("source") != "device":
+            reason = st.session_state.get("device_location_error") or "not shared by the browser"
+            st.caption(
+                f"⚠️ Approximate location only ({reason}). Allow location access "
+                "for detour and stop alerts."
+            )
+
+if "location_tracker" not in st.session_state:
+    st.session_state.location_tracker = LocationTracker()
+
+# Load emergency contacts up front so an SOS never waits for them
+fetch_user_details()
+# Let the outbox retry this user's undelivered messages
+get_resources().outbox_sender.register(get_backend_client())
+
+DELIVERY_ICONS = {PENDING: "🔁", SENDING: "📤", SENT: "✅", FAILED: "❌"}
+
+@st.fragment(run_every=MOVING_INTERVAL)
+def trip_metrics():
+    """Remaining distance, duration and ETA from the latest position on the route."""
+    details = st.session_state.trip_details
+    progress = get_trip_progress()
+    if progress is None:
+        distance, duration = details["distance"], details["duration"]
+        eta = time.time() + duration
+    else:
+        current = progress.progress
+        distance, duration, eta = current.remaining_distance, current.remaining_duration, current.eta
+    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    with metric_col1:
+        st.metric("Distance left", f"{distance/1000:.1f} km")
+    with metric_col2:
+        st.metric("Time left", f"{duration/60:.0f} mins")
+    with metric_col3:
+        st.metric("ETA", time.strftime("%I:%M %p", time.localtime(eta)))
+    if progress is not None:
+        st.progress(
+            current.fraction,
+            text=None if current.snapped else "Waiting for your position on the route...",
+        )
+
+def escalate_safety_check(message):
+    check = st.session_state.safety_check
+    check.escalated = True
+    broadcast_sos(message)
+
+def acknowledge_safety_check():
+    st.session_state.safety_check.acknowledged = True
+
+@st.fragment(run_every=5)
+def safety_check_prompt():
+    """
+    Ask the traveller whether they are safe after an anomaly, and send an
+    SOS if they don't answer in time.
+    """
+    check = st.session_state.get("safety_check")
+    if check is None or check.acknowledged:
+        return
+    if check.due():
+        escalate_safety_check(
+            f"Automatic SOS: {check.anomaly.message}. No response to the safety check."
+        )
+    if check.escalated:
+        st.error(f"🚨 SOS sent after: {check.anomaly.message}")
+        return
+    if check.auto_escalate:
+        st.warning(
+            f"⚠️ {check.anomaly.message}. Are you safe? An SOS will be sent "
+            f"automatically in {check.remaining():.0f}s."
+        )
+    else:
+        st.warning(f"⚠️ {check.anomaly.message}. Are you safe?")
+    ok_col, sos_col = st.columns(2)
+    with ok_col:
+        st.button("✅ I'm safe", key="safety_ok", on_click=acknowledge_safety_check)
+    with sos_col:
+        st.button(
+            "🚨 Send SOS now",
+            key="safety_sos",
+            on_click=escalate_safety_check,
+            args=(f"SOS: {check.anomaly.message}",),
+        )
+
+@st.fragment(run_every=5)
+def delivery_status():
+    """Delivery state of this session's SOS alerts and emergency messages."""
+    messages = get_resources().outbox.messages(st.session_state.get("outbox_alert_ids", []))
+    if not messages:
+        return
+    user_details = cached_user_details() or {}
+    names = {c["id"]: c["name"] for c in user_details.get("emergency_contacts", [])}
+
+    def label(message):
+        return "SOS alert" if message.kind == "sos" else names.get(message.target, message.target)
+
+    st.markdown('<div class="section-header">📨 Delivery Status</div>', unsafe_allow_html=True)
+    # Given up on for good: the traveller has to raise the alarm some other way
+    failed = [message for message in messages if message.status == FAILED]
+    if failed:
+        st.error(
+            f"🚨 Could not deliver: {', '.join(label(m) for m in failed)}. "
+            "Call emergency services (112) or your contacts directly."
+        )
+    held = get_resources().outbox_sender.token_rejected(st.session_state.token)
+    for message in messages[-10:]:
+        line = f"{DELIVERY_ICONS[message.status]} **{label(message)}**: {message.status}"
+        if message.status == PENDING and held:
+            line += " (waiting for your sign-in to be renewed)"
+        elif message.status == PENDING:
+            retry_in = max(0, message.next_attempt - time.time())
+            line += f" (attempt {message.attempts + 1} in {retry_in:.0f}s)"
+        if message.last_error and message.status != SENT:
+            line += f" — {message.last_error}"
+        st.markdown(line)
 
 # Header with Trip Status
 st.title("⏳ Active Trip")
-st.markdown('<span class="status-badge">IN PROGRESS</span>', unsafe_allow_html=True)
+st.markdown('<span class="status-badge status-in-progress">IN PROGRESS</span>', unsafe_allow_html=True)
 
 # Main content
 col1, col2 = st.columns([2, 1])
 
 with col1:
     # Map Section
-    st.markdown('<div class="trip-header">📍 Live Location</div>', unsafe_allow_html=True)
+    st.markdown('<div class="section-header">📍 Live Location</div>', unsafe_allow_html=True)
     st.markdown('<div class="map-container">', unsafe_allow_html=True)
     
-    # Update and display map
+    # Live map, refreshed in place by its fragment
     if "trip_details" in st.session_state:
-        updated_map = update_active_trip_map()
-        if updated_map:
-            st.session_state.route_map = updated_map
-            folium_static(st.session_state.route_map, width=None, height=400)
+        live_location_map()
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Trip Details
     st.markdown('<div class="trip-details-card">', unsafe_allow_html=True)
-    st.markdown('<div class="trip-header">🚗 Trip Details</div>', unsafe_allow_html=True)
+    st.markdown('<div class="section-header">🚗 Trip Details</div>', unsafe_allow_html=True)
     
-    # Trip metrics
+    # Trip metrics, following the live location
     if "trip_details" in st.session_state:
-        details = st.session_state.trip_details
-        metric_col1, metric_col2, metric_col3 = st.columns(3)
-        with metric_col1:
-            st.metric("Distance", f"{details['distance']/1000:.1f} km")
-        with metric_col2:
-            st.metric("Duration", f"{details['duration']/60:.0f} mins")
-        with metric_col3:
-            st.metric("ETA", time.strftime("%I:%M %p", time.localtime(time.time() + details['duration'])))
+        trip_metrics()
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col2:
     # Emergency Section
     st.markdown('<div class="emergency-section">', unsafe_allow_html=True)
-    st.markdown('<div class="trip-header">🚨 Emergency Options</div>', unsafe_allow_html=True)
+    st.markdown('<div class="section-header">🚨 Emergency Options</div>', unsafe_allow_html=True)
+
+    # Safety check raised by the anomaly detector
+    safety_check_prompt()
     
     # SOS Message Input
     sos_message = st.text_area(
@@ -328,80 +551,70 @@ with col2:
     if st.button("🚨 BROADCAST SOS ALERT", key="sos", type="primary", help="Alert all emergency contacts"):
         if not sos_message:
             sos_message = "Help! I am in danger."  # Default message if none provided
-        if broadcast_sos(sos_message):
-            st.success("SOS alert sent to all emergency contacts!")
-        else:
-            st.error("Failed to send SOS alert. Please try again.")
-        
-        # Fetch user details for emergency contacts
-        user_details = fetch_user_details()
-        if user_details and "emergency_contacts" in user_details:
-            contacts = user_details["emergency_contacts"]
-            selected_contact = st.selectbox(
-                "Select Contact",
-                options=[f"{contact['name']} ({contact['phone']})" for contact in contacts],
-                format_func=lambda x: x
+        report = broadcast_sos(sos_message)
+        if report and not report.failures:
+            st.success(
+                f"SOS alert sent to all emergency contacts! ({report.latency:.2f}s)"
+            )
+        elif report and (report.alert_sent or report.contacts_reached):
+            st.warning(
+                f"SOS alert partly sent ({report.contacts_reached} contact(s) reached, "
+                f"{len(report.failures)} retrying)."
             )
-        
-        message = st.text_area("Message", placeholder="Enter your message here...")
-        
+        else:
+            st.error("Failed to send SOS alert. It will be retried automatically.")
+
+    # Message a single contact
+    user_details = cached_user_details()
+    contacts = (user_details or {}).get("emergency_contacts") or []
+    if contacts:
+        contact_index = st.selectbox(
+            "Select Contact",
+            options=range(len(contacts)),
+            format_func=lambda i: f"{contacts[i]['name']} ({contacts[i]['phone']})",
+            key="contact_index",
+        )
+        message = st.text_area("Message", placeholder="Enter your message here...", key="contact_message")
         if st.button("Send Message", key="send_msg"):
-            # Get contact_id from selected contact
-            contact_idx = contacts[st.session_state.contact_index]["id"]
-            if send_emergency_message(contact_idx, message):
+            if not message:
+                st.warning("Please enter a message.")
+            elif send_emergency_message(contacts[contact_index]["id"], message):
                 st.success("Message sent successfully!")
             else:
-                st.error("Failed to send message. Please try again.")
-    
+                st.error("Failed to send message. It will be retried automatically.")
+
+    delivery_status()
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Trip Control Buttons
     st.markdown('<div class="trip-details-card">', unsafe_allow_html=True)
-    st.markdown('<div class="trip-header">🎯 Trip Controls</div>', unsafe_allow_html=True)
+    st.markdown('<div class="section-header">🎯 Trip Controls</div>', unsafe_allow_html=True)
     
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Complete Trip", key="complete", type="primary"):
             try:
-                response = requests.get(
-                    f"{BASE_URL}/commute/end-trip/{st.session_state.trip_id}",
-                    headers={"Authorization": f"Bearer {st.session_state.token['access_token']}"}
-                )
-                if response.status_code == 200:
-                    st.session_state.is_trip_started = False
-                    st.session_state.trip_id = None
-                    st.success("Trip completed successfully!")
-                    time.sleep(2)
-                    switch_page("Trip_Planner")
+                get_backend_client().end_trip(st.session_state.trip_id)
+                st.session_state.is_trip_started = False
+                st.session_state.trip_id = None
+                st.success("Trip completed successfully!")
+                time.sleep(2)
+                switch_page("Trip_Planner")
             except Exception as e:
                 st.error(f"Error completing trip: {e}")
     
     with col2:
         if st.button("Cancel Trip", key="cancel"):
             try:
-                response = requests.get(
-                    f"{BASE_URL}/commute/cancel-trip/{st.session_state.trip_id}",
-                    headers={"Authorization": f"Bearer {st.session_state.token['access_token']}"}
-                )
-                if response.status_code == 200:
-                    st.session_state.is_trip_started = False
-                    st.session_state.trip_id = None
-                    st.success("Trip cancelled successfully!")
-                    time.sleep(2)
-                    switch_page("Trip_Planner")
+                get_backend_client().cancel_trip(st.session_state.trip_id)
+                st.session_state.is_trip_started = False
+                st.session_state.trip_id = None
+                st.success("Trip cancelled successfully!")
+                time.sleep(2)
+                switch_page("Trip_Planner")
             except Exception as e:
                 st.error(f"Error cancelling trip: {e}")
     
     st.markdown('</div>', unsafe_allow_html=True)
 
-# Auto-refresh the page every 30 seconds to update location
-st.markdown(
-    """
-    <script>
-        setTimeout(function(){
-            window.location.reload();
-        }, 30000);
-    </script>
-    """,
-    unsafe_allow_html=True
-) 
\ No newline at end of file
+end_run()
@@ -1,15 +1,15 @@
 import streamlit as st
-import requests
-from datetime import datetime
-import pytz
 from streamlit_extras.switch_page_button import switch_page
-import folium
-from streamlit_folium import st_folium
 import time
-import polyline
 
-# Base URL of your FastAPI backend
-BASE_URL = "http://localhost:8080/api"
+from utils.backend import get_backend_client
+from utils.instrumentation import end_run, span, start_run, timed
+from utils.resources import get_resources
+from utils.session import require_login
+from utils.theme import apply_theme
+from utils.trip_index import SORT_OPTIONS, STATUS_OPTIONS, TripIndex
+from utils.trip_stats import TripStats
+from utils.trip_sync import TripSync, TripSyncError
 
 # Page config
 st.set_page_config(
@@ -18,98 +18,13 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-
-# Custom CSS
-st.markdown("""
-    <style>
-    .trip-card {
-        background-color: white;
-        border-radius: 10px;
-        padding: 20px;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1rem;
-    }
-    .trip-header {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        margin-bottom: 1rem;
-    }
-    .trip-date {
-        color: #666;
-        font-size: 0.9em;
-    }
-    .status-badge {
-        padding: 4px 12px;
-        border-radius: 15px;
-        font-size: 0.85em;
-        font-weight: 500;
-        display: inline-block;
-    }
-    .status-completed {
-        background-color: #28A745;
-        color: white;
-    }
-    .status-ongoing {
-        background-color: #FFC107;
-        color: #000;
-    }
-    .status-cancelled {
-        background-color: #DC3545;
-        color: white;
-    }
-    .trip-details {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-        gap: 1rem;
-        margin-bottom: 1rem;
-    }
-    .detail-item {
-        padding: 10px;
-        background-color: #f8f9fa;
-        border-radius: 5px;
-    }
-    .detail-label {
-        color: #666;
-        font-size: 0.85em;
-        margin-bottom: 4px;
-    }
-    .detail-value {
-        font-weight: 500;
-        color: #333;
-    }
-    .location-box {
-        background-color: #f8f9fa;
-        padding: 10px;
-        border-radius: 5px;
-        margin-bottom: 0.5rem;
-    }
-    .alert-section {
-        margin-top: 1rem;
-        padding: 10px;
-        background-color: #FFF3CD;
-        border-radius: 5px;
-    }
-    .map-container {
-        border-radius: 5px;
-        overflow: hidden;
-        margin-top: 1rem;
-    }
-    .filters-card {
-        background-color: white;
-        border-radius: 10px;
-        padding: 20px;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1.5rem;
-    }
-    </style>
-""", unsafe_allow_html=True)
+start_run("trip_history")
 
 # Check if user is logged in
-if "token" not in st.session_state:
-    st.warning("Please login to view trip history.")
-    switch_page("Login")
-    st.stop()
+require_login("Please login to view trip history.")
+
+# Shared stylesheet
+apply_theme()
 
 # Initialize session state for filters
 if "status_filter" not in st.session_state:
@@ -119,24 +34,37 @@ if "sort_by" not in st.session_state:
 if "search_location" not in st.session_state:
     st.session_state.search_location = ""
 
-def fetch_trips():
-    """Fetch all trips for the current user."""
+@st.cache_resource
+def get_trip_store():
+    """Process-wide trip caches, one TripSync per user."""
+    return {}
+
+def get_trip_sync():
+    """Return the shared trip cache for the current user."""
+    user_id = st.session_state.token["user_id"]
+    store = get_trip_store()
+    if user_id not in store:
+        store[user_id] = TripSync(user_id)
+    return store[user_id]
+
+@timed("trip_history.trip_sync")
+def fetch_trips(force=False):
+    """Return the current user's trips, asking the backend only for changes."""
+    trip_sync = get_trip_sync()
     try:
-        response = requests.get(
-            f"{BASE_URL}/commute/trips",
-            params={"user_id": st.session_state.token["user_id"]},
-            headers={"Authorization": f"Bearer {st.session_state.token['access_token']}"}
-        )
-        if response.status_code == 200:
-            return response.json()
-        st.error("Failed to fetch trips")
-        return []
-    except Exception as e:
-        st.error(f"Error fetching trips: {e}")
-        return []
+        trips = trip_sync.sync(get_backend_client(), force=force)
+    except TripSyncError:
+        trips = list(trip_sync.trips.values())
+    # Also shown while the sync backs off before trying again
+    if trip_sync.last_error:
+        st.error(trip_sync.last_error)
+    return trips
 
+@timed("trip_history.map_build")
 def create_trip_map(start_location, end_location, route=None):
     """Create a folium map for the trip."""
+    import folium
+
     center_lat = (start_location["latitude"] + end_location["latitude"]) / 2
     center_lng = (start_location["longitude"] + end_location["longitude"]) / 2
     
@@ -163,15 +91,73 @@ def create_trip_map(start_location, end_location, route=None):
     
     return m
 
-def format_datetime(dt_str):
-    """Format datetime string to a readable format."""
-    dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
-    local_tz = pytz.timezone('Asia/Kolkata')
-    local_dt = dt.astimezone(local_tz)
-    return local_dt.strftime("%d %b %Y, %I:%M %p")
+@timed("trip_history.trip_index")
+def get_trip_index(trips):
+    """Reuse the session's trip index unless the cached trips changed."""
+    trip_sync = get_trip_sync()
+    version = (trip_sync.user_id, trip_sync.version)
+    if st.session_state.get("trip_index_version") != version:
+        st.session_state.trip_index = TripIndex(trips)
+        st.session_state.trip_stats = TripStats.from_index(st.session_state.trip_index)
+        st.session_state.trip_index_version = version
+        # Past trip endpoints become address suggestions in the Trip Planner
+        get_resources().addresses.remember(
+            trip_sync.user_id,
+            [trip[end] for trip in trips for end in ("start_location", "end_location") if trip.get(end)],
+        )
+    return st.session_state.trip_index
+
+@timed("trip_history.stats")
+def display_trip_statistics(stats):
+    """Summary metrics and charts over all of the user's trips."""
+    with st.expander("📊 Trip Statistics", expanded=False):
+        if not len(stats):
+            st.info("Statistics will appear after your first trip.")
+            return
+        weeks, weekly_km = stats.weekly_distance_km()
+        durations = stats.duration_summary()
+        alerts = stats.alert_totals()
+        safest = stats.safest_hour()
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Distance this week", f"{weekly_km[-1]:.1f} km")
+        with col2:
+            st.metric(
+                "Avg. duration",
+                f"{durations['mean']:.0f} mins",
+                help=f"Median {durations['p50']:.0f} mins, 90th percentile {durations['p90']:.0f} mins",
+            )
+        with col3:
+            st.metric("Detour / anomaly alerts", f"{alerts['detour']} / {alerts['anomaly']}")
+        with col4:
+            st.metric(
+                "Safest time to travel",
+                f"{safest:02d}:00–{(safest + 1) % 24:02d}:00" if safest is not None else "—",
+            )
+
+        chart_col1, chart_col2 = st.columns(2)
+        with chart_col1:
+            st.markdown("##### Weekly distance (km)")
+            st.bar_chart({"Week": weeks, "km": weekly_km}, x="Week", y="km")
+        with chart_col2:
+            days, daily_trips = stats.daily_trip_counts()
+            st.markdown("##### Trips per day")
+            st.bar_chart({"Day": days, "Trips": daily_trips}, x="Day", y="Trips")
+        _, alert_rate = stats.alert_rate_by_hour()
+        st.markdown("##### Alert rate by hour of day")
+        st.bar_chart(
+            {"Hour": list(range(24)), "Alert rate (%)": alert_rate * 100},
+            x="Hour",
+            y="Alert rate (%)",
+        )
 
 # Page Header
-st.title("🗓️ Trip History")
+header_col, refresh_col = st.columns([5, 1])
+with header_col:
+    st.title("🗓️ Trip History")
+with refresh_col:
+    refresh = st.button("🔄 Refresh", key="trip_history_refresh")
 
 # Filters Section
 st.markdown('<div class="filters-card">', unsafe_allow_html=True)
@@ -179,14 +165,14 @@ col1, col2, col3 = st.columns(3)
 with col1:
     status_filter = st.selectbox(
         "Filter by Status",
-        ["All", "Completed", "Ongoing", "Cancelled"],
+        STATUS_OPTIONS,
         key="trip_history_status_filter"
     )
     st.session_state.status_filter = status_filter
 with col2:
     sort_by = st.selectbox(
         "Sort by",
-        ["Latest First", "Oldest First", "Longest Distance", "Shortest Distance"],
+        SORT_OPTIONS,
         key="trip_history_sort_by"
     )
     st.session_state.sort_by = sort_by
@@ -195,40 +181,28 @@ with col3:
     st.session_state.search_location = search
 st.markdown('</div>', unsafe_allow_html=True)
 
-# Fetch trips
-trips = fetch_trips()
-
-# Apply filters
-if st.session_state.status_filter != "All":
-    trips = [t for t in trips if t["status"].lower() == st.session_state.status_filter.lower()]
-
-if st.session_state.search_location:
-    trips = [t for t in trips if 
-            st.session_state.search_location.lower() in t["start_location"]["address"].lower() or 
-            st.session_state.search_location.lower() in t["end_location"]["address"].lower()]
-
-# Apply sorting
-if st.session_state.sort_by == "Latest First":
-    trips.sort(key=lambda x: x["created_at"], reverse=True)
-elif st.session_state.sort_by == "Oldest First":
-    trips.sort(key=lambda x: x["created_at"])
-elif st.session_state.sort_by == "Longest Distance":
-    trips.sort(key=lambda x: x.get("distance", 0), reverse=True)
-elif st.session_state.sort_by == "Shortest Distance":
-    trips.sort(key=lambda x: x.get("distance", 0))
+# Fetch trips and apply filters and sorting through the session's index
+trip_index = get_trip_index(fetch_trips(force=refresh))
+results = trip_index.query(
+    status=st.session_state.status_filter,
+    search=st.session_state.search_location,
+    sort_by=st.session_state.sort_by,
+)
+display_trip_statistics(st.session_state.trip_stats)
 
 # Display trips
-if not trips:
+if not results:
     st.info("No trips found.")
 else:
-    for idx, trip in enumerate(trips):
+    for idx, record in enumerate(results):
+        trip = record.trip
         st.markdown('<div class="trip-card">', unsafe_allow_html=True)
         
         # Trip Header
         st.markdown(
             f"""
             <div class="trip-header">
-                <div class="trip-date">{format_datetime(trip["created_at"])}</div>
+                <div class="trip-date">{record.display_date}</div>
                 <div class="status-badge status-{trip['status'].lower()}">{trip['status']}</div>
             </div>
             """,
@@ -286,13 +260,16 @@ else:
         )
         
         # Map
-        st.markdown('<div class="map-container">', unsafe_allow_html=True)
+        st.markdown('<div class="map-container compact">', unsafe_allow_html=True)
+        from streamlit_folium import st_folium
+
         trip_map = create_trip_map(
             trip["start_location"],
             trip["end_location"],
             trip.get("route", None)
         )
-        st_folium(trip_map, width=None, height=200, key=f"map_{idx}")
+        with span("trip_history.map_render"):
+            st_folium(trip_map, width=None, height=200, key=f"map_{idx}")
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Alerts
@@ -308,4 +285,6 @@ else:
                     st.markdown(f"- {alert}")
             st.markdown('</div>', unsafe_allow_html=True)
         
-        st.markdown('</div>', unsafe_allow_html=True) 
\ No newline at end of file
+        st.markdown('</div>', unsafe_allow_html=True) 
+
+end_run()
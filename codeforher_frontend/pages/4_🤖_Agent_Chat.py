@@ -1,24 +1,19 @@
 import asyncio
-import base64
-import os
+import time
 import urllib.parse
 from collections.abc import AsyncGenerator
-from io import BytesIO
 
-import numpy as np
-import soundfile as sf
-import speech_recognition as sr
 import streamlit as st
-from dotenv import load_dotenv
-from gtts import gTTS
 from pydantic import ValidationError
-from pydub import AudioSegment
 from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 from client import AgentClient, AgentClientError
 from schema import ChatHistory, ChatMessage
 from schema.task_data import TaskData, TaskDataStatus
 from utils.helpers import get_audio_player, text_to_speech
+from utils.instrumentation import end_run, instrumentation, span, start_run
+from utils.resources import get_resources
+from utils.theme import apply_theme
 
 # A Streamlit app for interacting with the langgraph agent via a simple chat interface.
 # The app has three main functions which are all run async:
@@ -42,26 +37,18 @@ async def main() -> None:
         menu_items={},
         initial_sidebar_state="expanded",
     )
+    start_run("agent_chat")
 
-    # Add Material Icons CDN
+    apply_theme()
+    # Only this page hides the running indicator, so it isn't in the stylesheet
     st.markdown(
         """
-        <link href="https://fonts.googleapis.com/icon?family=Material+Icons" rel="stylesheet">
         <style>
         [data-testid="stStatusWidget"] {
                 visibility: hidden;
                 height: 0%;
                 position: fixed;
             }
-        .mic-container {
-            display: flex;
-            align-items: center;
-            gap: 10px;
-        }
-        .material-icons {
-            vertical-align: middle;
-            margin-right: 4px;
-        }
         </style>
         """,
         unsafe_allow_html=True,
@@ -72,15 +59,19 @@ async def main() -> None:
         st.rerun()
 
     if "agent_client" not in st.session_state:
-        load_dotenv()
-        agent_url = os.getenv("AGENT_URL")
-        if not agent_url:
-            host = os.getenv("HOST", "0.0.0.0")
-            port = os.getenv("PORT", 8080)
-            agent_url = f"http://{host}:{port}/api/agent"
+        resources = get_resources()
+        agent_url = resources.agent_url
         try:
-            with st.spinner("Connecting to agent service..."):
-                st.session_state.agent_client = AgentClient(base_url=agent_url)
+            with st.spinner("Connecting to agent service..."), span("agent_chat.connect"):
+                st.session_state.agent_client = AgentClient(
+                    base_url=agent_url,
+                    http_client=resources.agent_http,
+                    async_http_client=resources.agent_async_http,
+                    latency=resources.agent_latency,
+                    requests=resources.agent_requests,
+                    tokens=resources.agent_tokens,
+                    spans=instrumentation.export,
+                )
         except AgentClientError as e:
             st.error(f"Error connecting to agent service at {agent_url}: {e}")
             st.markdown("The service might be booting up. Try again in a few seconds.")
@@ -94,9 +85,10 @@ async def main() -> None:
             messages = []
         else:
             try:
-                messages: ChatHistory = agent_client.get_history(
-                    thread_id=thread_id
-                ).messages
+                with span("agent_chat.history"):
+                    messages: ChatHistory = agent_client.get_history(
+                        thread_id=thread_id
+                    ).messages
             except AgentClientError:
                 st.error("No message history found for this Thread ID.")
                 messages = []
@@ -154,7 +146,8 @@ async def main() -> None:
         for m in messages:
             yield m
 
-    await draw_messages(amessage_iter())
+    with span("agent_chat.replay", messages=len(messages)):
+        await draw_messages(amessage_iter())
 
     # Generate new message if the user provided new input
     if user_input := st.chat_input():
@@ -162,18 +155,24 @@ async def main() -> None:
         st.chat_message("human").write(user_input)
         try:
             if use_streaming:
-                stream = agent_client.astream(
+                # The shared agent pool lives on the background loop
+                stream = get_resources().loop.aiterate(agent_client.astream(
                     message=user_input,
                     model=model,
                     thread_id=st.session_state.thread_id,
-                )
-                await draw_messages(stream, is_new=True)
+                ))
+                with span("agent_chat.stream") as attrs:
+                    await draw_messages(timed_render(stream, attrs), is_new=True)
+                    if messages[-1].type == "ai":
+                        attrs["run_id"] = messages[-1].run_id
             else:
-                response = await agent_client.ainvoke(
-                    message=user_input,
-                    model=model,
-                    thread_id=st.session_state.thread_id,
-                )
+                with span("agent_chat.invoke") as attrs:
+                    response = await get_resources().loop.awaitable(agent_client.ainvoke(
+                        message=user_input,
+                        model=model,
+                        thread_id=st.session_state.thread_id,
+                    ))
+                    attrs["run_id"] = response.run_id
                 messages.append(response)
                 st.chat_message("ai").write(response.content)
             st.rerun()  # Clear stale containers
@@ -186,6 +185,22 @@ async def main() -> None:
         with st.session_state.last_message:
             await handle_feedback()
 
+    end_run()
+
+
+async def timed_render(
+    agen: AsyncGenerator[ChatMessage | str, None], attrs: dict
+) -> AsyncGenerator[ChatMessage | str, None]:
+    """
+    Pass on the items of `agen`, adding the time spent drawing them, as
+    opposed to waiting for the agent, to the span attributes `attrs`.
+    """
+    attrs["render"] = 0.0
+    async for item in agen:
+        start = time.perf_counter()
+        yield item
+        attrs["render"] += time.perf_counter() - start
+
 
 async def draw_messages(
     messages_agen: AsyncGenerator[ChatMessage | str, None],
@@ -374,12 +389,12 @@ async def handle_feedback() -> None:
             normalized_score = 1.0
             agent_client: AgentClient = st.session_state.agent_client
             try:
-                await agent_client.acreate_feedback(
+                await get_resources().loop.awaitable(agent_client.acreate_feedback(
                     run_id=latest_run_id,
                     key="human-feedback-stars",
                     score=normalized_score,
                     kwargs={"comment": "Positive feedback"},
-                )
+                ))
                 st.session_state.last_feedback = (latest_run_id, normalized_score)
                 st.toast("Feedback recorded", icon="👍")
             except AgentClientError as e:
@@ -391,12 +406,12 @@ async def handle_feedback() -> None:
             normalized_score = 0.0
             agent_client: AgentClient = st.session_state.agent_client
             try:
-                await agent_client.acreate_feedback(
+                await get_resources().loop.awaitable(agent_client.acreate_feedback(
                     run_id=latest_run_id,
                     key="human-feedback-stars",
                     score=normalized_score,
                     kwargs={"comment": "Negative feedback"},
-                )
+                ))
                 st.session_state.last_feedback = (latest_run_id, normalized_score)
                 st.toast("Feedback recorded", icon="👎")
             except AgentClientError as e:
@@ -0,0 +1,312 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from client import GuardianLaneClient
+
+# Suggestions kept per trie node
+TOP_K = 8
+# Prefixes longer than this (characters) share the node at this depth
+MAX_PREFIX = 24
+# An address is suggested to everyone once this many users have used it
+POPULAR_MIN_USERS = 3
+# Milliseconds after the last keystroke before the typed text is looked up
+TYPING_DEBOUNCE_MS = 250
+# Coordinates of addresses only geocoded (not used by anyone yet) are kept
+# this long (seconds), like the page's geocoding cache used to be
+GEOCODE_TTL = 3600
+
+
+def normalize(address: str) -> str:
+    return re.sub(r"\s+", " ", address).strip().lower()
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        # (-score, address) of the best addresses under this prefix, best first
+        self.top: list[tuple[float, str]] = []
+
+
+class AddressIndex:
+    """
+    Prefix index of addresses for autocomplete.
+
+    Addresses are inserted under every word start ("5th block koramangala"
+    is found by "5th", "block" and "kora"), and every trie node keeps its
+    `TOP_K` best-scoring addresses, so a lookup walks at most `MAX_PREFIX`
+    nodes and reads a short list, however many addresses are indexed.
+    Scores only grow (`add()` adds to them), so an address that drops out of
+    a node's list never needs to come back, and the lists stay correct with
+    a sorted insert. Many addresses are indexed faster at once with
+    `build()`.
+    """
+
+    def __init__(self) -> None:
+        self.root = _Node()
+        self.scores: dict[str, float] = {}
+        # Display form of each normalized address
+        self.labels: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __contains__(self, address: str) -> bool:
+        return normalize(address) in self.scores
+
+    def _keys(self, key: str):
+        """Each word-start suffix of `key`, cut to `MAX_PREFIX`."""
+        for match in re.finditer(r"(?:^|(?<=[\s,]))\S", key):
+            yield key[match.start():match.start() + MAX_PREFIX]
+
+    def add(self, address: str, weight: float = 1.0) -> None:
+        key = normalize(address)
+        if not key:
+            return
+        self.labels.setdefault(key, address.strip())
+        old = self.scores.get(key)
+        self.scores[key] = score = (old or 0.0) + weight
+        entry = (-score, key)
+        for suffix in self._keys(key):
+            node = self.root
+            for ch in suffix:
+                node = node.children.setdefault(ch, _Node())
+                top = node.top
+                if old is not None and (-old, key) in top:
+                    top.remove((-old, key))
+                # Two word starts of one address can share a node
+                elif entry in top or (len(top) >= TOP_K and entry >= top[-1]):
+                    continue
+                bisect.insort(top, entry)
+                del top[TOP_K:]
+
+    @classmethod
+    def build(cls, weights: dict[str, float]) -> "AddressIndex":
+        """
+        Index many addresses, with their weights, at once. Addresses are
+        inserted best first, so each node takes entries until its list is
+        full and then only needs walking through, with no sorted inserts,
+        removals or membership checks.
+        """
+        index = cls()
+        for address, weight in weights.items():
+            if key := normalize(address):
+                index.labels.setdefault(key, address.strip())
+                index.scores[key] = index.scores.get(key, 0.0) + weight
+        for key, score in sorted(index.scores.items(), key=lambda item: (-item[1], item[0])):
+            entry = (-score, key)
+            for suffix in index._keys(key):
+                node = index.root
+                for ch in suffix:
+                    child = node.children.get(ch)
+                    if child is None:
+                        child = node.children[ch] = _Node()
+                    node = child
+                    top = node.top
+                    # Nothing else was inserted since this address's other word starts
+                    if len(top) < TOP_K and (not top or top[-1] is not entry):
+                        top.append(entry)
+        return index
+
+    def suggest(self, prefix: str = "", limit: int = TOP_K) -> list[str]:
+        """Best-scoring addresses with a word starting with `prefix`."""
+        prefix = normalize(prefix)
+        if not prefix:
+            ranked = heapq.nlargest(limit, self.scores, key=self.scores.__getitem__)
+            return [self.labels[key] for key in ranked]
+        node = self.root
+        for ch in prefix[:MAX_PREFIX]:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        matches = [key for _, key in node.top]
+        if len(prefix) > MAX_PREFIX:
+            matches = [key for key in matches if prefix in key]
+        return [self.labels[key] for key in matches[:limit]]
+
+
+class AddressBook:
+    """
+    Process-wide address suggestions and geocoding results.
+
+    Each user has a private `AddressIndex` of the addresses they have used
+    (home address, trip endpoints); an address joins the shared "popular"
+    index only once `POPULAR_MIN_USERS` different users have used it, so
+    one user's home never shows up in another's suggestions. Coordinates
+    of every geocoded address are kept, so committing a known address
+    needs no backend call: for good once someone has used the address,
+    for `GEOCODE_TTL` seconds when it was only looked up (e.g. while
+    planning a route).
+    """
+
+    def __init__(self, popular_min_users: int = POPULAR_MIN_USERS) -> None:
+        self.popular_min_users = popular_min_users
+        self.popular = AddressIndex()
+        self.personal: dict[str, AddressIndex] = {}
+        self.coordinates: dict[str, dict] = {}
+        # When each address only looked up was geocoded, oldest first
+        self._geocoded_at: OrderedDict[str, float] = OrderedDict()
+        # Geocoding lookups answered from `coordinates`, and those that weren't
+        self.hits = 0
+        self.misses = 0
+        self._users: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, user_id: str | None, address: str, coords: dict | None = None) -> None:
+        """
+        Note that `user_id` used `address`, geocoded to `coords` if known.
+        Without a user only the coordinates are kept.
+        """
+        key = normalize(address)
+        if not key:
+            return
+        with self._lock:
+            if coords and coords.get("latitude") is not None:
+                self.coordinates[key] = {
+                    "latitude": coords["latitude"],
+                    "longitude": coords["longitude"],
+                }
+            if user_id is None:
+                if key in self._geocoded_at or key not in self._users:
+                    self._geocoded_at[key] = time.monotonic()
+                    self._geocoded_at.move_to_end(key)
+                self._expire()
+                return
+            self._geocoded_at.pop(key, None)
+            self.personal.setdefault(user_id, AddressIndex()).add(address)
+            users = self._users.setdefault(key, set())
+            if len(users) < self.popular_min_users:
+                users.add(user_id)
+                if len(users) == self.popular_min_users:
+                    self.popular.add(address, weight=len(users))
+            else:
+                self.popular.add(address)
+
+    def remember(self, user_id: str, locations: list[dict]) -> None:
+        """
+        Record `{address, latitude, longitude}` locations the user hasn't
+        used here before, e.g. from their trip history, without counting
+        the ones already known again.
+        """
+        for location in locations:
+            address = location.get("address")
+            personal = self.personal.get(user_id)
+            if address and (personal is None or address not in personal):
+                self.record(user_id, address, location)
+
+    def _expire(self) -> None:
+        """Forget coordinates only looked up more than `GEOCODE_TTL` ago."""
+        cutoff = time.monotonic() - GEOCODE_TTL
+        while self._geocoded_at:
+            key, geocoded_at = next(iter(self._geocoded_at.items()))
+            if geocoded_at > cutoff:
+                break
+            del self._geocoded_at[key]
+            self.coordinates.pop(key, None)
+
+    def coords(self, address: str) -> dict | None:
+        with self._lock:
+            self._expire()
+            return self.coordinates.get(normalize(address))
+
+    def suggest(self, user_id: str | None, prefix: str = "", limit: int = TOP_K) -> list[str]:
+        """The user's own addresses first, then popular ones."""
+        with self._lock:
+            personal = self.personal.get(user_id)
+            found = personal.suggest(prefix, limit) if personal else []
+            found += self.popular.suggest(prefix, limit)
+        unique: dict[str, str] = {}
+        for address in found:
+            unique.setdefault(normalize(address), address)
+        return list(unique.values())[:limit]
+
+    def geocode(self, client: GuardianLaneClient, user_id: str | None, address: str) -> dict:
+        """Coordinates of a committed address, from the book or the backend."""
+        if (coords := self.coords(address)) is None:
+            self.misses += 1
+            coords = client.geocode(address)
+        else:
+            self.hits += 1
+        self.record(user_id, address, coords)
+        return coords
+
+    async def ageocode(
+        self, client: GuardianLaneClient, user_id: str | None, address: str
+    ) -> dict:
+        if (coords := self.coords(address)) is None:
+            self.misses += 1
+            coords = await client.ageocode(address)
+        else:
+            self.hits += 1
+        self.record(user_id, address, coords)
+        return coords
+
+
+_address_typing = components.declare_component(
+    "address_typing",
+    path=str(Path(__file__).resolve().parent.parent / "components" / "address_typing"),
+)
+
+
+def _pick_suggestion(key: str, pick_key: str) -> None:
+    st.session_state[key] = st.session_state[pick_key]
+    # A fresh input, showing the picked address
+    st.session_state[f"{key}_generation"] = st.session_state.get(f"{key}_generation", 0) + 1
+
+
+def address_input(
+    label: str,
+    key: str,
+    book: AddressBook,
+    user_id: str | None = None,
+    placeholder: str | None = None,
+    limit: int = TOP_K,
+) -> str | None:
+    """
+    Address field with suggestions from `book` for what has been typed so
+    far: the text reaches the script `TYPING_DEBOUNCE_MS` after the last
+    keystroke and is looked up in the prefix trie. The value (also kept in
+    ``st.session_state[key]``) only changes when a suggestion is picked,
+    the typed address is submitted with Enter or the field is cleared, so
+    callers can geocode the result directly.
+    """
+    generation = st.session_state.get(f"{key}_generation", 0)
+    committed = st.session_state.get(key)
+    report = _address_typing(
+        label=label,
+        placeholder=placeholder or "",
+        value=committed or "",
+        debounce_ms=TYPING_DEBOUNCE_MS,
+        key=f"{key}_typing_{generation}",
+        default=None,
+    )
+    if report is None:
+        return committed
+    typed = report["text"].strip()
+    if not typed:
+        st.session_state[key] = None
+    elif report["submitted"]:
+        st.session_state[key] = typed
+    elif normalize(typed) != normalize(committed or ""):
+        pick_key = f"{key}_pick_{generation}"
+        suggestions = book.suggest(user_id, typed, limit)
+        if suggestions:
+            st.pills(
+                f"Suggestions for {label}",
+                suggestions,
+                key=pick_key,
+                on_change=_pick_suggestion,
+                args=(key, pick_key),
+                label_visibility="collapsed",
+            )
+        st.caption("Press Enter to use the address as typed.")
+    return st.session_state.get(key)
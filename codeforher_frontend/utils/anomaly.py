@@ -0,0 +1,236 @@
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from utils.location_tracker import haversine_m
+
+STOP = "stop"
+SPEED_CHANGE = "speed_change"
+BACKTRACK = "backtrack"
+
+# Seconds to answer the "are you safe?" prompt before an SOS goes out
+ESCALATE_AFTER = 60.0
+
+
+@dataclass(frozen=True)
+class AnomalyThresholds:
+    # A stop is this long (seconds) within `stop_radius` metres
+    stop_seconds: float = 300.0
+    stop_radius: float = 40.0
+    # Stops this close (metres) to the destination are expected
+    destination_radius: float = 250.0
+    # Speed is measured over this rolling window (seconds, and at most
+    # `window_samples` fixes)
+    window_seconds: float = 30.0
+    window_samples: int = 32
+    # A speed this many standard deviations above the EWMA, and at least
+    # `speed_delta` m/s above it, is a sudden change
+    speed_sigmas: float = 3.0
+    speed_delta: float = 5.0
+    speed_alpha: float = 0.1
+    # Speed samples needed before sudden changes are reported
+    speed_warmup: int = 5
+    # Window speeds below this (m/s) are standing still, not a pace
+    moving_speed: float = 1.0
+    # Moving this far (metres) back along the route is backtracking
+    backtrack_m: float = 200.0
+    # The same kind of anomaly isn't reported again within this (seconds)
+    cooldown: float = 300.0
+
+
+@dataclass
+class Anomaly:
+    kind: str
+    ts: float
+    lat: float
+    lon: float
+    message: str
+
+
+class AnomalyDetector:
+    """
+    Spots prolonged stops, sudden speed changes and backtracking as
+    location fixes arrive, in constant memory.
+
+    Speed is the path length over a rolling window of recent fixes (a
+    bounded deque with a running sum), which smooths out single-fix GPS
+    jitter. Its exponentially weighted mean and variance are updated per
+    moving fix; a window speed far above them is a sudden change. Slowing
+    down is left to stop detection, and standing still doesn't feed the
+    averages, or every traffic light would count. A stop is
+    tracked with one anchor fix: it's reported once the position has stayed
+    within `stop_radius` of the anchor for `stop_seconds`, unless the
+    destination is near. Stops are only tracked from device fixes with a
+    known accuracy: an IP-derived location barely moves during a trip, so
+    every trip would look stopped. Backtracking needs the distance along the route
+    (from `TripProgress`) and is reported when it falls `backtrack_m` below
+    the furthest point reached.
+    """
+
+    def __init__(self, thresholds: AnomalyThresholds | None = None) -> None:
+        self.thresholds = thresholds or AnomalyThresholds()
+        self.window: deque[tuple[float, float, float, float]] = deque(
+            maxlen=self.thresholds.window_samples
+        )
+        self._window_length = 0.0
+        self.speed: float | None = None
+        self.speed_mean = 0.0
+        self.speed_var = 0.0
+        self.speed_samples = 0
+        self._anchor: tuple[float, float, float] | None = None
+        self._stop_reported = False
+        self.max_along = 0.0
+        self._backtracking = False
+        self._last_reported: dict[str, float] = {}
+        self.anomalies: list[Anomaly] = []
+
+    def _push(self, lat: float, lon: float, ts: float) -> None:
+        """
+        Add a fix to the rolling window and drop fixes that fell out of it.
+        Each fix holds its distance from the previous one, and
+        `_window_length` sums them for every fix but the first.
+        """
+        step = haversine_m(self.window[-1][1], self.window[-1][2], lat, lon) if self.window else 0.0
+        if len(self.window) == self.window.maxlen:
+            self._window_length -= self.window[1][3]
+        self.window.append((ts, lat, lon, step))
+        self._window_length += step
+        while len(self.window) > 2 and ts - self.window[1][0] >= self.thresholds.window_seconds:
+            self.window.popleft()
+            self._window_length -= self.window[0][3]
+
+    def _window_speed(self) -> float | None:
+        if len(self.window) < 2:
+            return None
+        span = self.window[-1][0] - self.window[0][0]
+        return self._window_length / span if span > 0 else None
+
+    def _report(self, kind: str, lat: float, lon: float, ts: float, message: str) -> Anomaly | None:
+        last = self._last_reported.get(kind)
+        if last is not None and ts - last < self.thresholds.cooldown:
+            return None
+        self._last_reported[kind] = ts
+        anomaly = Anomaly(kind, ts, lat, lon, message)
+        self.anomalies.append(anomaly)
+        return anomaly
+
+    def _check_speed(self, lat: float, lon: float, ts: float) -> Anomaly | None:
+        speed = self._window_speed()
+        if speed is None:
+            return None
+        self.speed = speed
+        t = self.thresholds
+        if speed < t.moving_speed:
+            return None
+        if not self.speed_samples:
+            self.speed_mean = speed
+        anomaly = None
+        deviation = speed - self.speed_mean
+        if self.speed_samples >= t.speed_warmup and deviation > max(
+            t.speed_sigmas * math.sqrt(self.speed_var), t.speed_delta
+        ):
+            anomaly = self._report(
+                SPEED_CHANGE, lat, lon, ts,
+                f"Sudden speed jump: {speed * 3.6:.0f} km/h "
+                f"(usually {self.speed_mean * 3.6:.0f} km/h)",
+            )
+        self.speed_mean += t.speed_alpha * deviation
+        self.speed_var = (1 - t.speed_alpha) * (self.speed_var + t.speed_alpha * deviation**2)
+        self.speed_samples += 1
+        return anomaly
+
+    def _check_stop(
+        self, lat: float, lon: float, ts: float, remaining: float | None
+    ) -> Anomaly | None:
+        t = self.thresholds
+        if (
+            self._anchor is None
+            or haversine_m(self._anchor[0], self._anchor[1], lat, lon) > t.stop_radius
+        ):
+            self._anchor, self._stop_reported = (lat, lon, ts), False
+            return None
+        stopped = ts - self._anchor[2]
+        if self._stop_reported or stopped < t.stop_seconds:
+            return None
+        if remaining is not None and remaining <= t.destination_radius:
+            return None
+        self._stop_reported = True
+        return self._report(
+            STOP, lat, lon, ts, f"Unexpected stop for {stopped / 60:.0f} minutes"
+        )
+
+    def _check_backtrack(self, lat: float, lon: float, ts: float, along: float | None) -> Anomaly | None:
+        if along is None:
+            return None
+        t = self.thresholds
+        self.max_along = max(self.max_along, along)
+        behind = self.max_along - along
+        if self._backtracking:
+            # Re-armed once the traveller is heading the right way again
+            self._backtracking = behind > t.backtrack_m / 2
+            return None
+        if behind < t.backtrack_m:
+            return None
+        self._backtracking = True
+        return self._report(
+            BACKTRACK, lat, lon, ts, f"Moving back along the route ({behind:.0f} m)"
+        )
+
+    def update(
+        self,
+        lat: float,
+        lon: float,
+        ts: float | None = None,
+        along: float | None = None,
+        remaining: float | None = None,
+        accuracy: float = math.nan,
+    ) -> list[Anomaly]:
+        """
+        Feed a location fix, with the distance along the route and left to
+        go when known, and the fix's accuracy in metres (NaN when unknown,
+        as for IP-derived fixes). Returns the anomalies it raised.
+        """
+        ts = time.time() if ts is None else ts
+        self._push(lat, lon, ts)
+        stop = None
+        if math.isfinite(accuracy):
+            stop = self._check_stop(lat, lon, ts, remaining)
+        else:
+            self._anchor = None
+        found = (
+            self._check_speed(lat, lon, ts),
+            stop,
+            self._check_backtrack(lat, lon, ts, along),
+        )
+        return [anomaly for anomaly in found if anomaly is not None]
+
+
+class SafetyCheck:
+    """
+    The "are you safe?" prompt raised for an anomaly. If it isn't answered
+    within `escalate_after` seconds, `due()` says an SOS should go out,
+    unless `auto_escalate` is off (the anomaly came from a fix too coarse
+    to act on without the traveller's say-so).
+    """
+
+    def __init__(self, anomaly: Anomaly, raised_at: float | None = None,
+                 escalate_after: float = ESCALATE_AFTER,
+                 auto_escalate: bool = True) -> None:
+        self.anomaly = anomaly
+        self.raised_at = time.time() if raised_at is None else raised_at
+        self.escalate_after = escalate_after
+        self.auto_escalate = auto_escalate
+        self.acknowledged = False
+        self.escalated = False
+
+    def remaining(self, now: float | None = None) -> float:
+        now = time.time() if now is None else now
+        return max(self.raised_at + self.escalate_after - now, 0.0)
+
+    def due(self, now: float | None = None) -> bool:
+        return (
+            self.auto_escalate
+            and not (self.acknowledged or self.escalated)
+            and self.remaining(now) <= 0
+        )
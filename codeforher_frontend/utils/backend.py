@@ -0,0 +1,26 @@
+import streamlit as st
+
+from client import GuardianLaneClient
+from utils.instrumentation import instrumentation
+from utils.resources import get_resources
+
+
+def get_backend_client() -> GuardianLaneClient:
+    """
+    The session's backend client, carrying the logged-in user's token. Its
+    connection pools are shared by all sessions; async calls must run on
+    `get_resources().loop`.
+    """
+    if "backend_client" not in st.session_state:
+        resources = get_resources()
+        st.session_state.backend_client = GuardianLaneClient(
+            resources.backend_url,
+            http_client=resources.backend_http,
+            async_http_client=resources.backend_async_http,
+            latency=resources.backend_latency,
+            requests=resources.backend_requests,
+            spans=instrumentation.export,
+        )
+    client = st.session_state.backend_client
+    client.token = st.session_state.get("token")
+    return client
@@ -0,0 +1,19 @@
+import streamlit as st
+
+
+def run_script(script: str) -> None:
+    """
+    Run `script` in a hidden frame of the app's page. The frame is
+    same-origin, so the script can reach the app's document through
+    `window.parent.document`.
+
+    Streamlit releases with `st.iframe` get it; older ones, down to the
+    version in requirements.txt, use the components API it replaces.
+    """
+    html = f"<script>{script}</script>"
+    if hasattr(st, "iframe"):
+        st.iframe(html, height=1)
+    else:
+        import streamlit.components.v1 as components
+
+        components.html(html, height=0)
@@ -0,0 +1,198 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+
+from utils.location_tracker import EARTH_RADIUS_M
+
+DEFAULT_SAFE_RADIUS = 100.0
+# Back on route once within this share of the safe radius
+CLEAR_FACTOR = 0.7
+# Consecutive samples needed to enter or leave the detour state
+CONFIRM_SAMPLES = 2
+
+
+class RouteIndex:
+    """
+    Planned route as a uniform grid of segments, for nearest-distance queries.
+
+    Vertices are projected to metres on a local equirectangular plane (exact
+    enough at city scale), and each segment is registered in every grid
+    cell its bounding box touches. A query looks at the rings of cells
+    around the point, nearest first, and stops once the closest segment
+    found is nearer than the next ring could be, so a lookup touches a
+    handful of cells whatever the route length.
+    """
+
+    def __init__(self, points: list[tuple[float, float]], cell_size: float | None = None) -> None:
+        coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(coords) == 1:
+            coords = np.vstack([coords, coords])
+        self.lat0 = math.radians(float(coords[:, 0].mean()))
+        self.lon0 = math.radians(float(coords[:, 1].mean()))
+        self.cos_lat0 = math.cos(self.lat0)
+        xy = self._project(coords[:, 0], coords[:, 1])
+        self.start = xy[:-1]
+        self.delta = xy[1:] - xy[:-1]
+        self.lengths = np.sqrt((self.delta**2).sum(axis=1))
+        self.length_sq = np.maximum(self.lengths**2, 1e-12)
+        self.cell_size = cell_size or max(float(np.median(self.lengths)) * 4, 50.0)
+        low = np.floor(np.minimum(xy[:-1], xy[1:]) / self.cell_size).astype(np.int64)
+        high = np.floor(np.maximum(xy[:-1], xy[1:]) / self.cell_size).astype(np.int64)
+        self.min_cell = low.min(axis=0)
+        self.max_cell = high.max(axis=0)
+        cells: dict[tuple[int, int], list[int]] = defaultdict(list)
+        for i, (x0, y0, x1, y1) in enumerate(np.hstack([low, high]).tolist()):
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cells[(cx, cy)].append(i)
+        self.cells = {key: np.asarray(ids, dtype=np.int64) for key, ids in cells.items()}
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def _project(self, lat, lon) -> np.ndarray:
+        x = EARTH_RADIUS_M * (np.radians(lon) - self.lon0) * self.cos_lat0
+        y = EARTH_RADIUS_M * (np.radians(lat) - self.lat0)
+        return np.column_stack([x, y])
+
+    def _segment_distances(
+        self, p: np.ndarray, ids: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Distances from `p` to segments `ids`, and the fraction along each."""
+        start, delta = self.start[ids], self.delta[ids]
+        t = np.clip(((p - start) * delta).sum(axis=1) / self.length_sq[ids], 0.0, 1.0)
+        nearest = start + delta * t[:, None]
+        return np.sqrt(((nearest - p) ** 2).sum(axis=1)), t
+
+    def project(
+        self, lat: float, lon: float, max_distance: float = math.inf
+    ) -> tuple[int, float, float] | None:
+        """
+        Nearest point of the route to a location, as `(segment, t, distance)`:
+        the segment index, the fraction along it and the distance in metres.
+        None if the route is farther than `max_distance`.
+        """
+        p = self._project(np.array([lat]), np.array([lon]))[0]
+        cx, cy = (int(v) for v in np.floor(p / self.cell_size))
+        # Rings beyond these can't hold any segment
+        max_ring = int(
+            max(
+                abs(cx - self.min_cell[0]), abs(cx - self.max_cell[0]),
+                abs(cy - self.min_cell[1]), abs(cy - self.max_cell[1]),
+            )
+        )
+        best, best_segment, best_t = math.inf, -1, 0.0
+        for ring in range(max_ring + 1):
+            # Any segment in this ring or beyond is at least this far away
+            if (ring - 1) * self.cell_size > min(best, max_distance):
+                break
+            ids = [
+                self.cells[key]
+                for key in self._ring(cx, cy, ring)
+                if key in self.cells
+            ]
+            if ids:
+                ids = np.concatenate(ids)
+                distances, t = self._segment_distances(p, ids)
+                i = int(distances.argmin())
+                if distances[i] < best:
+                    best, best_segment, best_t = float(distances[i]), int(ids[i]), float(t[i])
+        if best > max_distance:
+            return None
+        return best_segment, best_t, best
+
+    def distance(self, lat: float, lon: float, max_distance: float = math.inf) -> float:
+        """
+        Distance in metres from a point to the route, or `math.inf` if the
+        route is farther than `max_distance`.
+        """
+        nearest = self.project(lat, lon, max_distance)
+        return math.inf if nearest is None else nearest[2]
+
+    def project_between(
+        self, lat: float, lon: float, first: int, last: int
+    ) -> tuple[int, float, float]:
+        """`project()` restricted to segments `first` to `last`, scanned directly."""
+        p = self._project(np.array([lat]), np.array([lon]))[0]
+        ids = np.arange(max(first, 0), min(last, len(self) - 1) + 1)
+        distances, t = self._segment_distances(p, ids)
+        i = int(distances.argmin())
+        return int(ids[i]), float(t[i]), float(distances[i])
+
+    @staticmethod
+    def _ring(cx: int, cy: int, ring: int):
+        if ring == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
+
+    def brute_force_distance(self, lat: float, lon: float) -> float:
+        """Distance to every segment; for checking and benchmarking `distance()`."""
+        p = self._project(np.array([lat]), np.array([lon]))[0]
+        return float(self._segment_distances(p, np.arange(len(self)))[0].min())
+
+
+class DetourDetector:
+    """
+    Flags when the traveller leaves the planned route.
+
+    A sample farther than `safe_radius` (plus the fix's accuracy, when
+    known) from the route counts as off-route; the detector only switches
+    to the detour state after `confirm` such samples in a row, and only
+    switches back after `confirm` samples within `safe_radius * clear_factor`,
+    so a position hovering around the boundary doesn't flap.
+    """
+
+    def __init__(
+        self,
+        route: RouteIndex,
+        safe_radius: float = DEFAULT_SAFE_RADIUS,
+        clear_factor: float = CLEAR_FACTOR,
+        confirm: int = CONFIRM_SAMPLES,
+    ) -> None:
+        self.route = route
+        self.safe_radius = safe_radius
+        self.clear_factor = clear_factor
+        self.confirm = confirm
+        self.off_route = False
+        self.distance: float | None = None
+        # Distances beyond this aren't measured exactly (`distance` is inf)
+        self.search_radius = 0.0
+        self.max_distance = 0.0
+        self.alerts = 0
+        self._streak = 0
+
+    def describe_distance(self) -> str:
+        if self.distance is None:
+            return "unknown"
+        if math.isinf(self.distance):
+            return f"over {self.search_radius:.0f} m"
+        return f"{self.distance:.0f} m"
+
+    def update(self, lat: float, lon: float, accuracy: float = math.nan) -> bool:
+        """Feed a location sample. Returns True when a new detour is confirmed."""
+        tolerance = 0.0 if math.isnan(accuracy) else accuracy
+        limit = self.safe_radius + tolerance
+        # Far-away distances only need to be known to exceed the limit
+        self.search_radius = limit * 10
+        self.distance = self.route.distance(lat, lon, max_distance=self.search_radius)
+        if self.off_route:
+            self.max_distance = max(self.max_distance, self.distance)
+            back = self.distance <= self.safe_radius * self.clear_factor + tolerance
+            self._streak = self._streak + 1 if back else 0
+            if self._streak >= self.confirm:
+                self.off_route, self._streak = False, 0
+            return False
+        self._streak = self._streak + 1 if self.distance > limit else 0
+        if self._streak >= self.confirm:
+            self.off_route, self._streak = True, 0
+            self.max_distance = self.distance
+            self.alerts += 1
+            return True
+        return False
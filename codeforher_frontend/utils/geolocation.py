@@ -0,0 +1,44 @@
+import time
+from pathlib import Path
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from utils.location_tracker import MOVING_INTERVAL
+
+COMPONENT_DIR = Path(__file__).resolve().parent.parent / "components" / "device_location"
+# Device fixes received longer ago than this (seconds) are no longer used
+MAX_FIX_AGE = 60.0
+
+_device_location = components.declare_component("device_location", path=str(COMPONENT_DIR))
+
+
+def device_location(interval: float = MOVING_INTERVAL, key: str = "device_location") -> dict | None:
+    """
+    The browser's latest location report: ``latitude``, ``longitude``,
+    ``accuracy`` (metres) and ``timestamp`` (ms), or ``error`` when the
+    user denied access or the device has no fix; None until the first
+    report. The browser is asked every `interval` seconds. Browsers only
+    share their location with pages served over HTTPS or from localhost.
+    """
+    return _device_location(interval_ms=int(interval * 1000), key=key, default=None)
+
+
+def device_fix(max_age: float = MAX_FIX_AGE) -> dict | None:
+    """
+    The browser's latest location fix if it arrived within `max_age`
+    seconds, else None. Call on every run of the fragment that uses it, so
+    the component stays mounted.
+    """
+    report = device_location()
+    if not report or "latitude" not in report:
+        st.session_state.device_location_error = (report or {}).get("error")
+        return None
+    st.session_state.device_location_error = None
+    # Arrival is timed with the server's clock; the device's may be off
+    if report["timestamp"] != st.session_state.get("device_fix_timestamp"):
+        st.session_state.device_fix_timestamp = report["timestamp"]
+        st.session_state.device_fix_received = time.monotonic()
+    if time.monotonic() - st.session_state.device_fix_received > max_age:
+        return None
+    return report
@@ -1,16 +1,17 @@
 import base64
 from io import BytesIO
 
-import numpy as np
-import soundfile as sf
-import speech_recognition as sr
 import streamlit as st
-from gtts import gTTS
-from pydub import AudioSegment
+
+# The audio stacks are imported on first use: they take a while to load and
+# only the Agent Chat page needs them
 
 
 def speech_to_text(audio_bytes):
     """Convert speech audio to text using speech recognition"""
+    import soundfile as sf
+    import speech_recognition as sr
+
     try:
         # Convert the UploadedFile to bytes
         if hasattr(audio_bytes, "read"):
@@ -56,6 +57,9 @@ def speech_to_text(audio_bytes):
 
 def text_to_speech(text, speed=1.5):
     """Convert text to speech and return audio data with speed adjustment"""
+    from gtts import gTTS
+    from pydub import AudioSegment
+
     try:
         tts = gTTS(text=text, lang="en")
         audio_bytes = BytesIO()
@@ -0,0 +1,337 @@
+import abc
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+import httpx
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from client.guardian_lane import LatencyHistogram
+from client.tracing import SpanContext, current_span
+from utils.resources import get_resources
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Upper bounds (seconds) of the phase histogram buckets: page phases range
+# from well under a millisecond (auth checks) to seconds (route fetch)
+PHASE_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf")
+)
+# Spans of one run kept for the debug panel
+MAX_RUN_SPANS = 200
+SERVICE_NAME = "guardian-lane-frontend"
+# OTLP span kinds
+KIND_INTERNAL, KIND_CLIENT = 1, 3
+
+_parent: ContextVar[str | None] = ContextVar("span_parent", default=None)
+
+
+def debug_panel_enabled() -> bool:
+    """The timing panel is shown in the sidebar when `DEBUG_PANEL=1`."""
+    return os.getenv("DEBUG_PANEL", "0").strip().lower() in {"1", "true", "yes"}
+
+
+class BatchExporter(abc.ABC):
+    """
+    Hands span records to `write()` from a daemon thread, so a span never
+    waits on the disk or the network. Records queued together are written
+    together.
+    """
+
+    def __init__(self) -> None:
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, record: dict) -> None:
+        self._queue.put(record)
+
+    @abc.abstractmethod
+    def write(self, batch: list[dict]) -> None:
+        """Write out `batch`; exceptions drop the batch and are logged."""
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception:
+                logger.exception("Dropped %d spans", len(batch))
+
+
+class JsonlExporter(BatchExporter):
+    """Appends span records to a JSON-lines file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        super().__init__()
+
+    def write(self, batch: list[dict]) -> None:
+        self._file.writelines(
+            json.dumps(record, separators=(",", ":"), default=str) + "\n" for record in batch
+        )
+        self._file.flush()
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_span(record: dict) -> dict:
+    """A span record, stamped when it ended, in the OTLP/JSON span encoding."""
+    end = int(record["ts"] * 1e9)
+    start = end - int(record["duration"] * 1e9)
+    status = record.get("status")
+    failed = status == "error" or (isinstance(status, int) and status >= 400)
+    span = {
+        "traceId": record["trace_id"],
+        "spanId": record["span_id"],
+        "name": record["name"],
+        "kind": KIND_CLIENT if record.get("kind") == "client" else KIND_INTERNAL,
+        "startTimeUnixNano": str(start),
+        "endTimeUnixNano": str(end),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)}
+            for key, value in record.items()
+            if key not in {"ts", "name", "duration", "kind", "trace_id", "span_id", "parent_span_id"}
+            and value is not None
+        ],
+        "status": {"code": 2 if failed else 0},
+    }
+    if record.get("parent_span_id"):
+        span["parentSpanId"] = record["parent_span_id"]
+    return span
+
+
+class OtlpExporter(BatchExporter):
+    """
+    Posts spans to an OpenTelemetry collector, or anything accepting
+    OTLP/HTTP JSON at `<endpoint>/v1/traces`. Batches the collector can't
+    take are dropped rather than retried.
+    """
+
+    def __init__(self, endpoint: str, service_name: str = SERVICE_NAME) -> None:
+        self.url = f"{endpoint.rstrip('/')}/v1/traces"
+        self.resource = {
+            "attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]
+        }
+        self.http = httpx.Client(timeout=5.0)
+        super().__init__()
+
+    def write(self, batch: list[dict]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": self.resource,
+                "scopeSpans": [{
+                    "scope": {"name": "guardian_lane"},
+                    "spans": [otlp_span(record) for record in batch],
+                }],
+            }]
+        }
+        try:
+            self.http.post(self.url, json=body).raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning("Dropped %d spans: %s", len(batch), e)
+
+
+class Instrumentation:
+    """
+    Process-wide timing of page phases (auth checks, route fetch, map
+    build...): a latency histogram per phase name, exporters receiving
+    every span, and, for spans timed in a script run, a list of the current
+    run's spans in session state for the debug panel.
+
+    Spans belong to W3C traces: each page run starts a trace, phases are
+    spans within it, and the backend and agent clients send requests made
+    during a phase as its children (see `client.tracing`).
+    """
+
+    def __init__(self, exporters: list[BatchExporter] | None = None) -> None:
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.exporters = exporters or []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        if name not in self.histograms:
+            with self._lock:
+                self.histograms.setdefault(name, LatencyHistogram(PHASE_BUCKETS))
+        return self.histograms[name]
+
+    def record(
+        self, name: str, seconds: float, context: SpanContext | None = None, **attrs: Any
+    ) -> None:
+        """
+        Record a phase that took `seconds`, as span `context` or else as a
+        new child of the current span.
+        """
+        self.histogram(name).observe(seconds)
+        parent_context = current_span.get()
+        if context is None:
+            context = parent_context.child() if parent_context else SpanContext.new_trace()
+        record = {
+            "ts": time.time(),
+            "name": name,
+            "duration": seconds,
+            "trace_id": context.trace_id,
+            "span_id": context.span_id,
+            "parent_span_id": parent_context.span_id if parent_context else None,
+            **attrs,
+        }
+        if (parent := _parent.get()) is not None:
+            record["parent"] = parent
+        if get_script_run_ctx(suppress_warning=True) is not None:
+            record["page"] = st.session_state.get("instrumented_page")
+            spans = st.session_state.get("run_spans")
+            if spans is not None and len(spans) < MAX_RUN_SPANS:
+                spans.append((name, seconds))
+        self.export(record)
+
+    def export(self, record: dict) -> None:
+        """Send a finished span to the exporters; the clients' span sink."""
+        for exporter in self.exporters:
+            exporter.export(record)
+
+
+def _from_env() -> Instrumentation:
+    exporters: list[BatchExporter] = []
+    if path := os.getenv("SPAN_LOG"):
+        exporters.append(JsonlExporter(path))
+    if endpoint := os.getenv("OTLP_ENDPOINT"):
+        exporters.append(OtlpExporter(endpoint))
+    return Instrumentation(exporters)
+
+
+# Spans are timed from any thread, so the registry is a plain module global
+instrumentation = _from_env()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[dict[str, Any]]:
+    """
+    Time the enclosed block as phase `name`; spans nest. Yields the span's
+    attributes, for the block to add what it learns (e.g. a `run_id`).
+    """
+    parent = current_span.get()
+    context = parent.child() if parent else SpanContext.new_trace()
+    name_token, span_token = _parent.set(name), current_span.set(context)
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        seconds = time.perf_counter() - start
+        _parent.reset(name_token)
+        current_span.reset(span_token)
+        instrumentation.record(name, seconds, context, **attrs)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator timing every call of a function, sync or async, as phase `name`."""
+
+    def decorate(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def start_run(page: str) -> None:
+    """
+    Mark the start of a full run of `page`, the root span of a new trace;
+    call first thing on the page.
+    """
+    st.session_state.instrumented_page = page
+    st.session_state.run_started = time.perf_counter()
+    st.session_state.run_spans = []
+    st.session_state.run_trace = SpanContext.new_trace()
+    current_span.set(st.session_state.run_trace)
+
+
+def end_run() -> None:
+    """
+    Record the run's total time as `<page>.run` and, with the debug panel
+    enabled, show this run's phases and the process-wide histograms in the
+    sidebar. Call last thing on the page.
+    """
+    page = st.session_state.get("instrumented_page")
+    started = st.session_state.get("run_started")
+    if page is None or started is None:
+        return
+    # The run is the trace's root: it has no parent
+    current_span.set(None)
+    instrumentation.record(
+        f"{page}.run", time.perf_counter() - started, st.session_state.get("run_trace")
+    )
+    if debug_panel_enabled():
+        debug_panel()
+
+
+def _histogram_rows(histograms: dict[str, LatencyHistogram]) -> list[dict]:
+    rows = []
+    for name, histogram in sorted(histograms.items()):
+        snapshot = histogram.snapshot()
+        if snapshot["count"]:
+            rows.append({
+                "phase": name,
+                "count": snapshot["count"],
+                "mean (ms)": round(snapshot["mean"] * 1000, 1),
+                "p50 ≤ (ms)": histogram.quantile(0.5) * 1000,
+                "p95 ≤ (ms)": histogram.quantile(0.95) * 1000,
+            })
+    return rows
+
+
+def debug_panel() -> None:
+    """Sidebar panel with the last run's phases and latency histograms."""
+    resources = get_resources()
+    with st.sidebar.expander("⏱️ Timings", expanded=False):
+        st.caption("This run")
+        st.dataframe(
+            [
+                {"phase": name, "ms": round(seconds * 1000, 2)}
+                for name, seconds in st.session_state.get("run_spans", [])
+            ],
+            hide_index=True,
+        )
+        for title, histograms in (
+            ("Page phases", instrumentation.histograms),
+            ("Backend calls", resources.backend_latency),
+            ("Agent calls", resources.agent_latency),
+        ):
+            st.caption(title)
+            st.dataframe(_histogram_rows(histograms), hide_index=True)
@@ -0,0 +1,73 @@
+import math
+import time
+
+EARTH_RADIUS_M = 6_371_000.0
+# Seconds between location checks while moving / once stationary
+MOVING_INTERVAL = 10.0
+STATIONARY_INTERVAL = 60.0
+# Movement (metres) between two fixes that counts as "moving"
+MOVEMENT_THRESHOLD_M = 25.0
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points, in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class LocationTracker:
+    """
+    Decides when the Active Trip page should look up the current location.
+
+    The page's refresher ticks every `moving_interval` seconds but only
+    fetches a fix when `is_due()`. After a fix that moved more than
+    `movement_threshold_m` the interval drops back to `moving_interval`;
+    while the position stays put it grows by `backoff` per fix up to
+    `stationary_interval`. Failed lookups are retried at the current
+    interval.
+    """
+
+    def __init__(
+        self,
+        moving_interval: float = MOVING_INTERVAL,
+        stationary_interval: float = STATIONARY_INTERVAL,
+        movement_threshold_m: float = MOVEMENT_THRESHOLD_M,
+        backoff: float = 1.5,
+    ) -> None:
+        self.moving_interval = moving_interval
+        self.stationary_interval = stationary_interval
+        self.movement_threshold_m = movement_threshold_m
+        self.backoff = backoff
+        self.interval = moving_interval
+        self.position: tuple[float, float] | None = None
+        self.updated_at: float | None = None
+        self._next_check = 0.0
+
+    def is_due(self, now: float | None = None) -> bool:
+        return (time.monotonic() if now is None else now) >= self._next_check
+
+    @property
+    def is_moving(self) -> bool:
+        return self.interval <= self.moving_interval
+
+    def update(self, latitude: float, longitude: float, now: float | None = None) -> bool:
+        """Record a fix and schedule the next check. Returns True if it moved."""
+        now = time.monotonic() if now is None else now
+        moved = self.position is None or (
+            haversine_m(*self.position, latitude, longitude) > self.movement_threshold_m
+        )
+        if moved:
+            self.interval = self.moving_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.stationary_interval)
+        self.position = (latitude, longitude)
+        self.updated_at = now
+        self._next_check = now + self.interval
+        return moved
+
+    def failed(self, now: float | None = None) -> None:
+        """Schedule a retry after a failed lookup."""
+        self._next_check = (time.monotonic() if now is None else now) + self.interval
@@ -0,0 +1,195 @@
+import logging
+import math
+import os
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from streamlit.runtime import Runtime
+
+from client.guardian_lane import LabeledCounter, LatencyHistogram
+from utils.instrumentation import instrumentation
+from utils.resources import Resources
+from utils.sos import alert_latency
+
+logger = logging.getLogger(__name__)
+
+# Default port of the metrics endpoint, the usual one for Prometheus exporters
+DEFAULT_METRICS_PORT = 9464
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "guardian_lane"
+
+
+def metrics_port() -> int | None:
+    """Port of the metrics endpoint from `METRICS_PORT`; 0 turns it off."""
+    port = int(os.getenv("METRICS_PORT", str(DEFAULT_METRICS_PORT)))
+    return port or None
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels: str) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_label(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class MetricsRegistry:
+    """
+    Renders the process's metrics in the Prometheus text format. Nothing is
+    recorded here: the clients, caches and page spans already keep their
+    histograms and counters, and a scrape only reads them, so requests pay
+    for a bucket increment and a counter increment and nothing else.
+    """
+
+    def __init__(self, resources: Resources) -> None:
+        self.resources = resources
+
+    def _histograms(
+        self, name: str, help: str, label: str, histograms: dict[str, LatencyHistogram]
+    ) -> Iterator[str]:
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} histogram"
+        for key, histogram in sorted(histograms.items()):
+            snapshot = histogram.snapshot()
+            cumulative = 0
+            for bound, count in snapshot["buckets"].items():
+                cumulative += count
+                yield f"{name}_bucket{_labels(**{label: key, 'le': _number(bound)})} {cumulative}"
+            total = snapshot["mean"] * snapshot["count"]
+            yield f"{name}_sum{_labels(**{label: key})} {_number(total)}"
+            yield f"{name}_count{_labels(**{label: key})} {snapshot['count']}"
+
+    def _counter(
+        self, name: str, help: str, labels: tuple[str, ...], counter: LabeledCounter
+    ) -> Iterator[str]:
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} counter"
+        for values, value in sorted(counter.snapshot().items()):
+            yield f"{name}{_labels(**dict(zip(labels, values)))} {_number(value)}"
+
+    def _caches(self) -> Iterator[str]:
+        caches = {
+            "profiles": self.resources.profiles,
+            "safety_insights": self.resources.insights,
+            "addresses": self.resources.addresses,
+            "routes": self.resources.routes,
+        }
+        for kind in ("hits", "misses"):
+            name = f"{PREFIX}_cache_{kind}_total"
+            yield f"# HELP {name} Cache lookups answered {'from' if kind == 'hits' else 'without'} the cache."
+            yield f"# TYPE {name} counter"
+            for cache, obj in caches.items():
+                yield f"{name}{_labels(cache=cache)} {getattr(obj, kind)}"
+
+    def _sessions(self) -> Iterator[str]:
+        if not Runtime.exists():
+            return
+        try:
+            active = Runtime.instance()._session_mgr.num_active_sessions()
+        except AttributeError:  # Session manager internals moved
+            return
+        name = f"{PREFIX}_active_sessions"
+        yield f"# HELP {name} Browser sessions connected to this server."
+        yield f"# TYPE {name} gauge"
+        yield f"{name} {active}"
+
+    def render(self) -> str:
+        resources = self.resources
+        lines = [
+            *self._counter(
+                f"{PREFIX}_backend_requests_total",
+                "Backend API requests by endpoint and status code (or error).",
+                ("endpoint", "status"),
+                resources.backend_requests,
+            ),
+            *self._histograms(
+                f"{PREFIX}_backend_request_duration_seconds",
+                "Backend API request latency.",
+                "endpoint",
+                resources.backend_latency,
+            ),
+            *self._counter(
+                f"{PREFIX}_agent_requests_total",
+                "Agent service requests by endpoint and status code (or error).",
+                ("endpoint", "status"),
+                resources.agent_requests,
+            ),
+            *self._histograms(
+                f"{PREFIX}_agent_request_duration_seconds",
+                "Agent service request latency; /stream:first is the time to the first token.",
+                "endpoint",
+                resources.agent_latency,
+            ),
+            *self._counter(
+                f"{PREFIX}_agent_stream_tokens_total",
+                "Tokens streamed from the agent service.",
+                ("agent",),
+                resources.agent_tokens,
+            ),
+            *self._histograms(
+                f"{PREFIX}_page_phase_duration_seconds",
+                "Time spent in page phases and whole page runs.",
+                "phase",
+                instrumentation.histograms,
+            ),
+            *self._histograms(
+                f"{PREFIX}_sos_alert_duration_seconds",
+                "Time from pressing SOS to every alert request settling, by outcome.",
+                "outcome",
+                alert_latency,
+            ),
+            *self._caches(),
+            *self._sessions(),
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves `registry` at `/metrics` from a daemon thread."""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = "127.0.0.1") -> None:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="metrics-server", daemon=True
+        )
+        self.thread.start()
+
+
+def start_metrics_server(resources: Resources) -> MetricsServer | None:
+    """
+    Serve the metrics on localhost at `METRICS_PORT`, unless it's 0 or the
+    port is taken (e.g. by another app process on the same host).
+    """
+    if (port := metrics_port()) is None:
+        return None
+    try:
+        return MetricsServer(MetricsRegistry(resources), port)
+    except OSError as e:
+        logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+        return None
@@ -0,0 +1,294 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from client import GuardianLaneClient, GuardianLaneClientError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.getenv(
+    "OUTBOX_PATH", str(Path.home() / ".guardian_lane" / "outbox.sqlite3")
+)
+KIND_PATHS = {
+    "sos": "/sos/send-alert",
+    "emergency": "/emergency/send-message",
+}
+# Statuses a message moves through
+PENDING, SENDING, SENT, FAILED = "pending", "sending", "sent", "failed"
+RETRYABLE_STATUSES = {408, 425, 429}
+# The backend rejected the user's access token
+UNAUTHORIZED = 401
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    alert_id TEXT,
+    target TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+CREATE INDEX IF NOT EXISTS outbox_alert ON outbox (alert_id);
+"""
+
+
+def is_retryable(error: GuardianLaneClientError) -> bool:
+    status = error.status_code
+    return status is None or status >= 500 or status in RETRYABLE_STATUSES
+
+
+class OutboxMessage:
+    def __init__(self, row: sqlite3.Row) -> None:
+        self.key = row["key"]
+        self.kind = row["kind"]
+        self.user_id = row["user_id"]
+        self.alert_id = row["alert_id"]
+        self.target = row["target"]
+        self.payload = json.loads(row["payload"])
+        self.status = row["status"]
+        self.attempts = row["attempts"]
+        self.next_attempt = row["next_attempt"]
+        self.last_error = row["last_error"]
+        self.created_at = row["created_at"]
+        self.sent_at = row["sent_at"]
+
+
+class Outbox:
+    """
+    SQLite-backed record of every SOS and emergency message.
+
+    Messages are written before the first send attempt and keep their
+    idempotency key (the row's `key`) across retries, so the backend can
+    drop duplicates when an attempt that looked failed had in fact landed.
+    Timestamps are wall-clock (`time.time()`) so they survive restarts.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        max_attempts: int = 15,
+    ) -> None:
+        self.path = path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # Attempts interrupted by a restart are retried
+        self._execute("UPDATE outbox SET status = ? WHERE status = ?", (PENDING, SENDING))
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def enqueue(
+        self,
+        kind: str,
+        user_id: str,
+        target: str,
+        payload: dict,
+        alert_id: str | None = None,
+        status: str = PENDING,
+    ) -> str:
+        """Record a message and return its idempotency key."""
+        key = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO outbox (key, kind, user_id, alert_id, target, payload, status,"
+            " next_attempt, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, kind, user_id, alert_id, target, json.dumps(payload), status, now, now),
+        )
+        return key
+
+    def claim_due(self, user_ids: list[str], limit: int = 20) -> list[OutboxMessage]:
+        """Mark up to `limit` due messages of `user_ids` as sending and return them."""
+        if not user_ids:
+            return []
+        marks = ",".join("?" * len(user_ids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT * FROM outbox WHERE status = ? AND next_attempt <= ?"
+                f" AND user_id IN ({marks}) ORDER BY next_attempt LIMIT ?",
+                (PENDING, time.time(), *user_ids, limit),
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE outbox SET status = ? WHERE key = ?",
+                [(SENDING, row["key"]) for row in rows],
+            )
+        return [OutboxMessage(row) for row in rows]
+
+    def mark_sent(self, key: str) -> None:
+        self._execute(
+            "UPDATE outbox SET status = ?, attempts = attempts + 1, sent_at = ?,"
+            " last_error = NULL WHERE key = ?",
+            (SENT, time.time(), key),
+        )
+
+    def hold(self, key: str, error: str) -> None:
+        """
+        Put a message back as pending and due, without counting the attempt:
+        the request itself was fine, only the credentials it went with weren't.
+        """
+        self._execute(
+            "UPDATE outbox SET status = ?, next_attempt = ?, last_error = ? WHERE key = ?",
+            (PENDING, time.time(), error, key),
+        )
+
+    def mark_failed(self, key: str, error: str, retryable: bool = True) -> None:
+        """Schedule a retry with exponential backoff, or give up."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT attempts FROM outbox WHERE key = ?", (key,)
+            ).fetchone()
+            attempts = (row["attempts"] if row else 0) + 1
+            if not retryable or attempts >= self.max_attempts:
+                status, next_attempt = FAILED, time.time()
+            else:
+                delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+                status = PENDING
+                next_attempt = time.time() + delay * random.uniform(0.5, 1.0)
+            self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?,"
+                " last_error = ? WHERE key = ?",
+                (status, attempts, next_attempt, error, key),
+            )
+
+    def messages(self, alert_ids: list[str]) -> list[OutboxMessage]:
+        if not alert_ids:
+            return []
+        marks = ",".join("?" * len(alert_ids))
+        rows = self._execute(
+            f"SELECT * FROM outbox WHERE alert_id IN ({marks}) ORDER BY created_at",
+            tuple(alert_ids),
+        )
+        return [OutboxMessage(row) for row in rows]
+
+    def pending_count(self) -> int:
+        return self._execute(
+            "SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)", (PENDING, SENDING)
+        )[0][0]
+
+
+class OutboxSender:
+    """
+    Sends outbox messages: right away via `send()`, then in the background
+    (`run()`, on the shared event loop) for anything that failed, with
+    exponential backoff. Messages go out with the client registered for
+    their user, so a user's pending messages wait until they have a
+    session after a restart. A message rejected with 401 isn't given up
+    on: the user's messages are held until their client carries another
+    access token (a refreshed one, or a new login) and then sent with it.
+    """
+
+    def __init__(self, outbox: Outbox, poll_interval: float = 1.0) -> None:
+        self.outbox = outbox
+        self.poll_interval = poll_interval
+        self._clients: dict[str, GuardianLaneClient] = {}
+        # Access token the backend last rejected, by user
+        self._rejected: dict[str, str | None] = {}
+
+    def register(self, client: GuardianLaneClient) -> None:
+        if client.token and client.token.get("user_id"):
+            self._clients[client.token["user_id"]] = client
+
+    def token_rejected(self, token: dict | None) -> bool:
+        """Whether the user's messages are held because the backend rejected `token`."""
+        if not token or token.get("user_id") not in self._rejected:
+            return False
+        return self._rejected[token["user_id"]] == token.get("access_token")
+
+    def _ready_users(self) -> list[str]:
+        return [
+            user_id for user_id, client in self._clients.items()
+            if not self.token_rejected(client.token)
+        ]
+
+    async def _attempt(
+        self, client: GuardianLaneClient, key: str, kind: str, payload: dict, timeout: float
+    ) -> bool:
+        try:
+            await client.arequest(
+                "POST",
+                KIND_PATHS[kind],
+                json=payload,
+                timeout=timeout,
+                headers=client.idempotency_headers(key),
+            )
+        except GuardianLaneClientError as e:
+            if e.status_code == UNAUTHORIZED:
+                self._rejected[client.token["user_id"]] = client.token.get("access_token")
+                self.outbox.hold(key, str(e))
+            else:
+                self.outbox.mark_failed(key, str(e), is_retryable(e))
+            return False
+        except asyncio.CancelledError:
+            self.outbox.mark_failed(key, "timed out")
+            raise
+        except Exception as e:
+            # A bug or an unexpected error mustn't strand the row in SENDING
+            logger.exception("Sending outbox message %s failed", key)
+            self.outbox.mark_failed(key, repr(e))
+            return False
+        self.outbox.mark_sent(key)
+        return True
+
+    async def send(
+        self,
+        client: GuardianLaneClient,
+        kind: str,
+        target: str,
+        payload: dict,
+        alert_id: str | None = None,
+        timeout: float | None = None,
+    ) -> bool:
+        """
+        Record a message and try to send it now. Returns True if delivered;
+        otherwise it stays in the outbox for the background sender.
+        """
+        self.register(client)
+        key = self.outbox.enqueue(
+            kind, client.token["user_id"], target, payload, alert_id, status=SENDING
+        )
+        return await self._attempt(client, key, kind, payload, timeout or client.timeout)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                due = self.outbox.claim_due(self._ready_users())
+                if due:
+                    await asyncio.gather(
+                        *(
+                            self._attempt(
+                                self._clients[m.user_id], m.key, m.kind, m.payload,
+                                self._clients[m.user_id].timeout,
+                            )
+                            for m in due
+                        ),
+                        return_exceptions=True,
+                    )
+                    continue
+            except Exception:
+                # e.g. the database is locked; try again on the next poll
+                logger.exception("Outbox sender poll failed")
+            await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,105 @@
+import json
+import re
+from typing import Any
+
+PARTIAL_ESCAPE_RE = re.compile(r"\\(u[0-9a-fA-F]{0,3})?$")
+CLOSERS = {"{": "}", "[": "]"}
+
+
+class IncrementalJSONParser:
+    """
+    Tolerant parser for a JSON document that arrives in chunks.
+
+    `feed()` scans only the new characters, tracking open containers,
+    string state and the positions where the document could be cut and
+    closed. `value()` returns the best-effort parse of everything received
+    so far by closing open strings and containers, falling back to earlier
+    cut points when the tail is not yet valid (e.g. a half-written key or
+    literal).
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escaped = False
+        # (cut position, open containers at that position), latest last
+        self._cuts: list[tuple[int, tuple[str, ...]]] = []
+        self._cache: tuple[int, Any] | None = None
+        # End of the last top-level object member known to be complete
+        self._last_member_end: int | None = None
+
+    @property
+    def complete(self) -> bool:
+        """True once the top-level value has been closed."""
+        return bool(self.text.strip()) and not self._stack and not self._in_string
+
+    def feed(self, chunk: str) -> None:
+        start = len(self.text)
+        self.text += chunk
+        for i in range(start, len(self.text)):
+            char = self.text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in CLOSERS:
+                self._stack.append(char)
+                self._cuts.append((i + 1, tuple(self._stack)))
+            elif char in "]}":
+                if self._stack:
+                    self._stack.pop()
+                self._cuts.append((i + 1, tuple(self._stack)))
+            elif char == ",":
+                self._cuts.append((i, tuple(self._stack)))
+                if self._stack == ["{"]:
+                    self._last_member_end = i
+
+    @staticmethod
+    def _close(text: str, stack: tuple[str, ...] | list[str]) -> str:
+        return text + "".join(CLOSERS[c] for c in reversed(stack))
+
+    def value(self) -> Any | None:
+        """Best-effort value of the document so far, or None if nothing parses yet."""
+        if self._cache and self._cache[0] == len(self.text):
+            return self._cache[1]
+        candidates = []
+        if self._in_string:
+            candidates.append(
+                self._close(PARTIAL_ESCAPE_RE.sub("", self.text) + '"', self._stack)
+            )
+        else:
+            candidates.append(self._close(self.text, self._stack))
+        candidates.extend(
+            self._close(self.text[:pos], stack) for pos, stack in reversed(self._cuts)
+        )
+        result = None
+        for candidate in candidates:
+            try:
+                result = json.loads(candidate)
+                break
+            except ValueError:
+                continue
+        self._cache = (len(self.text), result)
+        return result
+
+    def completed_fields(self) -> dict[str, Any]:
+        """
+        Top-level object fields that are fully received: those followed by a
+        comma, or all of them once the object has closed.
+        """
+        if self.complete:
+            value = self.value()
+            return value if isinstance(value, dict) else {}
+        if self._last_member_end is None:
+            return {}
+        try:
+            return json.loads(self.text[: self._last_member_end] + "}")
+        except ValueError:
+            return {}
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from client import GuardianLaneClient, GuardianLaneClientError
+
+# Cached profiles older than this (seconds) are refetched on the next read
+MAX_AGE = 3600.0
+
+
+class ProfileCache:
+    """
+    Process-wide cache of user profiles, emergency contacts included, keyed
+    by `user_id`.
+
+    Profiles are loaded once at login (`aload()`, in the background) and
+    then served from memory; `get()` only goes to the backend for a missing
+    or expired entry, and keeps serving the old profile if that refetch
+    fails. `cached()` never touches the network, so the SOS path can read a
+    user's contacts instantly. A user's entry is dropped with `invalidate()`
+    when they log out; the app has no profile or contact editing, so edits
+    made elsewhere show up at the next login or after `max_age`.
+    """
+
+    def __init__(self, max_age: float = MAX_AGE) -> None:
+        self.max_age = max_age
+        self._profiles: dict[str, tuple[dict, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, user_id: str) -> dict | None:
+        """The user's cached profile, however old, without any network call."""
+        with self._lock:
+            entry = self._profiles.get(user_id)
+        return entry[0] if entry else None
+
+    def put(self, user_id: str, profile: dict) -> None:
+        with self._lock:
+            self._profiles[user_id] = (profile, time.monotonic())
+
+    def invalidate(self, user_id: str | None = None) -> None:
+        """Drop one user's profile, or every profile."""
+        with self._lock:
+            if user_id is None:
+                self._profiles.clear()
+            else:
+                self._profiles.pop(user_id, None)
+
+    def _fresh(self, user_id: str) -> dict | None:
+        with self._lock:
+            entry = self._profiles.get(user_id)
+        if entry and time.monotonic() - entry[1] < self.max_age:
+            return entry[0]
+        return None
+
+    def get(self, client: GuardianLaneClient, user_id: str) -> dict:
+        """
+        The user's profile, fetched with `client` (logged in as that user)
+        if it isn't cached or has expired. Raises `GuardianLaneClientError`
+        only when there is nothing cached to fall back on.
+        """
+        if (profile := self._fresh(user_id)) is not None:
+            self.hits += 1
+            return profile
+        self.misses += 1
+        try:
+            profile = client.get_user()
+        except GuardianLaneClientError:
+            if (stale := self.cached(user_id)) is not None:
+                return stale
+            raise
+        self.put(user_id, profile)
+        return profile
+
+    async def aload(self, client: GuardianLaneClient, user_id: str) -> dict | None:
+        """Fetch and cache the user's profile; None if the backend can't be reached."""
+        try:
+            profile = await client.aget_user()
+        except GuardianLaneClientError:
+            return None
+        self.put(user_id, profile)
+        return profile
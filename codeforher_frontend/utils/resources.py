@@ -0,0 +1,198 @@
+import asyncio
+import os
+import queue
+import threading
+from collections.abc import AsyncGenerator, Awaitable, Coroutine, Generator
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+import httpx
+import streamlit as st
+from dotenv import load_dotenv
+
+from client.guardian_lane import (
+    DEFAULT_BASE_URL,
+    KEEPALIVE_EXPIRY,
+    LabeledCounter,
+    POOL_LIMITS,
+    LatencyHistogram,
+    make_async_http_client,
+    make_http_client,
+)
+from utils.address_index import AddressBook
+from utils.outbox import Outbox, OutboxSender
+from utils.profile_cache import ProfileCache
+from utils.route_cache import RouteCache
+from utils.safety_cache import SegmentInsightsCache
+from utils.warmup import ModulePreloader, preload_enabled
+
+T = TypeVar("T")
+# Pings run a little more often than idle pooled connections expire
+KEEPALIVE_INTERVAL = KEEPALIVE_EXPIRY / 2
+_DONE = object()
+
+
+def default_agent_url() -> str:
+    load_dotenv()
+    agent_url = os.getenv("AGENT_URL")
+    if not agent_url:
+        host = os.getenv("HOST", "0.0.0.0")
+        port = os.getenv("PORT", 8080)
+        agent_url = f"http://{host}:{port}/api/agent"
+    return agent_url
+
+
+class BackgroundLoop:
+    """An asyncio event loop running forever in a daemon thread."""
+
+    def __init__(self, name: str = "guardian-lane-loop") -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> Future[T]:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+        """Run `coro` on the loop and block until it finishes."""
+        return self.submit(coro).result(timeout)
+
+    def awaitable(self, coro: Coroutine[Any, Any, T]) -> Awaitable[T]:
+        """Run `coro` on the loop, awaitable from another event loop."""
+        return asyncio.wrap_future(self.submit(coro))
+
+    def iterate(self, agen: AsyncGenerator[T, None]) -> Generator[T, None, None]:
+        """Consume `agen` on the loop, yielding its items to the calling thread."""
+        items: queue.Queue = queue.Queue()
+
+        async def pump() -> None:
+            try:
+                async for item in agen:
+                    items.put(item)
+            except Exception as e:
+                items.put(e)
+                return
+            items.put(_DONE)
+
+        future = self.submit(pump())
+        try:
+            while (item := items.get()) is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    async def aiterate(self, agen: AsyncGenerator[T, None]) -> AsyncGenerator[T, None]:
+        """Like `iterate()`, for callers running their own event loop."""
+        caller = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+
+        async def pump() -> None:
+            try:
+                async for item in agen:
+                    caller.call_soon_threadsafe(items.put_nowait, item)
+            except Exception as e:
+                caller.call_soon_threadsafe(items.put_nowait, e)
+                return
+            caller.call_soon_threadsafe(items.put_nowait, _DONE)
+
+        future = self.submit(pump())
+        try:
+            while (item := await items.get()) is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+
+class Resources:
+    """
+    Long-lived objects shared by every session of the Streamlit server: one
+    background event loop, the connection pools for the backend and the
+    agent service, the SOS/emergency message outbox with its sender, the
+    per-user profile cache, the address book behind address suggestions,
+    the planned routes and the per-road safety insights cache.
+    Async pools belong to the background loop, so coroutines using them must
+    be run through `loop`.
+    """
+
+    def __init__(
+        self,
+        backend_url: str = DEFAULT_BASE_URL,
+        agent_url: str | None = None,
+        keepalive_interval: float = KEEPALIVE_INTERVAL,
+    ) -> None:
+        self.backend_url = backend_url.rstrip("/")
+        self.agent_url = agent_url or default_agent_url()
+        self.keepalive_interval = keepalive_interval
+        self.loop = BackgroundLoop()
+        self.backend_http = make_http_client(self.backend_url)
+        self.backend_async_http = make_async_http_client(self.backend_url)
+        self.backend_latency: dict[str, LatencyHistogram] = {}
+        self.agent_latency: dict[str, LatencyHistogram] = {}
+        # Requests by (endpoint, status) and streamed tokens by agent
+        self.backend_requests = LabeledCounter()
+        self.agent_requests = LabeledCounter()
+        self.agent_tokens = LabeledCounter()
+        self.agent_http = httpx.Client(
+            transport=httpx.HTTPTransport(retries=2, limits=POOL_LIMITS)
+        )
+        self.agent_async_http = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(retries=2, limits=POOL_LIMITS)
+        )
+        self.outbox = Outbox()
+        self.outbox_sender = OutboxSender(self.outbox)
+        self.profiles = ProfileCache()
+        self.addresses = AddressBook()
+        self.routes = RouteCache()
+        self.insights = SegmentInsightsCache()
+        self.preloader = ModulePreloader()
+        self._keepalive: Future | None = None
+        self._sender: Future | None = None
+        self.metrics_server = None
+
+    def warm_up(self) -> None:
+        """
+        Open connections to both services now and keep them alive, start
+        retrying undelivered outbox messages, preload the map and audio
+        modules unless `PRELOAD_MODULES=0`, and serve Prometheus metrics on
+        localhost at `METRICS_PORT` (default 9464) unless it's 0.
+        """
+        # Imported here: the metrics read page timings, whose module needs this one
+        from utils.metrics import start_metrics_server
+
+        if self.metrics_server is None:
+            self.metrics_server = start_metrics_server(self)
+        if preload_enabled():
+            self.preloader.start()
+        if self._keepalive is None:
+            self._keepalive = self.loop.submit(self._keep_alive())
+        if self._sender is None:
+            self._sender = self.loop.submit(self.outbox_sender.run())
+
+    async def _ping(self) -> None:
+        # Any response, even a 404, leaves a warm connection in the pool
+        targets = [
+            (self.backend_http, self.backend_async_http, f"{self.backend_url}/"),
+            (self.agent_http, self.agent_async_http, f"{self.agent_url}/info"),
+        ]
+        pings = []
+        for http, async_http, url in targets:
+            pings.append(async_http.get(url, timeout=5.0))
+            pings.append(asyncio.to_thread(http.get, url, timeout=5.0))
+        await asyncio.gather(*pings, return_exceptions=True)
+
+    async def _keep_alive(self) -> None:
+        while True:
+            await self._ping()
+            await asyncio.sleep(self.keepalive_interval)
+
+
+@st.cache_resource
+def get_resources() -> Resources:
+    """The server's shared resources, created and warmed on first use."""
+    resources = Resources()
+    resources.warm_up()
+    return resources
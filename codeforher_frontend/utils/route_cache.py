@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Routes are kept this long (seconds)
+ROUTE_TTL = 3600.0
+# Routes whose safety analysis failed are fetched again after this long
+INSIGHTS_RETRY_TTL = 60.0
+# Routes kept at most; the least recently planned go first
+MAX_ROUTES = 500
+
+
+class RouteEntry:
+    """
+    A route's sections as they arrive, readable by other sessions while
+    one loads them: `wait()` blocks until the next update or the end of the
+    load.
+    """
+
+    def __init__(self) -> None:
+        self.sections: dict = {}
+        self.fetched_at = time.monotonic()
+        self.ttl = ROUTE_TTL
+        self.done = False
+        # Bumped on every update, for followers to see what they've missed
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def add(self, section: str, data) -> None:
+        with self._changed:
+            self.sections[section] = data
+            self.version += 1
+            self._changed.notify_all()
+
+    def finish(self) -> None:
+        with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    def wait(self, version: int, timeout: float | None = None) -> bool:
+        """Wait for an update after `version` or the end of the load; False on timeout."""
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: self.done or self.version > version, timeout
+            )
+
+    def expired(self, now: float) -> bool:
+        return now - self.fetched_at > self.ttl
+
+
+class RouteCache:
+    """
+    Process-wide route sections keyed by ``(source, destination)``.
+
+    Entries expire after `ROUTE_TTL` (`INSIGHTS_RETRY_TTL` without safety
+    insights), and expired ones are dropped whenever a route is added, as
+    are the least recently planned beyond `max_entries`. One session loads
+    a route at a time: `claim()` hands the others the entry being loaded,
+    to follow instead of fetching it again.
+    """
+
+    def __init__(self, max_entries: int = MAX_ROUTES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], RouteEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, route_key: tuple[str, str]) -> RouteEntry | None:
+        """The route's entry, loaded or loading, unless it has expired."""
+        with self._lock:
+            entry = self._entries.get(route_key)
+        if entry is None or entry.expired(time.monotonic()):
+            return None
+        return entry
+
+    def sections(self, route_key: tuple[str, str]) -> dict:
+        """Sections fetched so far for a route, or an empty dict if missing/expired."""
+        entry = self.get(route_key)
+        return entry.sections if entry else {}
+
+    def claim(self, route_key: tuple[str, str]) -> tuple[RouteEntry, bool]:
+        """
+        The route's entry, and whether the caller must load it: True for a
+        new entry, False for one already loaded or being loaded.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(route_key)
+            if entry is not None and not entry.expired(now):
+                self._entries.move_to_end(route_key)
+                self.hits += 1
+                return entry, False
+            self.misses += 1
+            entry = self._entries[route_key] = RouteEntry()
+            self._evict(now)
+            return entry, True
+
+    def finish(self, route_key: tuple[str, str], entry: RouteEntry, ok: bool) -> None:
+        """End a load; a failed route is dropped so the next visit retries it."""
+        if ok and not entry.sections.get("insights"):
+            entry.ttl = INSIGHTS_RETRY_TTL
+        with self._lock:
+            if not ok and self._entries.get(route_key) is entry:
+                del self._entries[route_key]
+        entry.finish()
+
+    def _evict(self, now: float) -> None:
+        for key in [k for k, entry in self._entries.items() if entry.expired(now)]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
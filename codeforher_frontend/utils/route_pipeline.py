@@ -0,0 +1,216 @@
+import asyncio
+import functools
+import json
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from typing import Any, List
+
+from pydantic import BaseModel
+
+from client import GuardianLaneClient, GuardianLaneClientError
+from utils.address_index import AddressBook
+from utils.partial_json import IncrementalJSONParser
+from utils.safety_cache import SafetyLookup, SegmentInsightsCache
+
+# Returned by _stream_json when the backend has no streaming endpoint
+NOT_STREAMED = object()
+
+
+class RouteStep(BaseModel):
+    instructions: str
+    distance: str
+    duration: str
+
+
+class RouteSafetyRequest(BaseModel):
+    route_steps: List[RouteStep]
+
+
+def route_steps_of(route_steps: dict | None) -> list[dict]:
+    """Steps of the first leg of the first route in a `/maps/get-route` response."""
+    if route_steps and "routes" in route_steps and route_steps["routes"]:
+        return route_steps["routes"][0]["legs"][0]["steps"]
+    return []
+
+
+def safety_request(steps: list[dict]) -> dict:
+    """Build the `/llm/route-safety` payload from route steps."""
+    formatted_steps = [
+        RouteStep(
+            instructions=step["instructions"],
+            distance=step["readable_distance"],
+            duration=step["readable_duration"],
+        )
+        for step in steps
+    ]
+    return RouteSafetyRequest(route_steps=formatted_steps).model_dump()
+
+
+async def _optional(request: Awaitable[dict]) -> dict | None:
+    """Result of a backend call, or None if it failed."""
+    try:
+        return await request
+    except GuardianLaneClientError:
+        return None
+
+
+def _stream_chunk(line: str) -> str | None:
+    """
+    Text carried by one line of an SSE (``data: {...}``) or NDJSON stream of
+    ``{"type": "token", "content": ...}`` events. Lines that aren't JSON events
+    are taken as raw text chunks.
+    """
+    line = line.strip()
+    if line.startswith("data:"):
+        line = line[5:].strip()
+    if not line or line == "[DONE]":
+        return None
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return line
+    if not isinstance(event, dict) or "type" not in event:
+        return line
+    match event["type"]:
+        case "token":
+            return event["content"]
+        case "error":
+            raise ValueError(event.get("content", "stream error"))
+    return None
+
+
+async def _stream_json(
+    lines: AsyncGenerator[str, None],
+    on_fields: Callable[[dict], None],
+) -> Any | None:
+    """
+    Read a stream whose tokens make up one JSON object, calling `on_fields`
+    with the completed top-level fields each time one finishes.
+    """
+    parser = IncrementalJSONParser()
+    completed = 0
+    try:
+        async for line in lines:
+            chunk = _stream_chunk(line)
+            if chunk is None:
+                continue
+            parser.feed(chunk)
+            fields = parser.completed_fields()
+            if len(fields) > completed:
+                completed = len(fields)
+                on_fields(fields)
+    except GuardianLaneClientError as e:
+        return NOT_STREAMED if e.status_code in (404, 405) else None
+    except ValueError:
+        return None
+    return parser.value() if parser.complete else None
+
+
+async def _route_insights(
+    client: GuardianLaneClient,
+    steps: list[dict],
+    insights_cache: SegmentInsightsCache | None,
+    on_partial: Callable[[dict], None],
+) -> dict | None:
+    lookup: SafetyLookup | None = None
+    if insights_cache is not None:
+        lookup = insights_cache.lookup(steps)
+        if lookup.is_complete:
+            return insights_cache.resolve(lookup, None)
+        # Only roads that haven't been analysed recently go to the LLM
+        steps = lookup.missing_steps or steps
+
+    def on_fields(fields: dict) -> None:
+        on_partial(fields if lookup is None else insights_cache.merge(lookup, fields))
+
+    payload = safety_request(steps)
+    response = await _stream_json(client.astream_route_safety(payload), on_fields)
+    if response is NOT_STREAMED:
+        response = await _optional(client.aroute_safety(payload))
+    if lookup is None:
+        return response
+    return insights_cache.resolve(lookup, response)
+
+
+async def route_sections(
+    client: GuardianLaneClient,
+    source: str,
+    destination: str,
+    insights_cache: SegmentInsightsCache | None = None,
+    addresses: AddressBook | None = None,
+) -> AsyncGenerator[tuple[str, Any], None]:
+    """
+    Fetch everything the Trip Planner shows for a route, yielding each section
+    as soon as its data arrives.
+
+    Both endpoints are geocoded concurrently, then time/distance and the route
+    steps are requested together. The slow safety-insights request starts as
+    soon as the steps arrive, without waiting for time/distance. Yields
+    `(section, data)` pairs:
+
+    - ``("route", route_data)``: distance, duration and polyline, with the
+      geocoded ``origin``/``destination`` attached
+    - ``("steps", route_steps)``: the `/maps/get-route` response
+    - ``("insights_partial", fields)``: safety insight fields completed so
+      far, while `/llm/route-safety/stream` is still generating
+    - ``("insights", safety_data)``: the full route-safety response
+
+    The streaming safety endpoint falls back to `/llm/route-safety` when the
+    backend doesn't provide it. A section whose request fails is yielded with ``None``; if geocoding fails
+    only ``("route", None)`` is yielded. With an `insights_cache`, only steps
+    on roads missing from the cache are sent for safety analysis; with an
+    `addresses` book, geocoding results are kept in it (see `AddressBook`), so
+    the same addresses aren't geocoded again on the next fetch.
+    """
+    geocode = (
+        client.ageocode
+        if addresses is None
+        else functools.partial(addresses.ageocode, client, None)
+    )
+    source_coords, dest_coords = await asyncio.gather(
+        _optional(geocode(source)),
+        _optional(geocode(destination)),
+    )
+    if not source_coords or not dest_coords:
+        yield "route", None
+        return
+
+    payload = {
+        "origin": {**source_coords, "address": source},
+        "destination": {**dest_coords, "address": destination},
+    }
+    tasks = {
+        asyncio.create_task(_optional(client.aget_time_distance(payload))): "route",
+        asyncio.create_task(_optional(client.aget_route(payload))): "steps",
+    }
+    partials: asyncio.Queue = asyncio.Queue()
+    next_partial = None
+    try:
+        while tasks:
+            if next_partial is None:
+                next_partial = asyncio.create_task(partials.get())
+            done, _ = await asyncio.wait(
+                [*tasks, next_partial], return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_partial in done:
+                partial = next_partial.result()
+                next_partial = None
+                if not any(task.done() for task in tasks if tasks[task] == "insights"):
+                    yield "insights_partial", partial
+            for task in done:
+                if task not in tasks:
+                    continue
+                section = tasks.pop(task)
+                data = task.result()
+                if section == "route" and data:
+                    data["origin"] = source_coords
+                    data["destination"] = dest_coords
+                elif section == "steps" and (steps := route_steps_of(data)):
+                    insights = _route_insights(
+                        client, steps, insights_cache, partials.put_nowait
+                    )
+                    tasks[asyncio.create_task(insights)] = "insights"
+                yield section, data
+    finally:
+        for task in [*tasks, next_partial]:
+            if task is not None:
+                task.cancel()
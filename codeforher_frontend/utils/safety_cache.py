@@ -0,0 +1,209 @@
+import re
+import threading
+import time
+from datetime import datetime
+
+from utils.trip_index import LOCAL_TZ
+
+TAG_RE = re.compile(r"<[^>]+>")
+BOLD_RE = re.compile(r"<b>(.*?)</b>", re.IGNORECASE)
+ROAD_SUFFIXES = {
+    "rd": "road",
+    "st": "street",
+    "ave": "avenue",
+    "blvd": "boulevard",
+    "hwy": "highway",
+    "ln": "lane",
+    "mn": "main",
+    "cr": "cross",
+    "nh": "national highway",
+}
+# How much of a cached route's set of roads (Jaccard overlap) another route
+# must share to reuse its general insights and tips
+ROUTE_MATCH_THRESHOLD = 0.8
+DIRECTION_WORDS = {
+    "left", "right", "north", "south", "east", "west",
+    "northeast", "northwest", "southeast", "southwest",
+    "slight left", "slight right", "sharp left", "sharp right",
+}
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case a road/area name and expand common abbreviations."""
+    words = re.sub(r"[^a-z0-9 ]+", " ", TAG_RE.sub(" ", name).lower()).split()
+    return " ".join(ROAD_SUFFIXES.get(word, word) for word in words)
+
+
+def segment_key(step: dict) -> str:
+    """
+    Road a route step travels on, e.g. ``"mg road"`` for
+    ``"Turn <b>left</b> onto <b>MG Rd</b>"``. Falls back to the whole
+    instruction text when no road name is marked up.
+    """
+    instructions = step.get("instructions", "")
+    for bold in reversed(BOLD_RE.findall(instructions)):
+        name = normalize_name(bold)
+        if name and name not in DIRECTION_WORDS:
+            return name
+    return normalize_name(instructions)
+
+
+def time_bucket(now: datetime | None = None) -> str:
+    hour = (now or datetime.now(LOCAL_TZ)).hour
+    if 5 <= hour < 12:
+        return "morning"
+    if 12 <= hour < 17:
+        return "afternoon"
+    if 17 <= hour < 21:
+        return "evening"
+    return "night"
+
+
+class SafetyLookup:
+    """Result of looking a route up in the segment cache."""
+
+    def __init__(self, bucket: str, keys: list[str]) -> None:
+        self.bucket = bucket
+        self.keys = keys
+        self.cached: dict[str, dict] = {}
+        self.missing_steps: list[dict] = []
+        self.missing_keys: list[str] = []
+        self.route_entry: dict | None = None
+
+    @property
+    def is_complete(self) -> bool:
+        return not self.missing_steps and self.route_entry is not None
+
+
+class SegmentInsightsCache:
+    """
+    Route-safety insights cached per road segment and time-of-day bucket.
+
+    Routes that share roads with earlier routes only send the steps on roads
+    that have not been analysed recently to `/llm/route-safety`. The
+    backend's `road_conditions` and `areas_of_concern` are stored against
+    the segments they mention, while `general_insights` and `safety_tips`
+    are kept per route (set of roads), only from responses that covered
+    the whole route, and reused for the most similar cached route (at least
+    `ROUTE_MATCH_THRESHOLD` overlap) when every segment is already known.
+    """
+
+    def __init__(self, ttl: float = 3 * 3600, max_entries: int = 20_000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._segments: dict[tuple[str, str], tuple[float, dict]] = {}
+        self._routes: dict[tuple[frozenset, str], tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, steps: list[dict], now: datetime | None = None) -> SafetyLookup:
+        keys = [segment_key(step) for step in steps]
+        result = SafetyLookup(time_bucket(now), keys)
+        expires_before = time.monotonic()
+        with self._lock:
+            for step, key in zip(steps, keys):
+                if key in result.cached:
+                    continue
+                entry = self._segments.get((key, result.bucket))
+                if entry and entry[0] > expires_before:
+                    result.cached[key] = entry[1]
+                    continue
+                result.missing_steps.append(step)
+                if key not in result.missing_keys:
+                    result.missing_keys.append(key)
+            self.hits += len(result.cached)
+            self.misses += len(result.missing_keys)
+            result.route_entry = self._closest_route(set(keys), result.bucket, expires_before)
+        return result
+
+    def _closest_route(self, roads: set[str], bucket: str, now: float) -> dict | None:
+        exact = self._routes.get((frozenset(roads), bucket))
+        if exact and exact[0] > now:
+            return exact[1]
+        best, best_overlap = None, 0.0
+        for (other, other_bucket), (expires_at, entry) in self._routes.items():
+            if other_bucket != bucket or expires_at <= now:
+                continue
+            overlap = len(roads & other) / len(roads | other)
+            if overlap >= ROUTE_MATCH_THRESHOLD and overlap > best_overlap:
+                best, best_overlap = entry, overlap
+        return best
+
+    def resolve(self, lookup: SafetyLookup, response: dict | None) -> dict | None:
+        """
+        Store a backend response for `lookup.missing_steps` (``None`` if nothing
+        was sent) and return insights for the whole route.
+        """
+        if response:
+            self._store(lookup, response)
+            return self.merge(lookup, response)
+        if lookup.is_complete:
+            return self.merge(lookup, lookup.route_entry)
+        return None
+
+    def merge(self, lookup: SafetyLookup, fields: dict) -> dict:
+        """
+        Combine the route's cached segments with `fields` from a response,
+        which may be partial while it is still streaming.
+        """
+        merged = {
+            name: fields[name]
+            for name in ("general_insights", "safety_tips")
+            if name in fields
+        }
+        for name in ("road_conditions", "areas_of_concern"):
+            combined = {}
+            for key in dict.fromkeys(lookup.keys):
+                if key in lookup.cached:
+                    combined.update(lookup.cached[key][name])
+            combined.update(fields.get(name) or {})
+            merged[name] = combined
+        return merged
+
+    def _store(self, lookup: SafetyLookup, response: dict) -> None:
+        # General insights about some of the roads aren't the whole route's
+        whole_route = not lookup.cached or not lookup.missing_steps
+        sent = {key: {"road_conditions": {}, "areas_of_concern": {}} for key in lookup.missing_keys}
+        instructions = dict.fromkeys(sent, "")
+        for step in lookup.missing_steps:
+            instructions[segment_key(step)] += " " + normalize_name(step.get("instructions", ""))
+        for field in ("road_conditions", "areas_of_concern"):
+            for name, text in (response.get(field) or {}).items():
+                normalized = normalize_name(name)
+                owners = [
+                    key
+                    for key in sent
+                    if normalized
+                    and (normalized in key or key in normalized or normalized in instructions[key])
+                ]
+                # Anything that can't be tied to a road stays with every segment sent
+                for key in owners or sent:
+                    sent[key][field][name] = text
+
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if len(self._segments) + len(sent) > self.max_entries:
+                self._evict()
+            for key, segment in sent.items():
+                self._segments[(key, lookup.bucket)] = (expires_at, segment)
+                lookup.cached[key] = segment
+            if whole_route:
+                self._routes[(frozenset(lookup.keys), lookup.bucket)] = (
+                    expires_at,
+                    {
+                        "general_insights": response.get("general_insights", ""),
+                        "safety_tips": response.get("safety_tips", {}),
+                    },
+                )
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for store in (self._segments, self._routes):
+            for key in [k for k, (expires_at, _) in store.items() if expires_at <= now]:
+                del store[key]
+        if len(self._segments) > self.max_entries // 2:
+            # Still too big: drop the entries closest to expiry
+            oldest = sorted(self._segments, key=lambda k: self._segments[k][0])
+            for key in oldest[: len(oldest) // 2]:
+                del self._segments[key]
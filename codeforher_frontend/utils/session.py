@@ -0,0 +1,316 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+import streamlit as st
+from streamlit_extras.switch_page_button import switch_page
+
+from client import GuardianLaneClientError
+from utils.backend import get_backend_client
+from utils.browser import run_script
+from utils.instrumentation import timed
+from utils.resources import get_resources
+
+COOKIE_NAME = "guardian_lane_session"
+SECRET_PATH = Path.home() / ".guardian_lane" / "session_secret"
+SESSION_STORE_PATH = os.getenv(
+    "SESSION_STORE_PATH", str(Path.home() / ".guardian_lane" / "sessions.sqlite3")
+)
+# Sessions whose token carries no expiry are kept this long (seconds)
+SESSION_MAX_AGE = 7 * 24 * 3600
+# Tokens are refreshed this long (seconds) before they expire
+REFRESH_AHEAD = 300
+# After a failed refresh, wait this long (seconds) before trying again
+REFRESH_RETRY = 60
+# Responses meaning the backend has no token refresh endpoint
+UNSUPPORTED_STATUSES = {404, 405, 501}
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def load_secret() -> bytes:
+    """
+    The cookie signing key: `SESSION_SECRET`, or a random key kept in
+    `~/.guardian_lane/session_secret` so sessions survive server restarts.
+    """
+    if secret := os.getenv("SESSION_SECRET"):
+        return secret.encode()
+    try:
+        return SECRET_PATH.read_bytes()
+    except FileNotFoundError:
+        pass
+    SECRET_PATH.parent.mkdir(parents=True, exist_ok=True)
+    secret = secrets.token_bytes(32)
+    try:
+        fd = os.open(SECRET_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process got there first
+        return SECRET_PATH.read_bytes()
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    return secret
+
+
+def token_expiry(token: dict) -> float | None:
+    """
+    When the access token expires (epoch seconds): its JWT `exp` claim if
+    it has one, else the token's `expires_at`. The JWT is only read, not
+    verified; that's the backend's job.
+    """
+    try:
+        claims = json.loads(_b64decode(token["access_token"].split(".")[1]))
+        return float(claims["exp"])
+    except (KeyError, IndexError, ValueError, TypeError, AttributeError):
+        pass
+    expires_at = token.get("expires_at")
+    return float(expires_at) if expires_at else None
+
+
+class SessionSigner:
+    """
+    Packs a session ID into a cookie value and back.
+
+    The value is the base64 JSON payload (the ID and an expiry) plus an
+    HMAC-SHA256 of it, so a cookie edited or forged in the browser is
+    rejected without a store lookup, and an old one stops working once it
+    expires. The token itself never leaves the server.
+    """
+
+    def __init__(self, secret: bytes) -> None:
+        self.secret = secret
+
+    def _signature(self, payload: str) -> str:
+        return _b64encode(hmac.new(self.secret, payload.encode(), hashlib.sha256).digest())
+
+    def sign(self, session_id: str, expires_at: float) -> str:
+        payload = _b64encode(
+            json.dumps({"sid": session_id, "exp": expires_at}, separators=(",", ":")).encode()
+        )
+        return f"{payload}.{self._signature(payload)}"
+
+    def verify(self, value: str, now: float | None = None) -> str | None:
+        """The session ID in a cookie value, or None if it's forged, malformed or expired."""
+        payload, _, signature = value.partition(".")
+        if not hmac.compare_digest(signature, self._signature(payload)):
+            return None
+        try:
+            data = json.loads(_b64decode(payload))
+        except ValueError:
+            return None
+        now = time.time() if now is None else now
+        if data.get("exp", 0) <= now or not isinstance(data.get("sid"), str):
+            return None
+        return data["sid"]
+
+
+class SessionStore:
+    """
+    SQLite-backed login tokens, keyed by the random session ID the cookie
+    carries. The file is readable by the app's user only and outlives
+    server restarts, like the signing key; expired sessions are dropped
+    when the store is opened.
+    """
+
+    def __init__(self, path: str = SESSION_STORE_PATH) -> None:
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions"
+            " (id TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def save(self, session_id: str | None, token: dict, expires_at: float) -> str:
+        """Store `token` under `session_id`, or a new ID if None; returns the ID."""
+        session_id = session_id or secrets.token_urlsafe(32)
+        self._execute(
+            "INSERT OR REPLACE INTO sessions (id, token, expires_at) VALUES (?, ?, ?)",
+            (session_id, json.dumps(token), expires_at),
+        )
+        return session_id
+
+    def load(self, session_id: str) -> dict | None:
+        rows = self._execute(
+            "SELECT token FROM sessions WHERE id = ? AND expires_at > ?",
+            (session_id, time.time()),
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def delete(self, session_id: str) -> None:
+        self._execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+@st.cache_resource
+def get_signer() -> SessionSigner:
+    return SessionSigner(load_secret())
+
+
+@st.cache_resource
+def get_session_store() -> SessionStore:
+    return SessionStore()
+
+
+@st.cache_resource
+def _refresh_support() -> dict:
+    """Process-wide note of whether the backend supports token refresh."""
+    return {"supported": True}
+
+
+def _write_cookie(value: str, max_age: int) -> None:
+    """Set the session cookie on the app's own page, from a hidden component."""
+    run_script(
+        f"""
+        const doc = window.parent.document;
+        const secure = doc.location.protocol === "https:" ? "; Secure" : "";
+        doc.cookie = "{COOKIE_NAME}={value}; Max-Age={max_age}; Path=/; SameSite=Strict" + secure;
+        """
+    )
+
+
+def save_session(token: dict) -> None:
+    """
+    Store the token server-side, if it has changed, and put its session
+    ID in the signed session cookie.
+    """
+    if st.session_state.get("saved_token") == token:
+        return
+    expires_at = token_expiry(token) or time.time() + SESSION_MAX_AGE
+    session_id = get_session_store().save(st.session_state.get("session_id"), token, expires_at)
+    value = get_signer().sign(session_id, expires_at)
+    _write_cookie(value, max(int(expires_at - time.time()), 0))
+    st.session_state.session_id = session_id
+    st.session_state.saved_token = token
+    st.session_state.session_cookie = value
+
+
+def restore_session() -> bool:
+    """
+    Put the token back into session state from the session cookie after a
+    browser reload. Returns True if the session has a token.
+    """
+    if "token" in st.session_state:
+        return True
+    # The request's cookies don't change for the session, so a logout has
+    # to be remembered rather than read from them
+    if st.session_state.get("logged_out"):
+        return False
+    value = st.context.cookies.get(COOKIE_NAME)
+    session_id = get_signer().verify(value) if isinstance(value, str) and value else None
+    token = get_session_store().load(session_id) if session_id else None
+    if not token or "user_id" not in token:
+        return False
+    st.session_state.token = token
+    st.session_state.session_id = session_id
+    st.session_state.saved_token = token
+    st.session_state.session_cookie = value
+    return True
+
+
+def start_session(token: dict) -> None:
+    """Log in with a token from `/auth/login`."""
+    st.session_state.pop("logged_out", None)
+    st.session_state.token = token
+    # Messages held for the user's previous, rejected token go out with this one
+    get_resources().outbox_sender.register(get_backend_client())
+
+
+def end_session() -> None:
+    """
+    Log out: clear the session, forget the user's cached profile and have
+    the Login page delete the cookie.
+    """
+    if session_id := st.session_state.get("session_id"):
+        get_session_store().delete(session_id)
+    token = st.session_state.get("token")
+    if isinstance(token, dict) and token.get("user_id"):
+        get_resources().profiles.invalidate(token["user_id"])
+    st.session_state.clear()
+    st.session_state.logged_out = True
+
+
+def clear_session_cookie() -> None:
+    """Delete the session cookie after a logout."""
+    if st.session_state.get("logged_out") and st.session_state.get("session_cookie") != "":
+        _write_cookie("", 0)
+        st.session_state.session_cookie = ""
+
+
+def refresh_session() -> None:
+    """
+    Swap the access token for a fresh one in the background once it is
+    within `REFRESH_AHEAD` seconds of expiring, and store the new one when
+    it arrives, or straight away when the outbox is holding the user's
+    messages because the backend rejected the token. A failed refresh is
+    retried after `REFRESH_RETRY` seconds; if the backend rejects the
+    token (401), the session is over and the user is sent back to Login. Cheap enough to call on every rerun,
+    fragments included.
+    """
+    token = st.session_state.get("token")
+    if not token:
+        return
+    future: Future | None = st.session_state.get("token_refresh")
+    if future is not None:
+        if not future.done():
+            return
+        st.session_state.token_refresh = None
+        try:
+            refreshed = future.result()
+        except GuardianLaneClientError as e:
+            if e.status_code == 401:
+                end_session()
+                st.rerun(scope="app")
+            if e.status_code in UNSUPPORTED_STATUSES:
+                _refresh_support()["supported"] = False
+            st.session_state.token_refresh_failed_at = time.time()
+            return
+        st.session_state.pop("token_refresh_failed_at", None)
+        st.session_state.token = {**token, **refreshed}
+        save_session(st.session_state.token)
+        get_resources().outbox_sender.register(get_backend_client())
+        return
+    expires_at = token_expiry(token)
+    expiring = expires_at is not None and expires_at - time.time() <= REFRESH_AHEAD
+    if (
+        (expiring or get_resources().outbox_sender.token_rejected(token))
+        and time.time() - st.session_state.get("token_refresh_failed_at", 0) >= REFRESH_RETRY
+        and _refresh_support()["supported"]
+    ):
+        st.session_state.token_refresh = get_resources().loop.submit(
+            get_backend_client().arefresh_token()
+        )
+
+
+@timed("auth.require_login")
+def require_login(message: str = "Please login to continue.") -> None:
+    """
+    Make sure the session is logged in, restoring it from the session
+    cookie if the browser was reloaded; otherwise send the user to Login.
+    """
+    if not restore_session():
+        st.warning(message)
+        switch_page("Login")
+        st.stop()
+    save_session(st.session_state.token)
+    refresh_session()
@@ -0,0 +1,121 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+
+from client import GuardianLaneClient
+from client.guardian_lane import LatencyHistogram
+from utils.outbox import OutboxSender
+
+# Per-request timeout for SOS calls, and the budget for the whole fan-out
+REQUEST_TIMEOUT = 4.0
+ALERT_TIMEOUT = 6.0
+SOS_TARGET = "sos"
+
+# End-to-end latency of the alerts sent by this process, by outcome
+alert_latency = {outcome: LatencyHistogram() for outcome in ("delivered", "partial", "failed")}
+
+
+class DeliveryResult:
+    def __init__(self, target: str, ok: bool, latency: float, error: str | None = None) -> None:
+        self.target = target
+        self.ok = ok
+        self.latency = latency
+        self.error = error
+
+
+class SOSReport:
+    """Outcome of one SOS alert: per-target results and end-to-end latency."""
+
+    def __init__(self, alert_id: str, sent_at: str) -> None:
+        self.alert_id = alert_id
+        self.sent_at = sent_at
+        self.results: list[DeliveryResult] = []
+        self.latency = 0.0
+
+    @property
+    def alert_sent(self) -> bool:
+        return any(r.ok for r in self.results if r.target == SOS_TARGET)
+
+    @property
+    def contacts_reached(self) -> int:
+        return sum(r.ok for r in self.results if r.target != SOS_TARGET)
+
+    @property
+    def failures(self) -> list[DeliveryResult]:
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def outcome(self) -> str:
+        """"delivered" to everyone, "partial" or "failed" (nobody reached)."""
+        if not self.failures:
+            return "delivered"
+        return "partial" if self.alert_sent or self.contacts_reached else "failed"
+
+
+def location_link(location: dict) -> str:
+    return f"https://maps.google.com/?q={location['latitude']},{location['longitude']}"
+
+
+async def _deliver(target: str, send) -> DeliveryResult:
+    start = time.perf_counter()
+    ok = await send
+    return DeliveryResult(
+        target, ok, time.perf_counter() - start, None if ok else "not delivered"
+    )
+
+
+async def broadcast_sos(
+    client: GuardianLaneClient,
+    sender: OutboxSender,
+    location: dict,
+    message: str,
+    contacts: list[dict],
+    request_timeout: float = REQUEST_TIMEOUT,
+    alert_timeout: float = ALERT_TIMEOUT,
+) -> SOSReport:
+    """
+    Send an SOS to `/sos/send-alert` and a message with the location to each
+    emergency contact, all at once. Every request gets `request_timeout`
+    seconds and anything still pending after `alert_timeout` counts as failed.
+    Each message is recorded in the outbox first, so failed ones are retried
+    in the background under the report's `alert_id`.
+    """
+    start = time.perf_counter()
+    report = SOSReport(uuid.uuid4().hex, datetime.now(timezone.utc).isoformat())
+    sos_payload = {
+        "user_id": client.token["user_id"],
+        "timestamp": report.sent_at,
+        "location": location,
+        "message": message,
+    }
+    contact_message = f"{message} Location: {location_link(location)}"
+    deliveries = {
+        SOS_TARGET: sender.send(
+            client, "sos", SOS_TARGET, sos_payload, report.alert_id, request_timeout
+        )
+    }
+    for contact in contacts:
+        deliveries[contact["id"]] = sender.send(
+            client,
+            "emergency",
+            contact["id"],
+            client.emergency_message(contact["id"], contact_message),
+            report.alert_id,
+            request_timeout,
+        )
+    tasks = [
+        asyncio.create_task(_deliver(target, request))
+        for target, request in deliveries.items()
+    ]
+    done, pending = await asyncio.wait(tasks, timeout=alert_timeout)
+    for task in pending:
+        task.cancel()
+    report.results = [task.result() for task in done]
+    timed_out = set(deliveries) - {r.target for r in report.results}
+    report.results.extend(
+        DeliveryResult(target, False, alert_timeout, "timed out") for target in timed_out
+    )
+    report.latency = time.perf_counter() - start
+    alert_latency[report.outcome].observe(report.latency)
+    return report
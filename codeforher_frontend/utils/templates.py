@@ -0,0 +1,122 @@
+import hashlib
+import html
+import json
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+
+# Markup Google-style direction instructions use, restored after escaping
+ALLOWED_TAG_RE = re.compile(
+    r"&lt;(/?)(b|i|wbr|br)\s*/?&gt;|&lt;div(?:\s+style=&quot;[^&]*&quot;)?&gt;|&lt;/div&gt;",
+    re.IGNORECASE,
+)
+CACHE_SIZE = 256
+
+_rendered: OrderedDict[str, str] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _restore_tag(match: re.Match) -> str:
+    if match.group(2):
+        tag = match.group(2).lower()
+        return f"<{tag}>" if tag in ("wbr", "br") else f"<{match.group(1)}{tag}>"
+    return "</div>" if match.group(0).lower() == "&lt;/div&gt;" else "<div>"
+
+
+def sanitize_instructions(text: str) -> str:
+    """Escape direction text, keeping only simple formatting tags (attributes dropped)."""
+    return ALLOWED_TAG_RE.sub(_restore_tag, html.escape(str(text)))
+
+
+def escape(text) -> str:
+    return html.escape(str(text))
+
+
+def render_cached(render: Callable[[object], str], data) -> str:
+    """Render `data` with `render`, reusing the HTML for identical content."""
+    digest = hashlib.sha1(
+        json.dumps([render.__name__, data], sort_keys=True, default=str).encode()
+    ).hexdigest()
+    with _lock:
+        if digest in _rendered:
+            _rendered.move_to_end(digest)
+            return _rendered[digest]
+    block = render(data)
+    with _lock:
+        _rendered[digest] = block
+        if len(_rendered) > CACHE_SIZE:
+            _rendered.popitem(last=False)
+    return block
+
+
+def route_steps_html(steps: list[dict]) -> str:
+    """Turn-by-turn directions as one HTML block."""
+    items = "".join(
+        '<div class="direction-step">'
+        f'<div class="step-number">{i}</div>'
+        '<div class="step-content">'
+        f"<div>{sanitize_instructions(step['instructions'])}</div>"
+        f'<div class="step-distance">{escape(step["readable_distance"])} • '
+        f"{escape(step['readable_duration'])}</div>"
+        "</div></div>"
+        for i, step in enumerate(steps, 1)
+    )
+    return (
+        "<h3>Turn-by-Turn Directions</h3>"
+        f'<div class="directions-container">{items}</div>'
+    )
+
+
+def _named_items_html(items: dict) -> str:
+    return "".join(
+        '<div style="margin-bottom: 0.8rem;">'
+        f'<span class="road-name">{escape(name)}</span>'
+        f'<div class="safety-content">{escape(text)}</div>'
+        "</div>"
+        for name, text in items.items()
+    )
+
+
+def safety_insights_html(safety_data: dict) -> str:
+    """
+    Safety insight cards as one HTML block. Cards whose field is missing
+    (still streaming) or empty are left out.
+    """
+    cards = []
+    if "general_insights" in safety_data:
+        cards.append(
+            '<div class="safety-card">'
+            '<div class="safety-header">📍 Route Overview</div>'
+            f'<div class="safety-content">{escape(safety_data["general_insights"])}</div>'
+            "</div>"
+        )
+    if safety_data.get("safety_tips"):
+        tips = "".join(
+            '<div style="margin-bottom: 1rem;">'
+            f'<span class="time-badge">{escape(time.upper())}</span>'
+            f'<div class="safety-content" style="margin-top: 0.5rem;">{escape(tip)}</div>'
+            "</div>"
+            for time, tip in safety_data["safety_tips"].items()
+        )
+        cards.append(
+            '<div class="safety-card">'
+            '<div class="safety-header">⏰ Time-based Safety Tips</div>'
+            f'<div class="tips-grid">{tips}</div>'
+            "</div>"
+        )
+    if safety_data.get("road_conditions"):
+        cards.append(
+            '<div class="safety-card">'
+            '<div class="safety-header">🛣️ Road Conditions</div>'
+            f'{_named_items_html(safety_data["road_conditions"])}'
+            "</div>"
+        )
+    if safety_data.get("areas_of_concern"):
+        cards.append(
+            '<div class="safety-card">'
+            '<div class="safety-header">⚠️ Areas of Concern</div>'
+            f'{_named_items_html(safety_data["areas_of_concern"])}'
+            "</div>"
+        )
+    return "<h3>🛡️ Trip Safety Insights</h3>" + "".join(cards)
@@ -0,0 +1,55 @@
+import hashlib
+from pathlib import Path
+
+import streamlit as st
+
+from utils.browser import run_script
+
+# The app's `static/` folder, served by Streamlit at STATIC_URL relative to the page
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+STYLESHEET = STATIC_DIR / "css" / "guardian_lane.css"
+STATIC_URL = "app/static"
+LINK_ID = "guardian-lane-css"
+
+
+@st.cache_resource
+def stylesheet() -> tuple[str, str]:
+    """The stylesheet's versioned URL and its contents, read once per process."""
+    css = STYLESHEET.read_text(encoding="utf-8")
+    version = hashlib.sha256(css.encode()).hexdigest()[:12]
+    relative = STYLESHEET.relative_to(STATIC_DIR).as_posix()
+    return f"{STATIC_URL}/{relative}?v={version}", css
+
+
+def apply_theme() -> None:
+    """
+    Style the page with the shared stylesheet.
+
+    With static serving on (`server.enableStaticServing`, see
+    `.streamlit/config.toml`), a `<link>` to the stylesheet is added to the
+    app's document once per session, from a hidden component like the
+    session cookie; it stays there across reruns and page switches, so
+    later reruns send no CSS at all, and the browser revalidates the file
+    with its ETag instead of downloading it again. Otherwise the CSS is
+    inlined on every run, as before.
+    """
+    url, css = stylesheet()
+    if not st.get_option("server.enableStaticServing"):
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+        return
+    if st.session_state.get("stylesheet") == url:
+        return
+    run_script(
+        f"""
+        const doc = window.parent.document;
+        let link = doc.getElementById("{LINK_ID}");
+        if (!link) {{
+            link = doc.createElement("link");
+            link.id = "{LINK_ID}";
+            link.rel = "stylesheet";
+            doc.head.appendChild(link);
+        }}
+        link.href = new URL("{url}", doc.baseURI).href;
+        """
+    )
+    st.session_state.stylesheet = url
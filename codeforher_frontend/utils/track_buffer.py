@@ -0,0 +1,162 @@
+import math
+import threading
+import time
+from array import array
+
+from client import GuardianLaneClient, GuardianLaneClientError
+from utils.location_tracker import haversine_m
+
+# ~28 bytes per point: 8192 points is ~230 KB and 22 hours at one point per 10 s
+DEFAULT_CAPACITY = 8192
+# Fixes closer together than this (seconds) are skipped
+SAMPLE_INTERVAL = 5.0
+# Movement (metres) below which a fix counts as stationary
+MIN_DISTANCE_M = 10.0
+# A stationary fix is still recorded this often (seconds), as a heartbeat
+STATIONARY_HEARTBEAT = 300.0
+BATCH_SIZE = 500
+UPLOAD_INTERVAL = 60.0
+# Responses meaning the backend doesn't accept track uploads
+UNSUPPORTED_STATUSES = {404, 405, 501}
+
+
+class TrackBuffer:
+    """
+    Fixed-size ring buffer of one trip's location fixes.
+
+    Latitude, longitude, timestamp and accuracy live in parallel `array`
+    columns, so memory stays bounded by `capacity` however long the trip
+    runs; once full, the oldest fixes are overwritten. Every recorded fix
+    gets a sequence number, and `upload_seq` tracks how far uploads have
+    got. Fixes overwritten before being uploaded are counted in `dropped`.
+    """
+
+    def __init__(
+        self,
+        trip_id: str,
+        capacity: int = DEFAULT_CAPACITY,
+        sample_interval: float = SAMPLE_INTERVAL,
+        min_distance_m: float = MIN_DISTANCE_M,
+        stationary_heartbeat: float = STATIONARY_HEARTBEAT,
+    ) -> None:
+        self.trip_id = trip_id
+        self.capacity = capacity
+        self.sample_interval = sample_interval
+        self.min_distance_m = min_distance_m
+        self.stationary_heartbeat = stationary_heartbeat
+        self.lat = array("d", bytes(8 * capacity))
+        self.lon = array("d", bytes(8 * capacity))
+        self.ts = array("d", bytes(8 * capacity))
+        self.accuracy = array("f", bytes(4 * capacity))
+        # Sequence number of the next fix; fixes [next_seq - len, next_seq) are held
+        self.next_seq = 0
+        self.upload_seq = 0
+        self.dropped = 0
+        self.uploads_disabled = False
+        self.last_upload = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self.next_seq, self.capacity)
+
+    @property
+    def first_seq(self) -> int:
+        return self.next_seq - len(self)
+
+    @property
+    def pending(self) -> int:
+        return self.next_seq - max(self.upload_seq, self.first_seq)
+
+    def _last(self) -> tuple[float, float, float] | None:
+        if not self.next_seq:
+            return None
+        i = (self.next_seq - 1) % self.capacity
+        return self.lat[i], self.lon[i], self.ts[i]
+
+    def append(
+        self, lat: float, lon: float, ts: float | None = None, accuracy: float = math.nan
+    ) -> bool:
+        """Record a fix unless it is too soon or stationary. Returns True if kept."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            last = self._last()
+            if last is not None:
+                elapsed = ts - last[2]
+                if elapsed < self.sample_interval:
+                    return False
+                threshold = self.min_distance_m
+                if not math.isnan(accuracy):
+                    threshold = max(threshold, accuracy)
+                if (
+                    haversine_m(last[0], last[1], lat, lon) < threshold
+                    and elapsed < self.stationary_heartbeat
+                ):
+                    return False
+            i = self.next_seq % self.capacity
+            if self.next_seq >= self.capacity and self.next_seq - self.capacity >= self.upload_seq:
+                self.dropped += 1
+            self.lat[i], self.lon[i], self.ts[i], self.accuracy[i] = lat, lon, ts, accuracy
+            self.next_seq += 1
+            return True
+
+    def _columns(self, start: int, end: int) -> dict[str, list]:
+        indexes = [seq % self.capacity for seq in range(start, end)]
+        return {
+            "lat": [round(self.lat[i], 6) for i in indexes],
+            "lon": [round(self.lon[i], 6) for i in indexes],
+            "ts": [round(self.ts[i], 1) for i in indexes],
+            "accuracy": [
+                None if math.isnan(self.accuracy[i]) else round(self.accuracy[i], 1)
+                for i in indexes
+            ],
+        }
+
+    def points(self, limit: int | None = None) -> list[tuple[float, float]]:
+        """(lat, lon) of the held fixes, oldest first, or the last `limit` of them."""
+        with self._lock:
+            start = self.first_seq if limit is None else max(self.first_seq, self.next_seq - limit)
+            return [
+                (self.lat[seq % self.capacity], self.lon[seq % self.capacity])
+                for seq in range(start, self.next_seq)
+            ]
+
+    def next_batch(self, size: int = BATCH_SIZE) -> dict | None:
+        """Columnar batch of the oldest fixes not yet uploaded, or None."""
+        with self._lock:
+            start = max(self.upload_seq, self.first_seq)
+            end = min(start + size, self.next_seq)
+            if start >= end:
+                return None
+            return {"trip_id": self.trip_id, "start_seq": start, **self._columns(start, end)}
+
+    def mark_uploaded(self, batch: dict) -> None:
+        with self._lock:
+            self.upload_seq = max(self.upload_seq, batch["start_seq"] + len(batch["ts"]))
+
+    def upload_due(self, now: float | None = None, batch_size: int = BATCH_SIZE) -> bool:
+        now = time.monotonic() if now is None else now
+        return not self.uploads_disabled and self.pending > 0 and (
+            self.pending >= batch_size or now - self.last_upload >= UPLOAD_INTERVAL
+        )
+
+
+async def upload_track(
+    client: GuardianLaneClient, buffer: TrackBuffer, batch_size: int = BATCH_SIZE
+) -> int:
+    """
+    Upload the buffer's pending fixes as gzip-compressed batches. Stops at
+    the first failure, leaving the rest for the next call. Returns the
+    number of fixes uploaded.
+    """
+    buffer.last_upload = time.monotonic()
+    uploaded = 0
+    while batch := buffer.next_batch(batch_size):
+        try:
+            await client.aupload_track(buffer.trip_id, batch)
+        except GuardianLaneClientError as e:
+            if e.status_code in UNSUPPORTED_STATUSES:
+                buffer.uploads_disabled = True
+            break
+        buffer.mark_uploaded(batch)
+        uploaded += len(batch["ts"])
+    return uploaded
@@ -0,0 +1,150 @@
+from datetime import datetime
+
+import pytz
+
+SORT_OPTIONS = ("Latest First", "Oldest First", "Longest Distance", "Shortest Distance")
+STATUS_OPTIONS = ("All", "Completed", "Ongoing", "Cancelled")
+
+# Length of the address n-grams used for substring search
+NGRAM_SIZE = 3
+LOCAL_TZ = pytz.timezone("Asia/Kolkata")
+
+
+def parse_datetime(dt_str: str) -> datetime:
+    """Parse an ISO timestamp from the backend, accepting a trailing 'Z'."""
+    return datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+
+
+def format_datetime(dt_str: str) -> str:
+    """Format datetime string to a readable format."""
+    local_dt = parse_datetime(dt_str).astimezone(LOCAL_TZ)
+    return local_dt.strftime("%d %b %Y, %I:%M %p")
+
+
+def _ngrams(text: str) -> set[str]:
+    return {text[i : i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class IndexedTrip:
+    """A trip dict together with the keys precomputed for filtering and display."""
+
+    __slots__ = ("trip", "status", "created_ts", "distance", "haystack", "display_date")
+
+    def __init__(self, trip: dict) -> None:
+        self.trip = trip
+        self.status = str(trip.get("status", "")).lower()
+        self.distance = trip.get("distance") or 0
+        created_at = trip.get("created_at") or ""
+        try:
+            created = parse_datetime(created_at)
+            self.created_ts = created.timestamp()
+            self.display_date = created.astimezone(LOCAL_TZ).strftime(
+                "%d %b %Y, %I:%M %p"
+            )
+        except (TypeError, ValueError):
+            self.created_ts = 0.0
+            self.display_date = created_at
+        start = (trip.get("start_location") or {}).get("address") or ""
+        end = (trip.get("end_location") or {}).get("address") or ""
+        # Newline keeps n-grams from spanning the two addresses
+        self.haystack = f"{start.lower()}\n{end.lower()}"
+
+
+class TripIndex:
+    """
+    Per-session index over a user's trips.
+
+    Everything that used to be recomputed per rerun (lower-cased addresses,
+    parsed timestamps, formatted dates, sort orders) is computed once when the
+    index is built. Address search uses an inverted n-gram index, and a search
+    that extends the previous one (the user typing another character) only
+    re-checks the previous matches.
+    """
+
+    def __init__(self, trips: list[dict]) -> None:
+        self.records = [IndexedTrip(trip) for trip in trips]
+        self._by_status: dict[str, set[int]] = {}
+        self._postings: dict[str, set[int]] = {}
+        for pos, record in enumerate(self.records):
+            self._by_status.setdefault(record.status, set()).add(pos)
+            for gram in _ngrams(record.haystack):
+                self._postings.setdefault(gram, set()).add(pos)
+        self._orders: dict[str, list[int]] = {}
+        self._ranks: dict[str, list[int]] = {}
+        self._last_search: str = ""
+        self._last_matches: set[int] | None = None
+        self._results: dict[tuple[str, str, str], list[IndexedTrip]] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _order(self, sort_by: str) -> list[int]:
+        if sort_by not in self._orders:
+            positions = range(len(self.records))
+            match sort_by:
+                case "Oldest First":
+                    order = sorted(positions, key=lambda p: self.records[p].created_ts)
+                case "Longest Distance":
+                    order = sorted(
+                        positions, key=lambda p: self.records[p].distance, reverse=True
+                    )
+                case "Shortest Distance":
+                    order = sorted(positions, key=lambda p: self.records[p].distance)
+                case _:
+                    order = sorted(
+                        positions,
+                        key=lambda p: self.records[p].created_ts,
+                        reverse=True,
+                    )
+            rank = [0] * len(order)
+            for i, pos in enumerate(order):
+                rank[pos] = i
+            self._orders[sort_by] = order
+            self._ranks[sort_by] = rank
+        return self._orders[sort_by]
+
+    def _search(self, term: str) -> set[int]:
+        if self._last_matches is not None and self._last_search in term:
+            # Narrowing an earlier search: only earlier matches can still match
+            candidates = self._last_matches
+        elif len(term) >= NGRAM_SIZE:
+            postings = sorted(
+                (self._postings.get(gram, set()) for gram in _ngrams(term)), key=len
+            )
+            candidates = set.intersection(*postings) if postings else set()
+        else:
+            candidates = range(len(self.records))
+        matches = {pos for pos in candidates if term in self.records[pos].haystack}
+        self._last_search, self._last_matches = term, matches
+        return matches
+
+    def query(
+        self, status: str = "All", search: str = "", sort_by: str = "Latest First"
+    ) -> list[IndexedTrip]:
+        """Return the trips matching the status filter and address search, sorted."""
+        term = search.strip().lower()
+        key = (status, term, sort_by)
+        if key in self._results:
+            return self._results[key]
+
+        selected: set[int] | None = None
+        if status != "All":
+            selected = self._by_status.get(status.lower(), set())
+        if term:
+            matches = self._search(term)
+            selected = matches if selected is None else selected & matches
+
+        order = self._order(sort_by)
+        if selected is None:
+            positions = order
+        elif len(selected) * 8 < len(order):
+            rank = self._ranks[sort_by]
+            positions = sorted(selected, key=rank.__getitem__)
+        else:
+            positions = [pos for pos in order if pos in selected]
+
+        result = [self.records[pos] for pos in positions]
+        if len(self._results) >= 32:
+            self._results.clear()
+        self._results[key] = result
+        return result
@@ -0,0 +1,178 @@
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from utils.detour import RouteIndex
+
+# Samples farther than this (metres) from the route don't move progress
+MAX_SNAP_DISTANCE = 300.0
+# The stretch of route within reach of the last position (at this speed,
+# in m/s, and at least `MIN_REACH` metres either way) is searched first, so
+# a route that crosses or doubles back on itself doesn't snap to the wrong pass
+MAX_SPEED = 45.0
+MIN_REACH = 250.0
+# Planned seconds of travel after which the observed pace gets full weight
+CONFIDENCE_HORIZON = 600.0
+# Observed pace, as a share of the planned pace, is kept within these bounds
+MIN_PACE_RATIO = 0.5
+MAX_PACE_RATIO = 3.0
+# Smoothing of the observed pace ratio between samples
+PACE_SMOOTHING = 0.3
+
+
+@dataclass
+class Progress:
+    along: float
+    remaining_distance: float
+    remaining_duration: float
+    eta: float
+    pace_ratio: float
+    snapped: bool
+
+    @property
+    def fraction(self) -> float:
+        total = self.along + self.remaining_distance
+        return self.along / total if total else 1.0
+
+
+class TripProgress:
+    """
+    Remaining distance, duration and ETA of a trip from its location samples.
+
+    Each sample is projected onto the route, looking first at the stretch
+    within reach of the previous position and then at the whole
+    `RouteIndex`, and turned into a distance along the route using
+    cumulative segment lengths (scaled to add up to the planned distance),
+    so remaining distance is a lookup rather than a re-summation. Every
+    segment also gets a planned pace (seconds per metre) from the
+    directions step it falls in, giving cumulative planned times the same
+    way. The remaining planned time is then scaled by the traveller's
+    observed pace relative to plan, weighted by how much of the route has
+    been covered, so the ETA starts at the planned figure and follows the
+    actual speed as evidence builds up.
+    """
+
+    def __init__(
+        self,
+        route: RouteIndex,
+        planned_duration: float,
+        planned_distance: float | None = None,
+        steps: list[dict] | None = None,
+        started_at: float | None = None,
+        horizon: float = CONFIDENCE_HORIZON,
+    ) -> None:
+        self.route = route
+        self.horizon = horizon
+        lengths = route.lengths
+        # Polylines are simplified, so the planned distance is the better total
+        geometry_length = float(lengths.sum())
+        if planned_distance and geometry_length:
+            lengths = lengths * (planned_distance / geometry_length)
+        self.lengths = lengths
+        self.cumulative = np.concatenate([[0.0], np.cumsum(lengths)])
+        self.total_distance = float(self.cumulative[-1])
+        self.pace = self._segment_pace(planned_duration, steps)
+        self.planned_cumulative = np.concatenate([[0.0], np.cumsum(lengths * self.pace)])
+        self.planned_duration = float(self.planned_cumulative[-1])
+        self.started_at = time.time() if started_at is None else started_at
+        self.pace_ratio = 1.0
+        self.progress = Progress(
+            along=0.0,
+            remaining_distance=self.total_distance,
+            remaining_duration=self.planned_duration,
+            eta=self.started_at + self.planned_duration,
+            pace_ratio=1.0,
+            snapped=False,
+        )
+        self._last: tuple[float, float] | None = None
+        # Distance along the route and time of the last fix on it
+        self._last_fix: tuple[float, float] | None = None
+
+    def _segment_pace(self, planned_duration: float, steps: list[dict] | None) -> np.ndarray:
+        """Planned seconds per metre of every segment."""
+        count = len(self.route)
+        uniform = planned_duration / self.total_distance if self.total_distance else 0.0
+        step_distance = np.array(
+            [float(step.get("distance") or 0) for step in steps or []], dtype=np.float64
+        )
+        step_duration = np.array(
+            [float(step.get("duration") or 0) for step in steps or []], dtype=np.float64
+        )
+        if not len(step_distance) or step_distance.sum() <= 0 or step_duration.sum() <= 0:
+            return np.full(count, uniform)
+        # Step boundaries, rescaled onto the route's length
+        step_end = np.cumsum(step_distance) * (self.total_distance / step_distance.sum())
+        step_pace = np.divide(
+            step_duration,
+            step_distance,
+            out=np.full(len(step_distance), uniform),
+            where=step_distance > 0,
+        )
+        midpoints = (self.cumulative[:-1] + self.cumulative[1:]) / 2
+        step_of_segment = np.minimum(
+            np.searchsorted(step_end, midpoints), len(step_pace) - 1
+        )
+        pace = step_pace[step_of_segment]
+        # Keep the trip's planned total, whatever the steps add up to
+        planned = float((self.lengths * pace).sum())
+        return pace * (planned_duration / planned) if planned else np.full(count, uniform)
+
+    def _snap(self, lat: float, lon: float, ts: float) -> tuple[int, float, float] | None:
+        """Nearest point on the route, preferring what's within reach of the last position."""
+        if self._last_fix is not None:
+            along, last_ts = self._last_fix
+            reach = max(MAX_SPEED * (ts - last_ts), MIN_REACH)
+            first, last = np.searchsorted(self.cumulative, [along - reach, along + reach])
+            local = self.route.project_between(lat, lon, int(first) - 1, int(last))
+            if local[2] <= MAX_SNAP_DISTANCE:
+                return local
+        return self.route.project(lat, lon, max_distance=MAX_SNAP_DISTANCE)
+
+    def update(self, lat: float, lon: float, ts: float | None = None) -> Progress:
+        """Feed a location sample and return the updated progress."""
+        ts = time.time() if ts is None else ts
+        nearest = self._snap(lat, lon, ts)
+        if nearest is None:
+            # Off the route: keep the last position, let the clock run on
+            remaining = self.progress.remaining_duration
+            self.progress = Progress(
+                along=self.progress.along,
+                remaining_distance=self.progress.remaining_distance,
+                remaining_duration=remaining,
+                eta=max(self.progress.eta, ts + remaining),
+                pace_ratio=self.pace_ratio,
+                snapped=False,
+            )
+            return self.progress
+
+        segment, t, _ = nearest
+        segment_length = self.lengths[segment]
+        along = float(self.cumulative[segment] + t * segment_length)
+        planned_done = float(
+            self.planned_cumulative[segment] + t * segment_length * self.pace[segment]
+        )
+        if self._last is not None:
+            last_ts, last_planned = self._last
+            planned_step = planned_done - last_planned
+            if planned_step > 0 and ts > last_ts:
+                ratio = min(max((ts - last_ts) / planned_step, MIN_PACE_RATIO), MAX_PACE_RATIO)
+                self.pace_ratio += PACE_SMOOTHING * (ratio - self.pace_ratio)
+        # Only move forward along the route; a stop keeps the last reference
+        if self._last is None or planned_done > self._last[1]:
+            self._last = (ts, planned_done)
+
+        self._last_fix = (along, ts)
+
+        weight = min(planned_done / self.horizon, 1.0) if self.horizon else 1.0
+        scale = 1.0 + weight * (self.pace_ratio - 1.0)
+        remaining = max(self.planned_duration - planned_done, 0.0) * scale
+        self.progress = Progress(
+            along=along,
+            remaining_distance=max(self.total_distance - along, 0.0),
+            remaining_duration=remaining,
+            eta=ts + remaining,
+            pace_ratio=self.pace_ratio,
+            snapped=True,
+        )
+        return self.progress
@@ -0,0 +1,149 @@
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from utils.trip_index import LOCAL_TZ, TripIndex
+
+DAY_SECONDS = 86_400
+WEEK_SECONDS = 7 * DAY_SECONDS
+# 1970-01-01 was a Thursday; shifting by four days makes weeks start on Monday
+WEEK_ORIGIN = 4 * DAY_SECONDS
+STATUS_CODES = {"completed": 0, "ongoing": 1, "cancelled": 2}
+
+
+class TripStats:
+    """
+    Columnar view of a user's trips for the statistics panel.
+
+    Columns are NumPy arrays built once per fetch; every aggregate is a
+    vectorized reduction or `np.bincount` group-by over them. Daily and
+    weekly series end at the current day and week (as of `now`), and trips
+    without a creation time are left out of every time-based aggregate.
+    """
+
+    def __init__(
+        self,
+        created_ts: np.ndarray,
+        distance: np.ndarray,
+        duration: np.ndarray,
+        status: np.ndarray,
+        detour_alerts: np.ndarray,
+        anomaly_alerts: np.ndarray,
+        now: float | None = None,
+    ) -> None:
+        self.created_ts = created_ts
+        self.distance = distance
+        self.duration = duration
+        self.status = status
+        self.detour_alerts = detour_alerts
+        self.anomaly_alerts = anomaly_alerts
+        offset = LOCAL_TZ.utcoffset(datetime.now()).total_seconds()
+        local_ts = created_ts.astype(np.int64) + int(offset)
+        self.day = local_ts // DAY_SECONDS
+        self.week = (local_ts - WEEK_ORIGIN) // WEEK_SECONDS
+        self.hour = (local_ts % DAY_SECONDS) // 3600
+        self.has_alert = (detour_alerts + anomaly_alerts) > 0
+        # Trips whose `created_at` is missing or unparseable have a 0 timestamp
+        self.dated = created_ts > 0
+        local_now = int(time.time() if now is None else now) + int(offset)
+        self.today = local_now // DAY_SECONDS
+        self.this_week = (local_now - WEEK_ORIGIN) // WEEK_SECONDS
+
+    @classmethod
+    def from_index(cls, index: TripIndex) -> "TripStats":
+        """Build the columns from an already-parsed trip index."""
+        records = index.records
+        count = len(records)
+        return cls(
+            created_ts=np.fromiter((r.created_ts for r in records), np.float64, count),
+            distance=np.fromiter((r.distance for r in records), np.float64, count),
+            duration=np.fromiter(
+                (r.trip.get("duration") or 0 for r in records), np.float64, count
+            ),
+            status=np.fromiter(
+                (STATUS_CODES.get(r.status, -1) for r in records), np.int8, count
+            ),
+            detour_alerts=np.fromiter(
+                (len(r.trip.get("detour_alerts") or ()) for r in records),
+                np.int32,
+                count,
+            ),
+            anomaly_alerts=np.fromiter(
+                (len(r.trip.get("anomaly_alerts") or ()) for r in records),
+                np.int32,
+                count,
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.created_ts)
+
+    def _bucket_sum(
+        self, bucket: np.ndarray, values: np.ndarray, periods: int, last: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Sum `values` over the `periods` buckets up to `last`; returns (bucket ids, sums)."""
+        first = last - periods + 1
+        recent = self.dated & (bucket >= first) & (bucket <= last)
+        sums = np.bincount(
+            bucket[recent] - first, weights=values[recent], minlength=periods
+        )
+        return np.arange(first, last + 1), sums
+
+    def weekly_distance_km(self, weeks: int = 12) -> tuple[list[str], np.ndarray]:
+        """
+        Distance of completed trips per week (labelled by the week's Monday),
+        this week last. Ongoing and cancelled trips only have a planned
+        distance, not one travelled.
+        """
+        completed = np.where(self.status == STATUS_CODES["completed"], self.distance, 0.0)
+        ids, sums = self._bucket_sum(self.week, completed, weeks, self.this_week)
+        labels = [
+            datetime.fromtimestamp(int(w) * WEEK_SECONDS + WEEK_ORIGIN, timezone.utc)
+            .strftime("%d %b")
+            for w in ids
+        ]
+        return labels, sums / 1000
+
+    def daily_trip_counts(self, days: int = 30) -> tuple[list[str], np.ndarray]:
+        """Number of trips started per day, today last."""
+        ids, sums = self._bucket_sum(self.day, np.ones(len(self)), days, self.today)
+        labels = [
+            datetime.fromtimestamp(int(d) * DAY_SECONDS, timezone.utc).strftime("%d %b")
+            for d in ids
+        ]
+        return labels, sums
+
+    def duration_summary(self) -> dict[str, float]:
+        """Average and percentile durations (minutes) of completed trips."""
+        durations = self.duration[self.status == STATUS_CODES["completed"]] / 60
+        if not len(durations):
+            return {"mean": 0.0, "p50": 0.0, "p90": 0.0}
+        p50, p90 = np.percentile(durations, [50, 90])
+        return {"mean": float(durations.mean()), "p50": float(p50), "p90": float(p90)}
+
+    def alert_totals(self) -> dict[str, int]:
+        return {
+            "detour": int(self.detour_alerts.sum()),
+            "anomaly": int(self.anomaly_alerts.sum()),
+        }
+
+    def alert_rate_by_hour(self) -> tuple[np.ndarray, np.ndarray]:
+        """Per local hour: number of trips and share of trips that raised an alert."""
+        hour = self.hour[self.dated]
+        trips = np.bincount(hour, minlength=24)
+        alerted = np.bincount(hour, weights=self.has_alert[self.dated], minlength=24)
+        rate = np.divide(
+            alerted, trips, out=np.zeros(24, dtype=np.float64), where=trips > 0
+        )
+        return trips, rate
+
+    def safest_hour(self, min_trips: int = 5) -> int | None:
+        """Hour of day with the lowest alert rate among hours with enough trips."""
+        trips, rate = self.alert_rate_by_hour()
+        eligible = trips >= min_trips
+        if not eligible.any():
+            return None
+        # Lowest rate first, then the hour with the most trips behind that rate
+        candidates = np.lexsort((-trips, np.where(eligible, rate, np.inf)))
+        return int(candidates[0])
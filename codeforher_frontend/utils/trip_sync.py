@@ -0,0 +1,112 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from client import GuardianLaneClient, GuardianLaneClientError
+
+
+class TripSyncError(Exception):
+    pass
+
+
+def parse_timestamp(stamp: str) -> datetime | None:
+    """An ISO 8601 timestamp as an aware datetime (naive ones are UTC), or None."""
+    try:
+        parsed = datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class TripSync:
+    """
+    Process-wide cache of one user's trips, kept current with delta requests.
+
+    The first sync downloads the full trip list. Later syncs send the last
+    ETag (`If-None-Match`) and the newest `updated_at` seen (`updated_since`)
+    so the backend can answer with `304 Not Modified` or only the changed
+    trips, which are merged into the cache by `_id`. Syncs closer together
+    than `min_interval` seconds are skipped, so reruns triggered by filter
+    or search changes never touch the network. After a failed sync the
+    interval doubles with each consecutive failure, up to `max_backoff`,
+    and `last_error` says what went wrong until a sync succeeds.
+    """
+
+    def __init__(
+        self, user_id: str, min_interval: float = 30.0, max_backoff: float = 600.0
+    ) -> None:
+        self.user_id = user_id
+        self.min_interval = min_interval
+        self.max_backoff = max_backoff
+        self.trips: dict[str, dict] = {}
+        # Incremented whenever the cached trips change
+        self.version = 0
+        self.etag: str | None = None
+        # Newest `updated_at` seen, as sent by the backend and parsed
+        self.updated_since: str | None = None
+        self._updated_since_at: datetime | None = None
+        self.last_error: str | None = None
+        self._synced = False
+        self._failures = 0
+        self._last_checked: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_stale(self) -> bool:
+        if self._last_checked is None:
+            return True
+        interval = min(self.min_interval * 2 ** self._failures, self.max_backoff)
+        return time.monotonic() - self._last_checked >= interval
+
+    def sync(self, client: GuardianLaneClient, force: bool = False) -> list[dict]:
+        """Bring the cache up to date if it is stale and return all cached trips."""
+        with self._lock:
+            if force or self.is_stale:
+                self._fetch_changes(client)
+            return list(self.trips.values())
+
+    def _fetch_changes(self, client: GuardianLaneClient) -> None:
+        first = not self._synced
+        try:
+            payload, etag = client.get_trips(
+                self.user_id,
+                updated_since=None if first else self.updated_since,
+                etag=None if first else self.etag,
+            )
+        except GuardianLaneClientError as e:
+            # Back off instead of asking again on every rerun
+            self._last_checked = time.monotonic()
+            self._failures += 1
+            self.last_error = f"Error fetching trips: {e}"
+            raise TripSyncError(self.last_error)
+        self._last_checked = time.monotonic()
+        self._synced = True
+        self._failures = 0
+        self.last_error = None
+        if payload is None:
+            return
+
+        self._merge(payload, full=first or not self.updated_since)
+        self.etag = etag
+
+    def _merge(self, payload: list[dict] | dict, full: bool) -> None:
+        # Delta responses may be wrapped as {"trips": [...], "deleted": [ids]}
+        if isinstance(payload, dict):
+            changed = payload.get("trips", [])
+            deleted = payload.get("deleted", [])
+        else:
+            changed, deleted = payload, []
+        if full:
+            self.trips = {}
+        for trip in changed:
+            self.trips[trip["_id"]] = trip
+            stamp = trip.get("updated_at") or trip.get("created_at")
+            # Compared as times: the strings' suffixes ("Z", "+00:00") and
+            # fraction digits vary
+            stamped_at = parse_timestamp(stamp) if stamp else None
+            if stamped_at and (self._updated_since_at is None or stamped_at > self._updated_since_at):
+                self.updated_since, self._updated_since_at = stamp, stamped_at
+        for trip_id in deleted:
+            self.trips.pop(trip_id, None)
+        if full or changed or deleted:
+            self.version += 1
@@ -0,0 +1,47 @@
+import importlib
+import os
+import threading
+import time
+
+# Heavy modules the pages import on first use, in the order they're needed
+MAP_MODULES = ("polyline", "folium", "streamlit_folium")
+AUDIO_MODULES = ("soundfile", "speech_recognition", "gtts", "pydub")
+PRELOAD_MODULES = MAP_MODULES + AUDIO_MODULES
+
+
+def preload_enabled() -> bool:
+    """Preloading is on unless `PRELOAD_MODULES` is set to 0."""
+    return os.getenv("PRELOAD_MODULES", "1").strip().lower() not in {"0", "false", "no"}
+
+
+class ModulePreloader:
+    """
+    Imports the modules pages load lazily in a daemon thread, so the first
+    visitor after a server start doesn't pay for them. The pages still
+    import them where they're used; this only puts them in `sys.modules`
+    ahead of time. Modules that aren't installed are skipped.
+    """
+
+    def __init__(self, modules: tuple[str, ...] = PRELOAD_MODULES) -> None:
+        self.modules = modules
+        # Seconds each module took to import, or the import error
+        self.timings: dict[str, float | str] = {}
+        self.thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        for name in self.modules:
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                self.timings[name] = str(e)
+                continue
+            self.timings[name] = time.perf_counter() - start
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="module-preload", daemon=True)
+            self.thread.start()
+
+    def done(self) -> bool:
+        return self.thread is not None and not self.thread.is_alive()